@@ -0,0 +1,47 @@
+# Generated by Django 5.0.6 on 2026-10-18 20:22
+
+from django.db import migrations, models
+from django.db.models import Count, F, Min, Sum
+
+
+def merge_duplicates(apps, schema_editor):
+    # Antes de crear la restricción, sumar las cantidades de cada par en su fila
+    # más antigua y borrar las demás
+    Cart = apps.get_model('cart', 'Cart')
+    CartItem = apps.get_model('cart', 'CartItem')
+
+    duplicates = list(
+        CartItem.objects.values('cart', 'product').annotate(
+            first=Min('id'), total=Sum('count'), rows=Count('id')
+        ).filter(rows__gt=1)
+    )
+
+    for duplicate in duplicates:
+        CartItem.objects.filter(id=duplicate['first']).update(count=duplicate['total'])
+        CartItem.objects.filter(
+            cart=duplicate['cart'], product=duplicate['product']
+        ).exclude(id=duplicate['first']).delete()
+
+    # total_items cuenta los productos distintos del carrito; la nueva versión
+    # invalida las cotizaciones emitidas con el contenido anterior
+    for cart_id in {duplicate['cart'] for duplicate in duplicates}:
+        Cart.objects.filter(id=cart_id).update(
+            total_items=CartItem.objects.filter(cart=cart_id).count(),
+            version=F('version') + 1,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0004_cart_version'),
+        ('products', '0004_product_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='unique_cart_product'),
+        ),
+    ]
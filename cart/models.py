@@ -10,9 +10,15 @@ User = settings.AUTH_USER_MODEL
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, verbose_name=_('Usuario'))
     total_items = models.IntegerField(default=0, verbose_name=_('Total de items'))
+    version = models.PositiveIntegerField(default=0, verbose_name=_('Versión'))
 
 
 class CartItem(models.Model):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product'),
+        ]
+
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, verbose_name=_('Carrito'))
     product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name=_('Producto'))
     count = models.IntegerField(verbose_name=_('Cantidad'))
\ No newline at end of file
@@ -0,0 +1,237 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from ecommerce.versions import get_versions
+from payment.pricing import price_lines, cart_lines
+from products.models import Product
+from products.serializers import ProductSerializer
+from products.signals import product_version_key
+from .models import Cart, CartItem
+
+CART_CACHE_TIMEOUT = 60 * 60
+
+
+def serialize_cart_items(cart_items):
+    """
+    Serializa una lista de items del carrito cuyos productos ya fueron cargados.
+
+    Todos los productos se serializan en bloque con un único ProductSerializer.
+
+    Returns:
+        list: Diccionarios con 'id', 'count' y 'product' por cada item.
+    """
+    cart_items = list(cart_items)
+    products = ProductSerializer(
+        [cart_item.product for cart_item in cart_items], many=True
+    ).data
+
+    result = []
+
+    for cart_item, product in zip(cart_items, products):
+        item = {}
+        item['id'] = cart_item.id
+        item['count'] = cart_item.count
+        item['product'] = product
+
+        result.append(item)
+
+    return result
+
+
+def get_cart_snapshot(user):
+    """
+    Obtiene el contenido y los totales del carrito desde la cache.
+
+    La llave incluye la versión del carrito, y la foto guarda la versión de
+    cada uno de sus productos. Una foto se usa solo si esas versiones no
+    cambiaron, de modo que un cambio en el carrito o en alguno de sus
+    productos genera una foto nueva, pero los cambios en otros productos,
+    como las compras de otros usuarios, no la invalidan.
+
+    Returns:
+        dict: 'cart', 'total_items', 'total_cost' y 'total_compare_cost'.
+    """
+    key = 'cart:%s:%s' % (user.id, get_cart_version(user))
+    cached = cache.get(key)
+
+    if cached is not None and cache.get_many(
+            cached['versions']) == cached['versions']:
+        return cached['snapshot']
+
+    # Las versiones se leen antes de consultar los productos: si uno cambia
+    # mientras se construye la foto, su versión ya no coincide y la foto se
+    # descarta en la siguiente lectura en lugar de quedar guardada
+    product_ids = _load_cart_items(user).values_list('product_id', flat=True)
+    versions = get_versions(
+        [product_version_key(product_id) for product_id in product_ids])
+
+    snapshot = build_cart_snapshot(user)
+    cache.set(key, {'snapshot': snapshot, 'versions': versions},
+              CART_CACHE_TIMEOUT)
+
+    return snapshot
+
+
+def build_cart_snapshot(user):
+    """
+    Construye la foto del carrito directamente desde la base de datos.
+
+    Los items se filtran por el usuario dueño del carrito y sus productos se
+    obtienen con un único JOIN, por lo que el número de consultas no depende de
+    la cantidad de items en el carrito.
+
+    Returns:
+        dict: 'cart', 'total_items', 'total_cost' y 'total_compare_cost'.
+    """
+    cart_items = list(_load_cart_items(user))
+
+    quote = price_lines(cart_lines(cart_items))
+
+    return {
+        'cart': serialize_cart_items(cart_items),
+        'total_items': len(cart_items),
+        'total_cost': quote.original_price,
+        'total_compare_cost': quote.total_compare_amount,
+    }
+
+
+def get_cart_version(user):
+    """
+    Obtiene la versión del carrito, consultando la base de datos solo si no
+    está en la cache.
+    """
+    key = _cart_version_key(user.id)
+    version = cache.get(key)
+
+    if version is None:
+        version = Cart.objects.values_list(
+            'version', flat=True).get(user=user)
+        # add() no pisa una versión más nueva escrita por bump_cart_version
+        cache.add(key, version, CART_CACHE_TIMEOUT)
+
+    return version
+
+
+def bump_cart_version(user):
+    """
+    Incrementa la versión del carrito después de modificarlo.
+
+    La nueva versión se escribe en la cache cuando la transacción se confirma,
+    invalidando así la foto anterior del carrito.
+    """
+    Cart.objects.filter(user=user).update(version=F('version') + 1)
+    version = Cart.objects.values_list('version', flat=True).get(user=user)
+
+    key = _cart_version_key(user.id)
+    transaction.on_commit(
+        lambda: cache.set(key, version, CART_CACHE_TIMEOUT))
+
+    return version
+
+
+def synch_cart(user, cart_items):
+    """
+    Combina en bloque los items de un carrito de invitado con el del usuario.
+
+    Los productos y los items existentes se cargan con dos consultas IN, los
+    conteos se combinan en memoria y los cambios se aplican con bulk_create y
+    bulk_update dentro de una sola transacción.
+
+    Args:
+        user: Usuario dueño del carrito.
+        cart_items (list): Líneas con 'product_id' y opcionalmente 'count'.
+
+    Returns:
+        list: Resultado por cada línea recibida con 'product_id' y 'status'.
+    """
+    lines = []
+
+    for cart_item in cart_items:
+        try:
+            product_id = int(cart_item['product_id'])
+        except:
+            product_id = None
+
+        try:
+            count = int(cart_item['count'])
+        except:
+            count = 1
+
+        lines.append((product_id, count))
+
+    product_ids = {product_id for product_id, _ in lines if product_id}
+
+    with transaction.atomic():
+        cart = Cart.objects.select_for_update().get(user=user)
+
+        products = Product.objects.only('id', 'quantity').in_bulk(product_ids)
+        existing = {
+            item.product_id: item
+            for item in CartItem.objects.filter(
+                cart=cart, product_id__in=product_ids)
+        }
+        created = {}
+        updated = {}
+        results = []
+
+        for product_id, count in lines:
+            result = {'product_id': product_id}
+            results.append(result)
+
+            if product_id is None:
+                result['status'] = 'invalid_product_id'
+                continue
+
+            product = products.get(product_id)
+
+            if product is None:
+                result['status'] = 'not_found'
+                continue
+
+            item = existing.get(product_id) or created.get(product_id)
+            current = item.count if item else 0
+
+            if count < 1:
+                result['status'] = 'invalid_count'
+                result['count'] = current
+                continue
+
+            if current + count > product.quantity:
+                result['status'] = 'not_enough_stock'
+                result['count'] = current
+                continue
+
+            if item is None:
+                created[product_id] = CartItem(
+                    cart=cart, product_id=product_id, count=count)
+                result['status'] = 'added'
+            else:
+                item.count = current + count
+                if product_id in existing:
+                    updated[product_id] = item
+                result['status'] = 'updated'
+
+            result['count'] = current + count
+
+        if created:
+            CartItem.objects.bulk_create(created.values())
+            Cart.objects.filter(pk=cart.pk).update(
+                total_items=F('total_items') + len(created))
+
+        if updated:
+            CartItem.objects.bulk_update(updated.values(), ['count'])
+
+        if created or updated:
+            bump_cart_version(user)
+
+    return results
+
+
+def _load_cart_items(user):
+    return CartItem.objects.select_related(
+        'product'
+    ).filter(cart__user=user).order_by('product')
+
+
+def _cart_version_key(user_id):
+    return 'cart-version:%s' % user_id
@@ -1,3 +1,229 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from category.models import Category
+from payment.pricing import Line
+from ecommerce.versions import get_version
+from payment.services import reserve_stock
+from products.signals import product_version_key
+from products.models import Product
+from .models import Cart, CartItem
 
 # Create your tests here.
+
+User = get_user_model()
+
+
+class CartQueryCountTests(TestCase):
+    """
+    Verifica que los endpoints del carrito usen un número constante de consultas.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='cart@example.com', password='Test12345',
+            first_name='Cart', last_name='Tester')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.category = Category.objects.create(name='Category')
+
+    def fill_cart(self, size):
+        cart = Cart.objects.get(user=self.user)
+
+        for i in range(size):
+            product = Product.objects.create(
+                name=f'Product {i}', description='Description',
+                price='10.00', compare_price='12.00',
+                category=self.category, quantity=10)
+            CartItem.objects.create(cart=cart, product=product, count=1)
+
+        Cart.objects.filter(user=self.user).update(total_items=size)
+        cache.clear()
+
+    def test_get_items_query_count_is_constant(self):
+        self.fill_cart(3)
+
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/cart/cart-items')
+
+        self.assertEqual(len(response.data['cart']), 3)
+
+        self.fill_cart(40)
+
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/cart/cart-items')
+
+        self.assertEqual(len(response.data['cart']), 43)
+
+    def test_update_item_query_count_is_constant(self):
+        self.fill_cart(3)
+        product = Product.objects.first()
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.put('/api/cart/update-item',
+                            {'product_id': product.id, 'count': 2},
+                            format='json')
+
+        self.fill_cart(40)
+
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.put('/api/cart/update-item',
+                                       {'product_id': product.id, 'count': 3},
+                                       format='json')
+
+        self.assertEqual(len(response.data['cart']), 43)
+        self.assertEqual(len(small), len(large))
+
+
+class CartCacheTests(TransactionTestCase):
+    """
+    Verifica que la foto del carrito se sirva desde la cache sin datos viejos.
+
+    Usa TransactionTestCase para que los callbacks de on_commit se ejecuten.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='cache@example.com', password='Test12345',
+            first_name='Cache', last_name='Tester')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        category = Category.objects.create(name='Category')
+        self.product = Product.objects.create(
+            name='Product', description='Description', price='10.00',
+            compare_price='12.00', category=category, quantity=10)
+
+    def test_reads_are_served_from_cache(self):
+        self.client.get('/api/cart/cart-items')
+
+        with self.assertNumQueries(0):
+            self.client.get('/api/cart/cart-items')
+            self.client.get('/api/cart/get-total')
+            self.client.get('/api/cart/get-item-total')
+
+    def test_mutations_invalidate_cache(self):
+        self.client.get('/api/cart/get-total')
+
+        self.client.post('/api/cart/add-item',
+                         {'product_id': self.product.id}, format='json')
+        response = self.client.get('/api/cart/get-total')
+        self.assertEqual(response.data['total_cost'], 10.0)
+
+        self.client.put('/api/cart/update-item',
+                        {'product_id': self.product.id, 'count': 3},
+                        format='json')
+        response = self.client.get('/api/cart/get-total')
+        self.assertEqual(response.data['total_cost'], 30.0)
+
+        self.client.delete('/api/cart/empty-cart')
+        response = self.client.get('/api/cart/get-item-total')
+        self.assertEqual(response.data['total_items'], 0)
+
+    def test_product_changes_invalidate_cache(self):
+        self.client.post('/api/cart/add-item',
+                         {'product_id': self.product.id}, format='json')
+        self.client.get('/api/cart/get-total')
+
+        self.product.price = '15.00'
+        self.product.save()
+
+        response = self.client.get('/api/cart/get-total')
+        self.assertEqual(response.data['total_cost'], 15.0)
+
+    def test_sales_of_other_products_keep_cache(self):
+        other = Product.objects.create(
+            name='Other', description='Description', price='5.00',
+            compare_price='6.00', category=self.product.category, quantity=10)
+        self.client.post('/api/cart/add-item',
+                         {'product_id': self.product.id}, format='json')
+        self.client.get('/api/cart/cart-items')
+
+        reserve_stock([Line(other.id, other.name, other.price,
+                            other.compare_price, 2)])
+
+        with self.assertNumQueries(0):
+            self.client.get('/api/cart/cart-items')
+
+        reserve_stock([Line(self.product.id, self.product.name,
+                            self.product.price, self.product.compare_price, 3)])
+
+        response = self.client.get('/api/cart/cart-items')
+        self.assertEqual(response.data['cart'][0]['product']['quantity'], 7)
+
+    def test_moving_item_to_wishlist_invalidates_cache(self):
+        self.client.post('/api/cart/add-item',
+                         {'product_id': self.product.id}, format='json')
+        self.client.get('/api/cart/get-total')
+
+        self.client.post('/api/wishlist/add-item',
+                         {'product_id': self.product.id}, format='json')
+
+        response = self.client.get('/api/cart/cart-items')
+        self.assertEqual(response.data['cart'], [])
+        response = self.client.get('/api/cart/get-total')
+        self.assertEqual(response.data['total_cost'], 0)
+
+    def test_product_versions_advance_on_commit(self):
+        key = product_version_key(self.product.id)
+        version = get_version(key)
+
+        with transaction.atomic():
+            self.product.price = '15.00'
+            self.product.save()
+            self.assertEqual(get_version(key), version)
+
+        self.assertGreater(get_version(key), version)
+
+
+class SynchCartTests(TestCase):
+    """
+    Verifica la combinación en bloque del carrito de invitado.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='synch@example.com', password='Test12345',
+            first_name='Synch', last_name='Tester')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        category = Category.objects.create(name='Category')
+        self.products = [
+            Product.objects.create(
+                name=f'Product {i}', description='Description',
+                price='10.00', compare_price='12.00',
+                category=category, quantity=5)
+            for i in range(3)
+        ]
+        cart = Cart.objects.get(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.products[0], count=2)
+        Cart.objects.filter(pk=cart.pk).update(total_items=1)
+
+    def test_synch_merges_every_line(self):
+        response = self.client.put('/api/cart/synch', {'cart_items': [
+            {'product_id': self.products[0].id, 'count': 2},
+            {'product_id': self.products[1].id, 'count': 1},
+            {'product_id': self.products[2].id, 'count': 9},
+            {'product_id': 0, 'count': 1},
+            {'product_id': 'abc'},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['updated', 'added', 'not_enough_stock', 'not_found',
+             'invalid_product_id'])
+
+        cart = Cart.objects.get(user=self.user)
+        counts = dict(CartItem.objects.filter(
+            cart=cart).values_list('product_id', 'count'))
+
+        self.assertEqual(cart.total_items, 2)
+        self.assertEqual(counts, {
+            self.products[0].id: 4,
+            self.products[1].id: 1,
+        })
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import GetItemsView, AddItemView, GetTotalView, GetItemTotalView, UpdateItemView, RemoveItemView, EmptyCartView, SynchCartView
+from .views import GetItemsView, AddItemView, GetTotalView, GetItemTotalView, UpdateItemView, RemoveItemView, EmptyCartView, SynchCartView, GetBoughtTogetherView
 
 urlpatterns = [
     path('cart-items', GetItemsView.as_view()),
@@ -10,4 +10,5 @@ urlpatterns = [
     path('remove-item', RemoveItemView.as_view()),
     path('empty-cart', EmptyCartView.as_view()),
     path('synch', SynchCartView.as_view()),
+    path('bought-together', GetBoughtTogetherView.as_view()),
 ]
\ No newline at end of file
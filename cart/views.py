@@ -1,9 +1,13 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from django.db import IntegrityError, transaction
+from django.db.models import F
 from .models import Cart, CartItem
 from products.models import Product
+from products.related import get_bought_together
 from products.serializers import ProductSerializer
+from .services import get_cart_snapshot, bump_cart_version, synch_cart
 
 # Create your views here.
 
@@ -22,23 +26,8 @@ class GetItemsView(APIView):
         """
         user = self.request.user
         try:
-            cart = Cart.objects.get(user=user)
-            cart_items = CartItem.objects.order_by('product').filter(cart=cart)
-
-            result = []
-
-            if CartItem.objects.filter(cart=cart).exists():
-                for cart_item in cart_items:
-                    item = {}
-
-                    item['id'] = cart_item.id
-                    item['count'] = cart_item.count
-                    product = Product.objects.get(id=cart_item.product.id)
-                    product = ProductSerializer(product)
-
-                    item['product'] = product.data
+            result = get_cart_snapshot(user)['cart']
 
-                    result.append(item)
             return Response({'cart': result}, status=status.HTTP_200_OK)
         except:
             return Response(
@@ -81,44 +70,30 @@ class AddItemView(APIView):
 
             cart = Cart.objects.get(user=user)
 
-            if CartItem.objects.filter(cart=cart, product=product).exists():
-                return Response(
-                    {'error': 'Item is already in cart'},
-                    status=status.HTTP_409_CONFLICT)
-
             if int(product.quantity) > 0:
-                CartItem.objects.create(
-                    product=product, cart=cart, count=count
-                )
-
-                if CartItem.objects.filter(cart=cart, product=product).exists():
-                    total_items = int(cart.total_items) + 1
-                    Cart.objects.filter(user=user).update(
-                        total_items=total_items
-                    )
-
-                    cart_items = CartItem.objects.order_by(
-                        'product').filter(cart=cart)
-
-                    result = []
-
-                    for cart_item in cart_items:
-
-                        item = {}
-                        item['id'] = cart_item.id
-                        item['count'] = cart_item.count
-                        product = Product.objects.get(id=cart_item.product.id)
-                        product = ProductSerializer(product)
+                # la restriccion unica (cart, product) evita items duplicados
+                try:
+                    with transaction.atomic():
+                        CartItem.objects.create(
+                            product=product, cart=cart, count=count
+                        )
+                except IntegrityError:
+                    return Response(
+                        {'error': 'Item is already in cart'},
+                        status=status.HTTP_409_CONFLICT)
 
-                        item['product'] = product.data
+                Cart.objects.filter(user=user).update(
+                    total_items=F('total_items') + 1
+                )
+                bump_cart_version(user)
 
-                        result.append(item)
+                result = get_cart_snapshot(user)['cart']
 
-                    return Response({'cart': result}, status=status.HTTP_201_CREATED)
-                else:
-                    return Response(
-                        {'error': 'Not enough of this item in stock'},
-                        status=status.HTTP_200_OK)
+                return Response({'cart': result}, status=status.HTTP_201_CREATED)
+            else:
+                return Response(
+                    {'error': 'Not enough of this item in stock'},
+                    status=status.HTTP_200_OK)
         except:
             return Response(
                 {'error': 'Something went wrong when adding item to cart'},
@@ -140,22 +115,11 @@ class GetTotalView(APIView):
         user = self.request.user
 
         try:
-            cart = Cart.objects.get(user=user)
-            cart_items = CartItem.objects.filter(cart=cart)
-
-            total_cost = 0.0
-            total_compare_cost = 0.0
-
-            if cart_items.exists():
-                for cart_item in cart_items:
-                    total_cost += (float(cart_item.product.price)
-                                   * float(cart_item.count))
-                    total_compare_cost += (float(cart_item.product.compare_price)
-                                           * float(cart_item.count))
-                total_cost = round(total_cost, 2)
-                total_compare_cost = round(total_compare_cost, 2)
+            snapshot = get_cart_snapshot(user)
+
             return Response(
-                {'total_cost': total_cost, 'total_compare_cost': total_compare_cost},
+                {'total_cost': snapshot['total_cost'],
+                 'total_compare_cost': snapshot['total_compare_cost']},
                 status=status.HTTP_200_OK)
         except:
             return Response(
@@ -179,8 +143,7 @@ class GetItemTotalView(APIView):
         user = self.request.user
 
         try:
-            cart = Cart.objects.get(user=user)
-            total_items = cart.total_items
+            total_items = get_cart_snapshot(user)['total_items']
 
             return Response(
                 {'total_items': total_items},
@@ -241,23 +204,9 @@ class UpdateItemView(APIView):
                 CartItem.objects.filter(
                     product=product, cart=cart
                 ).update(count=count)
+                bump_cart_version(user)
 
-                cart_items = CartItem.objects.order_by(
-                    'product').filter(cart=cart)
-
-                result = []
-
-                for cart_item in cart_items:
-                    item = {}
-
-                    item['id'] = cart_item.id
-                    item['count'] = cart_item.count
-                    product = Product.objects.get(id=cart_item.product.id)
-                    product = ProductSerializer(product)
-
-                    item['product'] = product.data
-
-                    result.append(item)
+                result = get_cart_snapshot(user)['cart']
 
                 return Response({'cart': result}, status=status.HTTP_200_OK)
             else:
@@ -312,23 +261,9 @@ class RemoveItemView(APIView):
                 # actualizar numero total en el carrito
                 total_items = int(cart.total_items) - 1
                 Cart.objects.filter(user=user).update(total_items=total_items)
+            bump_cart_version(user)
 
-            cart_items = CartItem.objects.order_by('product').filter(cart=cart)
-
-            result = []
-
-            if CartItem.objects.filter(cart=cart).exists():
-                for cart_item in cart_items:
-                    item = {}
-
-                    item['id'] = cart_item.id
-                    item['count'] = cart_item.count
-                    product = Product.objects.get(id=cart_item.product.id)
-                    product = ProductSerializer(product)
-
-                    item['product'] = product.data
-
-                    result.append(item)
+            result = get_cart_snapshot(user)['cart']
 
             return Response({'cart': result}, status=status.HTTP_200_OK)
         except:
@@ -363,6 +298,7 @@ class EmptyCartView(APIView):
 
             # Actualizamos carrito
             Cart.objects.filter(user=user).update(total_items=0)
+            bump_cart_version(user)
 
             return Response(
                 {'success': 'Cart emptied successfully'},
@@ -374,70 +310,59 @@ class EmptyCartView(APIView):
 
 
 class SynchCartView(APIView):
+    """
+    API endpoint para sincronizar el carrito de invitado con el carrito del usuario.
+    """
+
     def put(self, request, format=None):
+        """
+        Agrega o suma en bloque los items recibidos al carrito del usuario actual.
+
+        Returns:
+            Response: Resultado de la sincronización por cada item o mensaje de error.
+        """
         user = self.request.user
         data = self.request.data
 
         try:
             cart_items = data['cart_items']
 
-            for cart_item in cart_items:
-                cart = Cart.objects.get(user=user)
+            results = synch_cart(user, cart_items)
 
-                try:
-                    product_id = int(cart_item['product_id'])
-                except:
-                    return Response(
-                        {'error': 'Product ID must be an integer'},
-                        status=status.HTTP_404_NOT_FOUND)
+            return Response(
+                {'success': 'Cart Synchronized', 'results': results},
+                status=status.HTTP_201_CREATED)
+        except:
+            return Response(
+                {'error': 'Something went wrong when synching cart'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-                if not Product.objects.filter(id=product_id).exists():
-                    return Response(
-                        {'error': 'Product with this ID does not exist'},
-                        status=status.HTTP_404_NOT_FOUND)
-
-                product = Product.objects.get(id=product_id)
-                quantity = product.quantity
-
-                if CartItem.objects.filter(cart=cart, product=product).exists():
-                    # Actualiizamos el item del carrito
-                    item = CartItem.objects.get(cart=cart, product=product)
-                    count = item.count
-
-                    try:
-                        cart_item_count = int(cart_item['count'])
-                    except:
-                        cart_item_count = 1
-
-                    # Chqueo con base de datos
-                    if (cart_item_count + int(count)) <= int(quantity):
-                        updated_count = cart_item_count + int(count)
-                        CartItem.objects.filter(
-                            cart=cart, product=product
-                        ).update(count=updated_count)
-                else:
-                    # Agregar el item al carrito del usuario
-                    try:
-                        cart_item_count = int(cart_item['count'])
-                    except:
-                        cart_item_count = 1
-
-                    if cart_item_count <= quantity:
-                        CartItem.objects.create(
-                            product=product, cart=cart, count=cart_item_count
-                        )
 
-                        if CartItem.objects.filter(cart=cart, product=product).exists():
-                            # Sumar item
-                            total_items = int(cart.total_items) + 1
-                            Cart.objects.filter(user=user).update(
-                                total_items=total_items
-                            )
+class GetBoughtTogetherView(APIView):
+    """
+    API endpoint para sugerir productos que suelen comprarse junto con los del carrito.
+    """
 
-                return Response(
-                    {'success': 'Cart Synchronized'},
-                    status=status.HTTP_201_CREATED)
+    def get(self, request, format=None):
+        """
+        Obtiene los productos comprados junto con los items del carrito del usuario actual.
+
+        Returns:
+            Response: Productos sugeridos, del más al menos relacionado, o mensaje de error.
+        """
+        user = self.request.user
+
+        try:
+            product_ids = list(CartItem.objects.filter(
+                cart__user=user).values_list('product_id', flat=True))
+
+            products = ProductSerializer(
+                get_bought_together(product_ids), many=True)
+
+            return Response(
+                {'bought_together': products.data},
+                status=status.HTTP_200_OK)
         except:
             return Response(
-                {'error': 'Something went wrong when synching cart'},
+                {'error': 'Something went wrong when retrieving suggestions'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR)
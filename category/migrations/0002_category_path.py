@@ -0,0 +1,39 @@
+# Generated by Django 5.0.6 on 2026-10-18 20:13
+
+from django.db import migrations, models
+
+
+def populate_paths(apps, schema_editor):
+    Category = apps.get_model('category', 'Category')
+
+    parents = dict(Category.objects.values_list('id', 'parent_id'))
+    paths = {}
+
+    def path_of(category_id):
+        if category_id not in paths:
+            parent_id = parents[category_id]
+            prefix = path_of(parent_id) if parent_id else '/'
+            paths[category_id] = '%s%s/' % (prefix, category_id)
+        return paths[category_id]
+
+    categories = [
+        Category(id=category_id, path=path_of(category_id))
+        for category_id in parents
+    ]
+    Category.objects.bulk_update(categories, ['path'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255, verbose_name='Ruta'),
+        ),
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import CharField, Value
+from django.db.models.functions import Concat, Substr
 from django.utils.translation import gettext_lazy as _
 # Create your models here.
 
@@ -12,6 +14,57 @@ class Category(models.Model):
         'self', related_name='children', on_delete=models.CASCADE, blank=True, null=True)
     name = models.CharField(
         _('Nombre de categoría'), max_length=255, unique=True)
+    # Ruta materializada con los IDs desde la raíz, p. ej. '/1/4/7/'
+    path = models.CharField(
+        max_length=255, db_index=True, editable=False, default='', verbose_name=_('Ruta'))
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        """
+        Guarda la categoría y mantiene la ruta materializada de su subárbol.
+
+        Si la categoría cambia de padre, la ruta de todos sus descendientes se
+        reescribe con un único UPDATE.
+
+        Raises:
+            ValueError: Si el nuevo padre es la misma categoría o uno de sus
+                descendientes.
+        """
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            paths = dict(
+                Category.objects.filter(
+                    id__in=[self.id, self.parent_id]
+                ).values_list('id', 'path')
+            )
+            old_path = paths[self.id]
+
+            if self.parent_id is None:
+                path = '/%s/' % self.id
+            else:
+                parent_path = paths[self.parent_id]
+
+                if old_path and parent_path.startswith(old_path):
+                    raise ValueError(
+                        'A category cannot be moved below itself')
+
+                path = '%s%s/' % (parent_path, self.id)
+
+            if path != old_path:
+                Category.objects.filter(id=self.id).update(path=path)
+
+                if old_path:
+                    Category.objects.filter(
+                        path__startswith=old_path
+                    ).exclude(id=self.id).update(
+                        path=Concat(
+                            Value(path),
+                            Substr('path', len(old_path) + 1),
+                            output_field=CharField()
+                        )
+                    )
+
+            self.path = path
@@ -0,0 +1,144 @@
+from django.core.cache import cache
+from ecommerce.versions import bump_version
+from .models import Category
+
+CATEGORY_TREE_KEY = 'category:tree'
+CATEGORY_DESCENDANTS_KEY = 'category:descendants'
+CATEGORY_VERSION_KEY = 'category:version'
+
+
+def build_category_tree():
+    """
+    Construye el árbol completo de categorías con una sola consulta.
+
+    Cada categoría se agrega a la lista 'sub_categories' de su padre usando un
+    índice por ID, por lo que el árbol admite cualquier profundidad y se arma en
+    tiempo lineal.
+
+    Returns:
+        list: Categorías principales con sus subcategorías anidadas.
+    """
+    nodes = {}
+    parents = []
+
+    for category_id, parent_id, name in Category.objects.order_by(
+            'id').values_list('id', 'parent_id', 'name'):
+        nodes[category_id] = {
+            'id': category_id,
+            'name': name,
+            'sub_categories': []
+        }
+        parents.append((category_id, parent_id))
+
+    result = []
+
+    for category_id, parent_id in parents:
+        if parent_id is None:
+            result.append(nodes[category_id])
+        else:
+            nodes[parent_id]['sub_categories'].append(nodes[category_id])
+
+    return result
+
+
+def build_descendant_index():
+    """
+    Construye el índice de descendientes de todas las categorías.
+
+    Usa la ruta materializada de cada categoría, por lo que basta una consulta
+    para agregar cada categoría a la lista de todos sus ancestros.
+
+    Returns:
+        dict: ID de categoría -> lista con su ID y los de sus descendientes.
+    """
+    index = {}
+
+    for category_id, path in Category.objects.order_by(
+            'path').values_list('id', 'path'):
+        index[category_id] = []
+
+        for ancestor_id in path.strip('/').split('/'):
+            index[int(ancestor_id)].append(category_id)
+
+    return index
+
+
+def get_category_tree():
+    """
+    Obtiene el árbol de categorías desde la cache.
+
+    Una lectura es una sola consulta a la cache. Si la entrada no existe se
+    construye y se guarda con cache.add, de modo que no reemplaza el árbol que
+    refresh_category_tree haya escrito mientras tanto.
+
+    Returns:
+        list: Categorías principales con sus subcategorías anidadas.
+    """
+    return _get_cached(CATEGORY_TREE_KEY, build_category_tree)
+
+
+def get_descendant_ids(category_id):
+    """
+    Obtiene desde la cache los IDs de una categoría y todos sus descendientes.
+
+    Returns:
+        list | None: IDs de la categoría y sus descendientes a cualquier
+        profundidad, o None si la categoría no existe.
+    """
+    return _get_cached(
+        CATEGORY_DESCENDANTS_KEY, build_descendant_index).get(category_id)
+
+
+def get_child_categories(category_id):
+    """
+    Obtiene desde la cache las subcategorías directas de una categoría.
+
+    Args:
+        category_id (int): ID de la categoría, o 0 para las categorías
+            principales.
+
+    Returns:
+        list | None: Diccionarios con 'id' y 'name' de cada subcategoría, o
+        None si la categoría no existe.
+    """
+    nodes = get_category_tree()
+
+    if category_id != 0:
+        stack = list(nodes)
+        nodes = None
+
+        while stack:
+            node = stack.pop()
+
+            if node['id'] == category_id:
+                nodes = node['sub_categories']
+                break
+
+            stack.extend(node['sub_categories'])
+
+        if nodes is None:
+            return None
+
+    return [{'id': node['id'], 'name': node['name']} for node in nodes]
+
+
+def refresh_category_tree():
+    """
+    Reconstruye el árbol y el índice de descendientes, los escribe en la cache
+    y avanza la versión de las categorías.
+    """
+    cache.set_many({
+        CATEGORY_TREE_KEY: build_category_tree(),
+        CATEGORY_DESCENDANTS_KEY: build_descendant_index(),
+    }, None)
+    bump_version(CATEGORY_VERSION_KEY)
+
+
+def _get_cached(key, build):
+    value = cache.get(key)
+
+    if value is None:
+        value = build()
+        cache.add(key, value, None)
+
+    return value
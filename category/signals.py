@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Category
+from .services import refresh_category_tree
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_tree(sender, **kwargs):
+    """
+    Reconstruye el árbol de categorías en cache cuando la transacción se confirma.
+    """
+    transaction.on_commit(refresh_category_tree)
@@ -1,3 +1,91 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+from .models import Category
+from .services import get_descendant_ids
 
 # Create your tests here.
+
+
+class CategoryTreeTests(TransactionTestCase):
+    """
+    Verifica el árbol de categorías en cache.
+
+    Usa TransactionTestCase para que los callbacks de on_commit se ejecuten.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.root = Category.objects.create(name='Root')
+        self.child = Category.objects.create(name='Child', parent=self.root)
+        self.grandchild = Category.objects.create(
+            name='Grandchild', parent=self.child)
+
+    def get_categories(self):
+        return self.client.get('/api/category/categories').data['categories']
+
+    def test_tree_supports_any_depth(self):
+        self.assertEqual(self.get_categories(), [{
+            'id': self.root.id,
+            'name': 'Root',
+            'sub_categories': [{
+                'id': self.child.id,
+                'name': 'Child',
+                'sub_categories': [{
+                    'id': self.grandchild.id,
+                    'name': 'Grandchild',
+                    'sub_categories': []
+                }]
+            }]
+        }])
+
+    def test_tree_is_served_from_cache(self):
+        self.get_categories()
+
+        with self.assertNumQueries(0):
+            self.get_categories()
+
+    def test_tree_is_refreshed_when_a_category_changes(self):
+        self.get_categories()
+
+        self.grandchild.name = 'Renamed'
+        self.grandchild.save()
+        other = Category.objects.create(name='Other')
+
+        categories = self.get_categories()
+
+        self.assertEqual(
+            categories[0]['sub_categories'][0]['sub_categories'][0]['name'],
+            'Renamed')
+        self.assertEqual(categories[1]['id'], other.id)
+
+        self.root.delete()
+
+        self.assertEqual([c['id'] for c in self.get_categories()], [other.id])
+
+    def test_paths_follow_moves(self):
+        self.assertEqual(self.grandchild.path, '/%s/%s/%s/' % (
+            self.root.id, self.child.id, self.grandchild.id))
+
+        other = Category.objects.create(name='Other')
+        self.child.parent = other
+        self.child.save()
+
+        self.grandchild.refresh_from_db()
+        self.assertEqual(self.grandchild.path, '/%s/%s/%s/' % (
+            other.id, self.child.id, self.grandchild.id))
+        self.assertEqual(get_descendant_ids(self.root.id), [self.root.id])
+        self.assertCountEqual(
+            get_descendant_ids(other.id),
+            [other.id, self.child.id, self.grandchild.id])
+        self.assertIsNone(get_descendant_ids(0))
+
+    def test_category_cannot_be_moved_below_itself(self):
+        self.root.parent = self.grandchild
+
+        with self.assertRaises(ValueError):
+            self.root.save()
+
+        self.root.refresh_from_db()
+        self.assertIsNone(self.root.parent)
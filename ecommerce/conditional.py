@@ -0,0 +1,54 @@
+from datetime import datetime, timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from .versions import get_version
+
+
+def version_condition(version_key):
+    """
+    Agrega ETag y Last-Modified al método GET de una vista a partir de una
+    versión de ecommerce.versions.
+
+    La versión es una marca de tiempo en microsegundos, así que sirve a la vez
+    como ETag y como fecha de modificación. Si el cliente envía una ETag o una
+    fecha vigentes se responde 304 sin ejecutar la vista. La fecha tiene
+    precisión de segundos, por lo que la ETag es la que detecta cambios
+    dentro del mismo segundo.
+
+    Args:
+        version_key: Llave de la versión, o función que recibe los mismos
+            argumentos que la vista y devuelve la llave, o None si la petición
+            no admite respuestas condicionales.
+
+    Returns:
+        Decorador para métodos de vistas basadas en clases.
+    """
+
+    def get_request_version(request, *args, **kwargs):
+        key = version_key
+        if callable(version_key):
+            key = version_key(request, *args, **kwargs)
+
+        if key is None:
+            return None
+
+        # condition() pide la ETag y la fecha por separado
+        versions = request.__dict__.setdefault('_condition_versions', {})
+        if key not in versions:
+            versions[key] = get_version(key)
+
+        return versions[key]
+
+    def etag(request, *args, **kwargs):
+        version = get_request_version(request, *args, **kwargs)
+        return None if version is None else str(version)
+
+    def last_modified(request, *args, **kwargs):
+        version = get_request_version(request, *args, **kwargs)
+        if version is None:
+            return None
+
+        return datetime.fromtimestamp(version / 1000000, tz=timezone.utc)
+
+    return method_decorator(
+        condition(etag_func=etag, last_modified_func=last_modified))
@@ -0,0 +1,131 @@
+from datetime import date, datetime
+from decimal import Decimal
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+PAGE_SIZE = settings.REST_FRAMEWORK['PAGE_SIZE']
+MAX_PAGE_SIZE = 100
+
+_SALT = 'ecommerce.pagination'
+
+
+class InvalidCursor(Exception):
+    """
+    Se lanza cuando un cursor no es válido para el orden pedido.
+    """
+
+
+def get_page_size(limit, default=PAGE_SIZE):
+    """
+    Convierte el límite pedido por el cliente en un tamaño de página válido.
+
+    Raises:
+        ValueError: Si el límite no es un entero.
+
+    Returns:
+        int: Tamaño de página entre 1 y MAX_PAGE_SIZE.
+    """
+    if not limit:
+        return default
+
+    limit = int(limit)
+
+    if limit <= 0:
+        return default
+
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def keyset_paginate(items, ordering, cursor=None, page_size=PAGE_SIZE):
+    """
+    Devuelve una página de resultados usando paginación por llave (keyset).
+
+    Los resultados se ordenan por el campo de ordering y luego por ID en la
+    misma dirección. El cursor guarda la llave del último resultado de la
+    página, y la página siguiente se obtiene con un WHERE sobre esa llave en
+    lugar de un OFFSET, por lo que el costo no crece con el número de página
+    si existe un índice sobre (campo, id).
+
+    Args:
+        items: QuerySet, o lista ya ordenada por (campo, id) en la dirección
+            de ordering.
+        ordering (str): Campo de orden, con '-' para orden descendente.
+        cursor (str): Cursor devuelto con la página anterior, o None.
+        page_size (int): Resultados por página.
+
+    Raises:
+        InvalidCursor: Si el cursor fue alterado o es de otro orden.
+
+    Returns:
+        tuple: Lista con los resultados de la página y el cursor de la página
+        siguiente, o None si no hay más resultados.
+    """
+    descending = ordering.startswith('-')
+    field = ordering.lstrip('-')
+    is_list = isinstance(items, list)
+
+    if cursor:
+        if is_list:
+            model = type(items[0]) if items else None
+        else:
+            model = items.model
+
+        value, last_id = _decode(cursor, ordering, model)
+
+        if is_list and descending:
+            items = [item for item in items
+                     if (getattr(item, field), item.id) < (value, last_id)]
+        elif is_list:
+            items = [item for item in items
+                     if (getattr(item, field), item.id) > (value, last_id)]
+        elif descending:
+            items = items.filter(
+                Q(**{field + '__lte': value})
+                & (Q(**{field + '__lt': value}) | Q(id__lt=last_id)))
+        else:
+            items = items.filter(
+                Q(**{field + '__gte': value})
+                & (Q(**{field + '__gt': value}) | Q(id__gt=last_id)))
+
+    if not is_list:
+        items = items.order_by(ordering, '-id' if descending else 'id')
+
+    page = list(items[:page_size + 1])
+
+    if len(page) <= page_size:
+        return page, None
+
+    page = page[:page_size]
+    last = page[-1]
+
+    return page, _encode(ordering, getattr(last, field), last.id)
+
+
+def _encode(ordering, value, last_id):
+    if isinstance(value, (date, datetime, Decimal)):
+        value = str(value)
+
+    return signing.dumps([ordering, value, last_id], salt=_SALT, compress=True)
+
+
+def _decode(cursor, ordering, model):
+    try:
+        cursor_ordering, value, last_id = signing.loads(cursor, salt=_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise InvalidCursor()
+
+    if cursor_ordering != ordering:
+        raise InvalidCursor()
+
+    if model is not None:
+        try:
+            value = model._meta.get_field(ordering.lstrip('-')).to_python(value)
+        except FieldDoesNotExist:
+            # Campos anotados como 'rank' se guardan con su tipo JSON
+            pass
+        except ValidationError:
+            raise InvalidCursor()
+
+    return value, last_id
@@ -125,6 +125,16 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
 # Auth User Model
 AUTH_USER_MODEL = 'user.UserAccount'
 
@@ -257,7 +267,29 @@ DJOSER = {
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
-BT_ENVIRONMENT = config('BT_ENVIRONMENT')
-BT_MERCHANT_ID = config('BT_MERCHANT_ID')
-BT_PUBLIC_KEY = config('BT_PUBLIC_KEY')
-BT_PRIVATE_KEY = config('BT_PRIVATE_KEY')
\ No newline at end of file
+# Configuración de texto de PostgreSQL usada por la búsqueda de productos
+SEARCH_CONFIG = config('SEARCH_CONFIG', default='spanish')
+
+# URLs notificadas por el outbox de pagos cuando se crea una orden
+ORDER_WEBHOOK_URLS = config('ORDER_WEBHOOK_URLS', default='', cast=Csv())
+
+# Pasarela de pago, payment.gateways.FakeGateway para pruebas de carga locales
+PAYMENT_GATEWAY = config('PAYMENT_GATEWAY', default='payment.gateways.BraintreeGateway')
+
+if PAYMENT_GATEWAY == 'payment.gateways.FakeGateway':
+    PAYMENT_GATEWAY_OPTIONS = {
+        'latency_ms': config('FAKE_GATEWAY_LATENCY_MS', default=0, cast=float),
+        'jitter_ms': config('FAKE_GATEWAY_JITTER_MS', default=0, cast=float),
+        'failure_rate': config('FAKE_GATEWAY_FAILURE_RATE', default=0, cast=float),
+        'error_rate': config('FAKE_GATEWAY_ERROR_RATE', default=0, cast=float),
+        'seed': config('FAKE_GATEWAY_SEED', default=0, cast=int),
+    }
+else:
+    PAYMENT_GATEWAY_OPTIONS = {
+        'timeout': config('BT_TIMEOUT', default=60, cast=int),
+    }
+
+BT_ENVIRONMENT = config('BT_ENVIRONMENT', default='sandbox')
+BT_MERCHANT_ID = config('BT_MERCHANT_ID', default='')
+BT_PUBLIC_KEY = config('BT_PUBLIC_KEY', default='')
+BT_PRIVATE_KEY = config('BT_PRIVATE_KEY', default='')
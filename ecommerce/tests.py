@@ -0,0 +1,230 @@
+from unittest import skipUnless
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+from cart.models import Cart, CartItem
+from category.models import Category
+from orders.models import Order, OrderItem
+from payment.pricing import Line
+from payment.services import reserve_stock
+from products.models import Product
+from reviews.models import Review
+from shipping.models import Shipping
+from wishlist.models import WishList, WishListItem
+
+# Create your tests here.
+
+User = get_user_model()
+
+
+def index_name(model, fields):
+    """
+    Nombre del índice o de la restricción única de model sobre fields.
+    """
+    for index in model._meta.indexes + model._meta.constraints:
+        if list(index.fields) == fields:
+            return index.name
+
+    raise LookupError('%s has no index on %s' % (model.__name__, fields))
+
+
+class HotQueryFixture(TestCase):
+    """
+    Datos mínimos para las consultas más frecuentes de la tienda.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='indexes@example.com', password='Test12345',
+            first_name='Index', last_name='Tester')
+        cls.category = Category.objects.create(name='Category')
+        cls.product = Product.objects.create(
+            name='Product', description='Description', price='10.00',
+            compare_price='12.00', category=cls.category, quantity=10)
+        cls.cart = Cart.objects.get(user=cls.user)
+        cls.wishlist = WishList.objects.get(user=cls.user)
+        cls.order = Order.objects.create(
+            user=cls.user, transaction_id='tx-indexes', amount='10.00',
+            full_name='Index Tester', address_line_1='Address', city='City',
+            state_province_region='Region', postal_zip_code='01001',
+            telephone_number='5555', shipping_name='Standard',
+            shipping_time='1 day', shipping_price='0.00')
+        OrderItem.objects.create(
+            product=cls.product, order=cls.order, name='Product',
+            price='10.00', count=1)
+        Review.objects.create(
+            user=cls.user, product=cls.product, rating=5, comment='Good')
+
+
+class UniqueConstraintTests(HotQueryFixture):
+    """
+    Verifica que la base de datos rechace items y reseñas duplicados.
+    """
+
+    def assertRejected(self, create):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            create()
+
+    def test_cart_item_is_unique_per_cart(self):
+        CartItem.objects.create(cart=self.cart, product=self.product, count=1)
+
+        self.assertRejected(lambda: CartItem.objects.create(
+            cart=self.cart, product=self.product, count=1))
+
+    def test_wishlist_item_is_unique_per_wishlist(self):
+        WishListItem.objects.create(wishlist=self.wishlist, product=self.product)
+
+        self.assertRejected(lambda: WishListItem.objects.create(
+            wishlist=self.wishlist, product=self.product))
+
+    def test_review_is_unique_per_user(self):
+        self.assertRejected(lambda: Review.objects.create(
+            user=self.user, product=self.product, rating=1, comment='Bad'))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN plans are PostgreSQL specific')
+class IndexUsageTests(HotQueryFixture):
+    """
+    Verifica que las consultas más frecuentes se resuelvan con índices.
+
+    Con tan pocas filas el planificador preferiría leer la tabla completa, por
+    lo que se desactiva el Seq Scan. Como los índices de una sola columna de
+    las llaves foráneas también evitan el Seq Scan, cada prueba exige además
+    que el plan use el índice compuesto esperado.
+    """
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, fields):
+        plan = queryset.explain()
+        self.assertNotIn('Seq Scan', plan, plan)
+        self.assertIn(index_name(queryset.model, fields), plan, plan)
+
+    def test_products_by_category(self):
+        for ordering in ('-sold', '-price', '-date_created'):
+            with self.subTest(ordering=ordering):
+                self.assertUsesIndex(Product.objects.filter(
+                    category=self.category).order_by(ordering)[:6],
+                    ['category', ordering.lstrip('-')])
+
+    def test_product_reviews(self):
+        self.assertUsesIndex(Review.objects.filter(
+            product=self.product).order_by('-date_created', '-id')[:20],
+            ['product', 'date_created', 'id'])
+
+    def test_user_review(self):
+        self.assertUsesIndex(Review.objects.filter(
+            user=self.user, product=self.product), ['user', 'product'])
+
+    def test_cart_item(self):
+        self.assertUsesIndex(CartItem.objects.filter(
+            cart=self.cart, product=self.product), ['cart', 'product'])
+
+    def test_wishlist_item(self):
+        self.assertUsesIndex(WishListItem.objects.filter(
+            wishlist=self.wishlist, product=self.product),
+            ['wishlist', 'product'])
+
+    def test_user_orders(self):
+        self.assertUsesIndex(Order.objects.filter(
+            user=self.user).order_by('-date_issued'), ['user', 'date_issued'])
+
+    def test_order_items(self):
+        self.assertUsesIndex(OrderItem.objects.filter(
+            order=self.order).order_by('-date_added'), ['order', 'date_added'])
+
+
+class ConditionalGetTests(TransactionTestCase):
+    """
+    Verifica las respuestas 304 de los endpoints públicos del catálogo.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name='Category')
+        self.product = Product.objects.create(
+            name='Product', description='Description', price='10.00',
+            compare_price='12.00', category=self.category)
+        Shipping.objects.create(
+            name='Standard', time_to_delivery='1 day', price='5.00')
+
+    def assertRevalidates(self, url, change):
+        response = self.client.get(url)
+        etag = response.headers['ETag']
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response.headers)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        change()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_product_detail(self):
+        self.assertRevalidates(
+            '/api/product/product/%s' % self.product.id,
+            lambda: self.product.save())
+
+    def test_product_detail_ignores_other_products(self):
+        other = Product.objects.create(
+            name='Other', description='Description', price='10.00',
+            compare_price='12.00', category=self.category, quantity=5)
+        url = '/api/product/product/%s' % self.product.id
+        etag = self.client.get(url).headers['ETag']
+
+        reserve_stock([Line(other.id, other.name, other.price,
+                            other.compare_price, 1)])
+        other.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_product_detail_follows_sales(self):
+        self.product.quantity = 5
+        self.product.save()
+
+        self.assertRevalidates(
+            '/api/product/product/%s' % self.product.id,
+            lambda: reserve_stock([Line(
+                self.product.id, self.product.name, self.product.price,
+                self.product.compare_price, 1)]))
+
+    def test_product_list(self):
+        self.assertRevalidates(
+            '/api/product/get-products',
+            lambda: Product.objects.create(
+                name='Other', description='Description', price='10.00',
+                compare_price='12.00', category=self.category))
+
+    def test_categories(self):
+        self.assertRevalidates(
+            '/api/category/categories',
+            lambda: Category.objects.create(name='Other'))
+
+    def test_shipping(self):
+        self.assertRevalidates(
+            '/api/shipping/get-shipping-options',
+            lambda: Shipping.objects.create(
+                name='Express', time_to_delivery='1 hour', price='15.00'))
+
+    def test_reviews(self):
+        user = User.objects.create_user(
+            email='conditional@example.com', password='Test12345',
+            first_name='Conditional', last_name='Tester')
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        self.assertRevalidates(
+            '/api/reviews/get-reviews/%s' % self.product.id,
+            lambda: client.post(
+                '/api/reviews/create-review/%s' % self.product.id,
+                {'rating': 5, 'comment': 'Good'}, format='json'))
@@ -0,0 +1,77 @@
+import time
+from django.core.cache import cache
+
+# Las versiones son marcas de tiempo en microsegundos guardadas en la cache.
+# Si una entrada se pierde se regenera con el instante actual, por lo que una
+# versión nunca vuelve a un valor anterior y no se sirven datos viejos.
+
+
+def _now():
+    return time.time_ns() // 1000
+
+
+def get_version(key):
+    """
+    Obtiene la versión actual asociada a una llave de la cache.
+
+    Returns:
+        int: Versión actual, creada en el momento si no existía.
+    """
+    version = cache.get(key)
+
+    if version is None:
+        version = _now()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+
+    return version
+
+
+def bump_version(key):
+    """
+    Avanza la versión de una llave para invalidar todo lo que dependa de ella.
+
+    Returns:
+        int: Nueva versión.
+    """
+    version = max(_now(), cache.get(key, 0) + 1)
+    cache.set(key, version, None)
+
+    return version
+
+
+def get_versions(keys):
+    """
+    Obtiene las versiones de varias llaves con una sola lectura de la cache.
+
+    Returns:
+        dict: Versión actual de cada llave, creada en el momento si no existía.
+    """
+    versions = cache.get_many(keys)
+
+    for key in keys:
+        if key not in versions:
+            versions[key] = get_version(key)
+
+    return versions
+
+
+def bump_versions(keys):
+    """
+    Avanza las versiones de varias llaves con una lectura y una escritura.
+
+    Returns:
+        dict: Nueva versión de cada llave.
+    """
+    now = _now()
+    versions = {
+        key: max(now, version + 1)
+        for key, version in cache.get_many(keys).items()
+    }
+
+    for key in keys:
+        versions.setdefault(key, now)
+
+    cache.set_many(versions, None)
+
+    return versions
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
 
 application = get_wsgi_application()
+
+# Construir el índice de autocompletado antes de la primera petición
+from products.autocomplete import warm_up  # noqa: E402
+
+warm_up()
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-18 20:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_alter_order_address_line_1_and_more'),
+        ('products', '0005_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'date_issued'], name='orders_orde_user_id_34035e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['order', 'date_added'], name='orders_orde_order_i_5ba155_idx'),
+        ),
+    ]
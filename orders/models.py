@@ -10,6 +10,11 @@ from django.utils.translation import gettext_lazy as _
 User = get_user_model()
 
 class Order(models.Model):
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date_issued']),
+        ]
+
     class OrderStatus(models.TextChoices):
         not_processed = 'not_processed'
         processed = 'processed'
@@ -41,6 +46,11 @@ class Order(models.Model):
 
 
 class OrderItem(models.Model):
+    class Meta:
+        indexes = [
+            models.Index(fields=['order', 'date_added']),
+        ]
+
     product = models.ForeignKey(Product, on_delete=models.DO_NOTHING, verbose_name=_('Producto'))
     order = models.ForeignKey(Order, on_delete=models.CASCADE, verbose_name=_('Pedido'))
     name = models.CharField(max_length=255, verbose_name=_('Nombre'))
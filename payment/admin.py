@@ -1,3 +1,24 @@
 from django.contrib import admin
+from .models import OutboxJob, IdempotencyKey
 
 # Register your models here.
+
+
+class OutboxJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'attempts', 'available_at', )
+    list_display_links = ('id', 'kind', )
+    list_filter = ('status', 'kind', )
+    list_per_page = 25
+
+
+admin.site.register(OutboxJob, OutboxJobAdmin)
+
+
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ('id', 'key', 'user', 'status_code', 'date_created', )
+    list_display_links = ('id', 'key', )
+    search_fields = ('key', )
+    list_per_page = 25
+
+
+admin.site.register(IdempotencyKey, IdempotencyKeyAdmin)
@@ -0,0 +1,244 @@
+import random
+import threading
+import time
+from functools import lru_cache
+from typing import NamedTuple, Optional
+import braintree
+import requests
+from braintree.environment import Environment
+from braintree.util.http import Http
+from django.conf import settings
+from django.test.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+POOL_SIZE = 10
+
+
+class GatewayError(Exception):
+    """
+    Se lanza cuando la pasarela de pago no puede procesar la petición.
+    """
+
+
+class SaleResult(NamedTuple):
+    """
+    Resultado de un cobro, independiente de la pasarela usada.
+    """
+
+    is_success: bool
+    transaction_id: Optional[str]
+
+
+class PaymentGateway:
+    """
+    Interfaz común de las pasarelas de pago.
+    """
+
+    def generate_client_token(self):
+        """
+        Genera el token que el cliente usa para obtener un nonce de pago.
+
+        Returns:
+            str: Token del cliente.
+        """
+        raise NotImplementedError
+
+    def sale(self, amount, nonce):
+        """
+        Cobra un monto y lo envía a liquidación.
+
+        Args:
+            amount (Decimal): Monto a cobrar.
+            nonce (str): Nonce del método de pago obtenido desde el cliente.
+
+        Returns:
+            SaleResult: Resultado del cobro.
+        """
+        raise NotImplementedError
+
+
+class PooledHttp(Http):
+    """
+    Estrategia HTTP de Braintree que reutiliza conexiones entre peticiones.
+
+    El Http del SDK abre un requests.Session nuevo en cada llamada, por lo que
+    cada cobro paga de nuevo el handshake TCP y TLS. Esta estrategia comparte
+    un Session con un pool de POOL_SIZE conexiones por host.
+    """
+
+    _session = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def session(cls):
+        with cls._lock:
+            if cls._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                # ver https://github.com/psf/requests/issues/5677
+                session.proxies.update(requests.utils.getproxies())
+                cls._session = session
+
+            return cls._session
+
+    def http_do(self, http_verb, path, headers, request_body):
+        data = request_body
+        files = None
+
+        if type(request_body) is tuple:
+            data, files = request_body
+
+        if self.config.environment == Environment.Development:
+            verify = False
+        else:
+            verify = self.environment.ssl_certificate
+
+        response = self.session().request(
+            http_verb,
+            path,
+            headers=headers,
+            data=data,
+            files=files,
+            verify=verify,
+            timeout=self.config.timeout
+        )
+
+        return [response.status_code, response.text]
+
+
+class BraintreeGateway(PaymentGateway):
+    """
+    Pasarela de pago de Braintree.
+
+    El cliente del SDK se construye en el primer uso, de modo que importar las
+    vistas no requiere credenciales.
+    """
+
+    def __init__(self, timeout=60):
+        self.timeout = timeout
+        self._gateway = None
+        self._lock = threading.Lock()
+
+    @property
+    def gateway(self):
+        with self._lock:
+            if self._gateway is None:
+                self._gateway = braintree.BraintreeGateway(
+                    braintree.Configuration(
+                        environment=settings.BT_ENVIRONMENT,
+                        merchant_id=settings.BT_MERCHANT_ID,
+                        public_key=settings.BT_PUBLIC_KEY,
+                        private_key=settings.BT_PRIVATE_KEY,
+                        http_strategy=PooledHttp,
+                        timeout=self.timeout
+                    )
+                )
+
+            return self._gateway
+
+    def generate_client_token(self):
+        return self.gateway.client_token.generate()
+
+    def sale(self, amount, nonce):
+        result = self.gateway.transaction.sale(
+            {
+                'amount': str(amount),
+                'payment_method_nonce': str(nonce),
+                'options': {
+                    'submit_for_settlement': True
+                }
+            }
+        )
+
+        transaction = result.transaction
+
+        return SaleResult(
+            is_success=result.is_success,
+            transaction_id=transaction.id if transaction else None
+        )
+
+
+class FakeGateway(PaymentGateway):
+    """
+    Pasarela local y determinista para pruebas de carga.
+
+    Simula la latencia de la pasarela real y, con las tasas configuradas,
+    cobros rechazados (failure_rate) y errores de comunicación (error_rate).
+    Con la misma semilla la secuencia de resultados siempre es la misma, y
+    elapsed acumula los segundos de latencia simulada.
+
+    Args:
+        latency_ms (float): Latencia media de cada llamada en milisegundos.
+        jitter_ms (float): Variación máxima de la latencia en milisegundos.
+        failure_rate (float): Proporción de cobros rechazados, entre 0 y 1.
+        error_rate (float): Proporción de cobros que lanzan GatewayError.
+        seed (int): Semilla del generador de números aleatorios.
+    """
+
+    def __init__(self, latency_ms=0, jitter_ms=0, failure_rate=0,
+                 error_rate=0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._count = 0
+        self.elapsed = 0
+
+    def generate_client_token(self):
+        with self._lock:
+            delay = self._delay()
+            self.elapsed += delay
+
+        time.sleep(delay)
+
+        return 'fake-client-token'
+
+    def sale(self, amount, nonce):
+        with self._lock:
+            delay = self._delay()
+            self.elapsed += delay
+            roll = self._random.random()
+            self._count += 1
+            transaction_id = 'fake-%08d' % self._count
+
+        time.sleep(delay)
+
+        if roll < self.error_rate:
+            raise GatewayError('Simulated gateway error')
+
+        if roll < self.error_rate + self.failure_rate:
+            return SaleResult(is_success=False, transaction_id=None)
+
+        return SaleResult(is_success=True, transaction_id=transaction_id)
+
+    def _delay(self):
+        jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(self.latency_ms + jitter, 0) / 1000
+
+
+@lru_cache(maxsize=None)
+def get_gateway():
+    """
+    Devuelve la pasarela configurada en PAYMENT_GATEWAY.
+
+    La instancia se crea una sola vez por proceso con las opciones de
+    PAYMENT_GATEWAY_OPTIONS.
+
+    Returns:
+        PaymentGateway: Pasarela de pago.
+    """
+    gateway_class = import_string(settings.PAYMENT_GATEWAY)
+    return gateway_class(**settings.PAYMENT_GATEWAY_OPTIONS)
+
+
+@receiver(setting_changed)
+def reset_gateway(setting, **kwargs):
+    if setting in ('PAYMENT_GATEWAY', 'PAYMENT_GATEWAY_OPTIONS'):
+        get_gateway.cache_clear()
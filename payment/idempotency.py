@@ -0,0 +1,167 @@
+import functools
+import hashlib
+import json
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+# Segundos sugeridos a un duplicado antes de reintentar
+RETRY_AFTER = 2
+# Segundos que una llave queda reservada; pasado ese tiempo se considera que
+# el proceso que la reclamó murió y un reintento puede tomarla
+CLAIM_SECONDS = 2 * 60
+
+
+def idempotent(method):
+    """
+    Hace idempotente un método de un APIView usando la cabecera Idempotency-Key.
+
+    La llave se reclama en una transacción corta y queda reservada por
+    CLAIM_SECONDS mientras el método se ejecuta fuera de ella, de modo que no
+    se mantienen bloqueos durante el cobro. Un duplicado que llega mientras
+    la llave está reservada recibe 409 con Retry-After; uno que llega
+    después recibe la respuesta guardada sin volver a ejecutar el método.
+
+    Antes del cobro solo se guardan las respuestas 2xx y 4xx: ante un 5xx o
+    una excepción la llave se libera para que el cliente pueda reintentar.
+    Después de mark_charged se guarda cualquier respuesta, porque el cobro
+    pudo haberse hecho. Sin la cabecera el método se ejecuta normalmente.
+    """
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+
+        if not key:
+            return method(self, request, *args, **kwargs)
+
+        if len(key) > 255:
+            return Response(
+                {'error': 'Idempotency-Key must be at most 255 characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fingerprint = hashlib.sha256(
+            json.dumps(request.data, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+        keys = IdempotencyKey.objects.filter(user=request.user, key=key)
+        record = keys.first()
+
+        if record is None:
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        user=request.user, key=key, fingerprint=fingerprint,
+                        locked_until=_lease())
+            except IntegrityError:
+                # Otro duplicado la reclamó primero; leer fuera de la
+                # transacción fallida para ver su fila aunque se haya
+                # confirmado después
+                return _replay(keys.first(), fingerprint)
+        elif not _take_over(record, fingerprint):
+            return _replay(record, fingerprint)
+
+        request.idempotency_key = record
+
+        try:
+            response = method(self, request, *args, **kwargs)
+        except:
+            if record.charged:
+                _store(record, Response(
+                    {'error': 'Error processing the transaction'},
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                ))
+            else:
+                _release(record)
+            raise
+
+        if response.status_code >= 500 and not record.charged:
+            _release(record)
+        else:
+            _store(record, response)
+
+        return response
+
+    return wrapper
+
+
+def mark_charged(request):
+    """
+    Marca la llave de la petición como cobrada.
+
+    Debe llamarse justo antes de enviar el cobro a la pasarela: desde ese
+    momento la respuesta se guarda aunque sea un error, y una llave
+    abandonada ya no puede tomarse, para que un reintento nunca repita el
+    cobro.
+    """
+    record = getattr(request, 'idempotency_key', None)
+
+    if record is None:
+        return
+
+    record.charged = True
+    IdempotencyKey.objects.filter(pk=record.pk).update(charged=True)
+
+
+def _lease():
+    return timezone.now() + timedelta(seconds=CLAIM_SECONDS)
+
+
+def _take_over(record, fingerprint):
+    # Una llave sin respuesta, sin cobro y con la reserva vencida quedó
+    # abandonada; el UPDATE condicional deja que solo un reintento la tome
+    if (record.status_code is not None or record.charged
+            or record.fingerprint != fingerprint
+            or record.locked_until > timezone.now()):
+        return False
+
+    locked_until = _lease()
+    taken = IdempotencyKey.objects.filter(
+        pk=record.pk, status_code=None, charged=False,
+        locked_until=record.locked_until
+    ).update(locked_until=locked_until)
+    record.locked_until = locked_until
+
+    return taken == 1
+
+
+def _replay(record, fingerprint):
+    if record is not None and record.fingerprint != fingerprint:
+        return Response(
+            {'error': 'Idempotency-Key was already used with a different request'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+
+    if (record is not None and record.status_code is None and record.charged
+            and record.locked_until <= timezone.now()):
+        # El proceso murió después de enviar el cobro: no se puede saber si
+        # se hizo, así que no se vuelve a intentar
+        return Response(
+            {'error': 'The transaction outcome is unknown'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    if record is None or record.status_code is None:
+        # El original sigue en curso o acaba de liberar la llave
+        return Response(
+            {'error': 'A request with this Idempotency-Key is in progress'},
+            status=status.HTTP_409_CONFLICT,
+            headers={'Retry-After': str(RETRY_AFTER)}
+        )
+
+    return Response(record.response, status=record.status_code)
+
+
+def _store(record, response):
+    with transaction.atomic():
+        IdempotencyKey.objects.filter(pk=record.pk).update(
+            status_code=response.status_code, response=response.data)
+
+
+def _release(record):
+    with transaction.atomic():
+        IdempotencyKey.objects.filter(pk=record.pk).delete()
@@ -0,0 +1,185 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from cart.models import Cart, CartItem
+from cart.services import bump_cart_version
+from category.models import Category
+from products.models import Product
+from shipping.models import Shipping
+from payment.gateways import get_gateway
+from payment.models import OutboxJob
+
+EMAIL = 'benchmark-checkout-%s@example.com'
+
+
+class Command(BaseCommand):
+    help = ('Mide de punta a punta el tiempo de make-payment con la pasarela '
+            'FakeGateway, separando la latencia propia de la de la pasarela. '
+            'Cada pago se confirma como en producción, con sus bloqueos y sus '
+            'callbacks de on_commit; los datos creados se borran al terminar. '
+            'Usar contra una base de datos de desarrollo.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Pagos medidos en total.')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Clientes que pagan a la vez, cada uno con su '
+                                 'propio usuario y los mismos productos.')
+        parser.add_argument('--items', type=int, default=5,
+                            help='Productos distintos en el carrito.')
+        parser.add_argument('--latency-ms', type=float, default=0,
+                            help='Latencia simulada de la pasarela.')
+        parser.add_argument('--jitter-ms', type=float, default=0,
+                            help='Variación de la latencia simulada.')
+
+    def handle(self, *args, **options):
+        gateway_options = {
+            'latency_ms': options['latency_ms'],
+            'jitter_ms': options['jitter_ms'],
+            'failure_rate': 0,
+            'error_rate': 0,
+            'seed': 0,
+        }
+        requests = options['requests']
+        workers = options['workers']
+        # Repartir los pagos entre los clientes
+        counts = [
+            requests // workers + (1 if i < requests % workers else 0)
+            for i in range(workers)
+        ]
+
+        with override_settings(
+                ALLOWED_HOSTS=['testserver'],
+                PAYMENT_GATEWAY='payment.gateways.FakeGateway',
+                PAYMENT_GATEWAY_OPTIONS=gateway_options):
+            users, category, shipping, products = self._create_fixture(
+                requests, options['items'], workers)
+
+            try:
+                start = time.perf_counter()
+
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    results = list(executor.map(
+                        lambda args: self._run(*args, shipping, products),
+                        zip(users, counts)))
+
+                elapsed = time.perf_counter() - start
+                gateway_time = get_gateway().elapsed
+            finally:
+                self._delete_fixture(users, category, shipping, products)
+
+        timings = sorted(
+            timing for worker_timings, _ in results for timing in worker_timings)
+        rejected = sum(worker_rejected for _, worker_rejected in results)
+        total = sum(timings)
+
+        self.stdout.write(
+            '%s payments with %s workers (%s rejected): median %.3f ms, '
+            'p99 %.3f ms, %.1f payments/s, gateway %.1f%% of total time' % (
+                len(timings), workers, rejected,
+                timings[len(timings) // 2] * 1000,
+                timings[max(int(len(timings) * 0.99) - 1, 0)] * 1000,
+                len(timings) / elapsed if elapsed else 0,
+                gateway_time / total * 100 if total else 0))
+
+    def _create_fixture(self, requests, items, workers):
+        # Cada consulta se confirma por separado: los pagos corren en otros
+        # hilos y necesitan ver estos datos
+        User = get_user_model()
+        User.objects.filter(
+            email__in=[EMAIL % i for i in range(workers)]).delete()
+
+        users = [
+            User.objects.create_user(
+                email=EMAIL % i, password='Benchmark12345',
+                first_name='Benchmark', last_name='Checkout')
+            for i in range(workers)
+        ]
+        category = Category.objects.create(
+            name='Benchmark %s' % time.time_ns())
+        shipping = Shipping.objects.create(
+            name='Benchmark', time_to_delivery='1 day', price='25.00')
+        products = Product.objects.bulk_create([
+            Product(name='Benchmark %s' % i, description='Benchmark',
+                    price='10.00', compare_price='12.00', category=category,
+                    quantity=requests)
+            for i in range(items)
+        ])
+
+        return users, category, shipping, products
+
+    def _delete_fixture(self, users, category, shipping, products):
+        emails = [user.email for user in users]
+
+        # Los items de pedidos no se borran en cascada con sus productos, así
+        # que primero van los usuarios con sus pedidos y carritos
+        get_user_model().objects.filter(
+            id__in=[user.id for user in users]).delete()
+        Product.objects.filter(
+            id__in=[product.id for product in products]).delete()
+        category.delete()
+        shipping.delete()
+
+        # Correos y webhooks de los pedidos de prueba que el outbox no envió
+        OutboxJob.objects.filter(
+            status=OutboxJob.JobStatus.pending,
+            kind='order_confirmation_email', payload__email__in=emails
+        ).delete()
+        OutboxJob.objects.filter(
+            status=OutboxJob.JobStatus.pending,
+            kind='order_created_webhook', payload__data__user__in=emails
+        ).delete()
+
+    def _run(self, user, requests, shipping, products):
+        cart = Cart.objects.get(user=user)
+        client = APIClient()
+        client.force_authenticate(user=user)
+        data = {
+            'nonce': {'nonce': 'fake-valid-nonce'},
+            'shipping_id': shipping.id,
+            'coupon_name': '',
+            'full_name': 'Benchmark Checkout',
+            'address_line_1': 'Street 1',
+            'address_line_2': '',
+            'city': 'City',
+            'state_province_region': 'State',
+            'postal_zip_code': '01001',
+            'country_region': 'Guatemala',
+            'telephone_number': '5555-5555',
+        }
+
+        timings = []
+        rejected = 0
+
+        try:
+            for _ in range(requests):
+                CartItem.objects.bulk_create([
+                    CartItem(cart=cart, product=product, count=1)
+                    for product in products
+                ])
+                Cart.objects.filter(id=cart.id).update(
+                    total_items=len(products))
+                bump_cart_version(user)
+
+                start = time.perf_counter()
+                response = client.post(
+                    '/api/payment/make-payment', data, format='json')
+                timings.append(time.perf_counter() - start)
+
+                if response.status_code != 200:
+                    raise RuntimeError(response.data)
+
+                # Con varios clientes la reserva puede rechazarse por un
+                # conflicto con otra compra; se vacía el carrito para el
+                # siguiente pago
+                if 'success' not in response.data:
+                    rejected += 1
+                    CartItem.objects.filter(cart=cart).delete()
+        finally:
+            connections.close_all()
+
+        return timings, rejected
@@ -0,0 +1,41 @@
+import random
+import timeit
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from coupons.models import PercentageCoupon
+from shipping.models import Shipping
+from payment.pricing import Line, price_lines
+
+
+class Command(BaseCommand):
+    help = 'Mide el tiempo de cotizar un carrito con el motor de precios.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=1000,
+                            help='Líneas del carrito a cotizar.')
+        parser.add_argument('--repeat', type=int, default=200,
+                            help='Cotizaciones medidas.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        lines = [
+            Line(i, 'Product %s' % i,
+                 Decimal(rng.randint(100, 99999)) / 100,
+                 Decimal(rng.randint(100, 99999)) / 100,
+                 rng.randint(1, 10))
+            for i in range(options['lines'])
+        ]
+        # Instancias sin guardar: la medición no toca la base de datos
+        coupon = PercentageCoupon(name='bench', discount_percentage=15)
+        shipping = Shipping(name='bench', price=Decimal('25.00'))
+
+        timings = timeit.repeat(
+            lambda: price_lines(lines, coupon=coupon, shipping=shipping),
+            number=1, repeat=options['repeat'])
+        timings.sort()
+
+        self.stdout.write(
+            '%s lines: median %.3f ms, p99 %.3f ms' % (
+                options['lines'],
+                timings[len(timings) // 2] * 1000,
+                timings[int(len(timings) * 0.99) - 1] * 1000))
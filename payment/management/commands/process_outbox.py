@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand
+from payment.outbox import process_batch
+
+
+class Command(BaseCommand):
+    help = ('Ejecuta los trabajos pendientes del outbox (correos, webhooks, '
+            'productos relacionados).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help='Trabajos reclamados por lote.')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Hilos que ejecutan los trabajos de un lote.')
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help='Segundos de espera cuando no hay trabajos.')
+        parser.add_argument('--once', action='store_true',
+                            help='Vaciar el outbox una vez y terminar.')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_batch(
+                batch_size=options['batch_size'], workers=options['workers'])
+
+            if processed:
+                self.stdout.write('Processed %s outbox jobs' % processed)
+                continue
+
+            if options['once']:
+                break
+
+            time.sleep(options['sleep'])
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-18 20:06
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=100, verbose_name='Tipo')),
+                ('payload', models.JSONField(default=dict, verbose_name='Datos')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20, verbose_name='Estado')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Intentos')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Disponible desde')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Último error')),
+                ('date_created', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+            ],
+            options={
+                'verbose_name': 'Outbox job',
+                'verbose_name_plural': 'Outbox jobs',
+                'indexes': [models.Index(fields=['status', 'available_at'], name='payment_out_status_3d4114_idx')],
+            },
+        ),
+    ]
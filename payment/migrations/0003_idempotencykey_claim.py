@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-18 21:04
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0002_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='charged',
+            field=models.BooleanField(default=False, verbose_name='Cobro enviado'),
+        ),
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='locked_until',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Reservada hasta'),
+        ),
+    ]
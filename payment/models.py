@@ -1,3 +1,65 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 
 # Create your models here.
+
+User = settings.AUTH_USER_MODEL
+
+
+class OutboxJob(models.Model):
+    """
+    Efecto secundario pendiente de ejecutar fuera de la petición, escrito en la
+    misma transacción que la orden que lo origina.
+    """
+
+    class Meta:
+        verbose_name = 'Outbox job'
+        verbose_name_plural = 'Outbox jobs'
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+
+    class JobStatus(models.TextChoices):
+        pending = 'pending'
+        processing = 'processing'
+        done = 'done'
+        failed = 'failed'
+
+    kind = models.CharField(max_length=100, verbose_name=_('Tipo'))
+    payload = models.JSONField(default=dict, verbose_name=_('Datos'))
+    status = models.CharField(
+        max_length=20, choices=JobStatus.choices, default=JobStatus.pending, verbose_name=_('Estado'))
+    attempts = models.PositiveIntegerField(default=0, verbose_name=_('Intentos'))
+    available_at = models.DateTimeField(default=timezone.now, verbose_name=_('Disponible desde'))
+    last_error = models.TextField(blank=True, default='', verbose_name=_('Último error'))
+    date_created = models.DateTimeField(auto_now_add=True, verbose_name=_('Fecha de creación'))
+
+    def __str__(self):
+        return '%s #%s' % (self.kind, self.id)
+
+
+class IdempotencyKey(models.Model):
+    """
+    Respuesta guardada para una llave Idempotency-Key enviada por un usuario.
+    """
+
+    class Meta:
+        verbose_name = 'Idempotency key'
+        verbose_name_plural = 'Idempotency keys'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key'),
+        ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name=_('Usuario'))
+    key = models.CharField(max_length=255, verbose_name=_('Llave'))
+    fingerprint = models.CharField(max_length=64, verbose_name=_('Huella de la petición'))
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name=_('Código de estado'))
+    response = models.JSONField(null=True, blank=True, verbose_name=_('Respuesta'))
+    charged = models.BooleanField(default=False, verbose_name=_('Cobro enviado'))
+    locked_until = models.DateTimeField(default=timezone.now, verbose_name=_('Reservada hasta'))
+    date_created = models.DateTimeField(auto_now_add=True, verbose_name=_('Fecha de creación'))
+
+    def __str__(self):
+        return self.key
@@ -0,0 +1,136 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import requests
+from django.core.mail import send_mail
+from django.db import connections, transaction
+from django.utils import timezone
+from .models import OutboxJob
+
+MAX_ATTEMPTS = 8
+BACKOFF_SECONDS = 30
+LEASE_SECONDS = 5 * 60
+
+_handlers = {}
+
+
+def handler(kind):
+    """
+    Registra la función que ejecuta los trabajos de un tipo.
+    """
+    def register(func):
+        _handlers[kind] = func
+        return func
+
+    return register
+
+
+def enqueue(kind, payload):
+    """
+    Agrega un trabajo al outbox.
+
+    Debe llamarse dentro de la misma transacción que los datos que lo originan
+    para que el trabajo exista si y solo si esos datos se confirmaron.
+    """
+    if kind not in _handlers:
+        raise ValueError('Unknown outbox job kind: %s' % kind)
+
+    return OutboxJob.objects.create(kind=kind, payload=payload)
+
+
+def process_batch(batch_size=50, workers=4):
+    """
+    Ejecuta un lote de trabajos disponibles usando un pool de hilos.
+
+    Los trabajos se reclaman con SELECT ... FOR UPDATE SKIP LOCKED y quedan
+    reservados por LEASE_SECONDS, de modo que varios workers pueden correr a la
+    vez y un trabajo de un worker caído vuelve a estar disponible. Los que
+    fallan se reintentan con backoff exponencial hasta MAX_ATTEMPTS.
+
+    Returns:
+        int: Número de trabajos procesados en el lote.
+    """
+    jobs = _claim(batch_size)
+
+    if not jobs:
+        return 0
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        errors = list(executor.map(_run, jobs))
+
+    now = timezone.now()
+    done = []
+
+    for job, error in zip(jobs, errors):
+        if error is None:
+            job.status = OutboxJob.JobStatus.done
+            done.append(job.id)
+            continue
+
+        job.last_error = error
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = OutboxJob.JobStatus.failed
+        else:
+            job.status = OutboxJob.JobStatus.pending
+            job.available_at = now + timedelta(
+                seconds=BACKOFF_SECONDS * 2 ** (job.attempts - 1))
+
+    OutboxJob.objects.bulk_update(
+        jobs, ['status', 'available_at', 'last_error'])
+
+    return len(jobs)
+
+
+def _claim(batch_size):
+    now = timezone.now()
+
+    with transaction.atomic():
+        jobs = list(
+            OutboxJob.objects.select_for_update(skip_locked=True).filter(
+                status__in=[OutboxJob.JobStatus.pending,
+                            OutboxJob.JobStatus.processing],
+                available_at__lte=now
+            ).order_by('available_at')[:batch_size]
+        )
+
+        for job in jobs:
+            job.status = OutboxJob.JobStatus.processing
+            job.attempts += 1
+            job.available_at = now + timedelta(seconds=LEASE_SECONDS)
+
+        OutboxJob.objects.bulk_update(
+            jobs, ['status', 'attempts', 'available_at'])
+
+    return jobs
+
+
+def _run(job):
+    try:
+        _handlers[job.kind](job.payload)
+    except Exception as e:
+        return '%s: %s' % (type(e).__name__, e)
+    finally:
+        connections.close_all()
+
+    return None
+
+
+@handler('order_confirmation_email')
+def send_order_confirmation_email(payload):
+    send_mail(
+        'Your Order Details',
+        'Hey ' + payload['full_name'] + ','
+        + '\n\nWe recieved your order!'
+        + '\n\nGive us some time to process your order and ship it out to you.'
+        + '\n\nYou can go on your user dashboard to check the status of your order.'
+        + '\n\nSincerely,'
+        + '\nShop Time',
+        'mail@ninerogues.com',
+        [payload['email']],
+        fail_silently=False
+    )
+
+
+@handler('order_created_webhook')
+def post_order_created_webhook(payload):
+    response = requests.post(payload['url'], json=payload['data'], timeout=10)
+    response.raise_for_status()
@@ -0,0 +1,146 @@
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_HALF_UP
+from typing import NamedTuple
+from coupons.models import FixedPriceCoupon, PercentageCoupon
+from shipping.models import Shipping
+
+TAX_RATE = Decimal('0.14')  # Guatemala
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+
+class Line(NamedTuple):
+    """
+    Línea de un carrito con el precio del producto al momento de cotizar.
+    """
+
+    product_id: int
+    name: str
+    price: Decimal
+    compare_price: Decimal
+    count: int
+
+
+@dataclass(frozen=True)
+class Quote:
+    """
+    Resultado inmutable de cotizar un carrito.
+    """
+
+    original_price: Decimal
+    total_compare_amount: Decimal
+    total_after_coupon: Decimal
+    estimated_tax: Decimal
+    shipping_cost: Decimal
+    total_amount: Decimal
+
+    def as_dict(self):
+        """
+        Devuelve los montos formateados con dos decimales.
+        """
+        return {
+            'original_price': f'{self.original_price:.2f}',
+            'total_after_coupon': f'{self.total_after_coupon:.2f}',
+            'total_amount': f'{self.total_amount:.2f}',
+            'total_compare_amount': f'{self.total_compare_amount:.2f}',
+            'estimated_tax': f'{self.estimated_tax:.2f}',
+            'shipping_cost': f'{self.shipping_cost:.2f}'
+        }
+
+
+def cart_lines(cart_items):
+    """
+    Convierte items del carrito con su producto cargado en líneas de precio.
+
+    Returns:
+        list: Líneas del carrito.
+    """
+    return [
+        Line(cart_item.product_id, cart_item.product.name,
+             cart_item.product.price, cart_item.product.compare_price,
+             cart_item.count)
+        for cart_item in cart_items
+    ]
+
+
+def price_lines(lines, coupon=None, shipping=None, tax_rate=TAX_RATE):
+    """
+    Cotiza un carrito en una sola pasada usando aritmética Decimal.
+
+    El cupón de precio fijo se aplica si es menor al subtotal y el de porcentaje
+    si está entre 1 y 100. El impuesto se calcula sobre el total con cupón y el
+    envío se suma al final. Cada monto se redondea a centavos, por lo que el
+    total es siempre la suma de los montos mostrados.
+
+    Args:
+        lines: Líneas del carrito con precios Decimal.
+        coupon: FixedPriceCoupon, PercentageCoupon o None.
+        shipping: Opción de envío o None.
+        tax_rate (Decimal): Tasa de impuesto.
+
+    Returns:
+        Quote: Cotización del carrito.
+    """
+    total = ZERO
+    total_compare = ZERO
+
+    for _, _, price, compare_price, count in lines:
+        total += price * count
+        total_compare += compare_price * count
+
+    after_coupon = total
+
+    if isinstance(coupon, FixedPriceCoupon):
+        if coupon.discount_price < total:
+            after_coupon = total - coupon.discount_price
+    elif isinstance(coupon, PercentageCoupon):
+        if 1 < coupon.discount_percentage < 100:
+            after_coupon = total - total * coupon.discount_percentage / 100
+
+    after_coupon = after_coupon.quantize(CENT, ROUND_HALF_UP)
+    tax = (after_coupon * tax_rate).quantize(CENT, ROUND_HALF_UP)
+    shipping_cost = shipping.price if shipping is not None else ZERO
+
+    return Quote(
+        original_price=total.quantize(CENT, ROUND_HALF_UP),
+        total_compare_amount=total_compare.quantize(CENT, ROUND_HALF_UP),
+        total_after_coupon=after_coupon,
+        estimated_tax=tax,
+        shipping_cost=shipping_cost,
+        total_amount=after_coupon + tax + shipping_cost
+    )
+
+
+def find_coupon(coupon_name):
+    """
+    Busca un cupón de precio fijo o de porcentaje por su nombre.
+
+    Returns:
+        FixedPriceCoupon | PercentageCoupon | None: Cupón encontrado.
+    """
+    if not coupon_name:
+        return None
+
+    coupon = FixedPriceCoupon.objects.filter(name__iexact=coupon_name).first()
+
+    if coupon is None:
+        coupon = PercentageCoupon.objects.filter(
+            name__iexact=coupon_name).first()
+
+    return coupon
+
+
+def find_shipping(shipping_id):
+    """
+    Busca una opción de envío por su ID.
+
+    Returns:
+        Shipping | None: Opción de envío o None si el ID no es válido.
+    """
+    try:
+        shipping_id = int(shipping_id)
+    except (TypeError, ValueError):
+        return None
+
+    return Shipping.objects.filter(id=shipping_id).first()
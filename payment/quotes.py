@@ -0,0 +1,89 @@
+from dataclasses import dataclass
+from decimal import Decimal
+from django.core import signing
+from shipping.models import Shipping
+from .pricing import Line, Quote
+
+QUOTE_MAX_AGE = 15 * 60
+
+_SALT = 'payment.quote'
+
+
+@dataclass(frozen=True)
+class SignedQuote:
+    """
+    Cotización recuperada de un token firmado.
+    """
+
+    lines: list
+    quote: Quote
+    shipping: Shipping
+
+
+def issue_quote_token(user, cart_version, lines, quote, coupon_name, shipping):
+    """
+    Firma una cotización para que el pago pueda usarla sin volver a cotizar.
+
+    El token incluye la versión del carrito, los precios de cada línea, el
+    cupón y el envío usados, y expira después de QUOTE_MAX_AGE segundos.
+
+    Returns:
+        str: Token firmado.
+    """
+    if shipping is not None:
+        shipping = [shipping.id, shipping.name,
+                    shipping.time_to_delivery, str(shipping.price)]
+
+    return signing.dumps({
+        'user': user.id,
+        'version': cart_version,
+        'lines': [
+            [line.product_id, line.name, str(line.price),
+             str(line.compare_price), line.count]
+            for line in lines
+        ],
+        'coupon': coupon_name or '',
+        'shipping': shipping,
+        'quote': quote.as_dict(),
+    }, salt=_SALT, compress=True)
+
+
+def load_quote_token(token, user, cart_version, shipping_id, coupon_name):
+    """
+    Valida un token de cotización contra el estado actual del pago.
+
+    Solo compara la firma, la vigencia y la versión del carrito, sin consultar
+    productos, cupones ni envíos. El precio de cada producto se verifica después
+    dentro de la reserva de stock.
+
+    Returns:
+        SignedQuote | None: Cotización firmada o None si no puede usarse.
+    """
+    try:
+        data = signing.loads(token, salt=_SALT, max_age=QUOTE_MAX_AGE)
+    except signing.BadSignature:
+        return None
+
+    if data['user'] != user.id or data['version'] != cart_version:
+        return None
+
+    if data['coupon'] != (coupon_name or ''):
+        return None
+
+    if data['shipping'] is None or str(data['shipping'][0]) != str(shipping_id):
+        return None
+
+    shipping_id, shipping_name, shipping_time, shipping_price = data['shipping']
+
+    return SignedQuote(
+        lines=[
+            Line(product_id, name, Decimal(price), Decimal(compare_price), count)
+            for product_id, name, price, compare_price, count in data['lines']
+        ],
+        quote=Quote(**{
+            field: Decimal(value) for field, value in data['quote'].items()
+        }),
+        shipping=Shipping(
+            id=shipping_id, name=shipping_name, time_to_delivery=shipping_time,
+            price=Decimal(shipping_price))
+    )
@@ -0,0 +1,183 @@
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from ecommerce.versions import bump_version
+from orders.models import OrderItem
+from products.models import Product
+from products import related, trending
+from products.signals import CATALOG_VERSION_KEY, bump_product_versions
+from . import outbox
+
+# Intentos de la reserva cuando Postgres la cancela por un conflicto de
+# serialización con otra compra simultánea
+RESERVE_ATTEMPTS = 3
+# SQLSTATE de serialization_failure y deadlock_detected
+_RETRYABLE_SQLSTATES = ('40001', '40P01')
+
+
+class OutOfStockError(Exception):
+    """
+    Se lanza cuando alguno de los productos no tiene stock suficiente.
+    """
+
+
+def reserve_stock(lines, check_prices=False):
+    """
+    Descuenta del inventario los productos de un carrito en una sola consulta.
+
+    La actualización usa expresiones F() y solo afecta las filas con
+    quantity >= count, por lo que compras simultáneas no pueden dejar el stock
+    en negativo. Si alguna fila no se actualiza se revierte toda la reserva.
+
+    Con aislamiento SERIALIZABLE dos compras simultáneas del mismo producto
+    pueden cancelarse por un conflicto de serialización: fuera de una
+    transacción la reserva se reintenta hasta RESERVE_ATTEMPTS veces y, si
+    sigue fallando, se trata como falta de stock.
+
+    Args:
+        lines: Líneas del carrito (payment.pricing.Line).
+        check_prices (bool): Exigir además que el precio no haya cambiado.
+
+    Raises:
+        OutOfStockError: Si algún producto no tiene stock suficiente o, con
+            check_prices, si su precio cambió.
+    """
+    counts = _counts_by_product(lines)
+    prices = {line.product_id: line.price for line in lines}
+
+    # Sin líneas el filtro quedaría vacío (Q()) y actualizaría todo el catálogo
+    if not counts:
+        return
+
+    guard = Q()
+    for product_id, count in counts.items():
+        if check_prices:
+            guard |= Q(id=product_id, quantity__gte=count,
+                       price=prices[product_id])
+        else:
+            guard |= Q(id=product_id, quantity__gte=count)
+
+    # Dentro de otra transacción el conflicto la invalida por completo, así
+    # que solo se reintenta cuando la reserva es su propia transacción
+    attempts = 1 if connection.in_atomic_block else RESERVE_ATTEMPTS
+
+    for _ in range(attempts):
+        try:
+            _apply_reservation(guard, counts)
+            break
+        except OperationalError as e:
+            if not _is_serialization_failure(e) or attempts == 1:
+                raise
+    else:
+        raise OutOfStockError()
+
+    transaction.on_commit(lambda: _invalidate_products(counts))
+
+
+def release_stock(lines):
+    """
+    Devuelve al inventario una reserva hecha con reserve_stock.
+
+    Se usa cuando la transacción con la pasarela de pago falla.
+    """
+    counts = _counts_by_product(lines)
+
+    if not counts:
+        return
+
+    Product.objects.filter(id__in=counts.keys()).update(
+        quantity=F('quantity') + _count_case(counts),
+        sold=F('sold') - _count_case(counts),
+    )
+
+    transaction.on_commit(lambda: _invalidate_products(counts))
+
+
+def create_order_items(order, lines):
+    """
+    Crea todos los items de una orden con un único bulk_create.
+
+    bulk_create no envía post_save, por lo que las ventas se suman aquí a las
+    tablas de tendencias cuando la transacción se confirma. También se encola
+    la actualización de los productos relacionados, que dependen de sold.
+
+    Args:
+        order: Orden a la que pertenecen los items.
+        lines: Líneas del carrito (payment.pricing.Line).
+    """
+    items = OrderItem.objects.bulk_create([
+        OrderItem(
+            product_id=line.product_id,
+            order=order,
+            name=line.name,
+            price=line.price,
+            count=line.count
+        )
+        for line in lines
+    ])
+
+    transaction.on_commit(lambda: trending.record_order_items(items))
+    related.enqueue_refresh({line.product_id for line in lines})
+
+
+def enqueue_order_side_effects(order, user):
+    """
+    Encola en el outbox el correo de confirmación y los webhooks de una orden.
+
+    Debe llamarse dentro de la transacción que crea la orden.
+    """
+    outbox.enqueue('order_confirmation_email', {
+        'full_name': order.full_name,
+        'email': user.email,
+    })
+
+    for url in settings.ORDER_WEBHOOK_URLS:
+        outbox.enqueue('order_created_webhook', {
+            'url': url,
+            'data': {
+                'transaction_id': order.transaction_id,
+                'amount': str(order.amount),
+                'user': user.email,
+            },
+        })
+
+
+def _apply_reservation(guard, counts):
+    with transaction.atomic():
+        updated = Product.objects.filter(guard).update(
+            quantity=F('quantity') - _count_case(counts),
+            sold=F('sold') + _count_case(counts),
+        )
+
+        if updated != len(counts):
+            raise OutOfStockError()
+
+
+def _is_serialization_failure(error):
+    cause = error.__cause__
+    sqlstate = getattr(cause, 'pgcode', None) or getattr(cause, 'sqlstate', None)
+    return sqlstate in _RETRYABLE_SQLSTATES
+
+
+def _invalidate_products(counts):
+    bump_version(CATALOG_VERSION_KEY)
+    bump_product_versions(counts)
+
+
+def _counts_by_product(lines):
+    counts = {}
+
+    for line in lines:
+        counts[line.product_id] = (
+            counts.get(line.product_id, 0) + int(line.count))
+
+    return counts
+
+
+def _count_case(counts):
+    return Case(
+        *[When(id=product_id, then=Value(count))
+          for product_id, count in counts.items()],
+        default=Value(0),
+        output_field=IntegerField()
+    )
@@ -1,3 +1,523 @@
-from django.test import TestCase
+import hashlib
+import json
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.db import connection
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from cart.models import CartItem
+from category.models import Category
+from coupons.models import FixedPriceCoupon, PercentageCoupon
+from shipping.models import Shipping
+from products.models import Product
+from django.utils import timezone
+from . import outbox, services
+from orders.models import Order
+from .gateways import FakeGateway, GatewayError
+from .models import OutboxJob, IdempotencyKey
+from .pricing import Line, cart_lines, price_lines
+from .quotes import issue_quote_token, load_quote_token
+from .services import reserve_stock, release_stock, OutOfStockError
 
 # Create your tests here.
+
+User = get_user_model()
+
+
+class StockReservationTests(TestCase):
+    """
+    Verifica la reserva de stock en bloque usada al procesar pagos.
+    """
+
+    def setUp(self):
+        category = Category.objects.create(name='Category')
+        self.first = Product.objects.create(
+            name='First', description='Description', price='10.00',
+            compare_price='12.00', category=category, quantity=5)
+        self.second = Product.objects.create(
+            name='Second', description='Description', price='10.00',
+            compare_price='12.00', category=category, quantity=1)
+
+    def test_reserve_updates_every_product_in_one_query(self):
+        lines = cart_lines([
+            CartItem(product=self.first, count=2),
+            CartItem(product=self.second, count=1),
+        ])
+
+        with CaptureQueriesContext(connection) as queries:
+            reserve_stock(lines)
+
+        updates = [query for query in queries
+                   if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.quantity, self.first.sold), (3, 2))
+        self.assertEqual((self.second.quantity, self.second.sold), (0, 1))
+
+        release_stock(lines)
+
+        self.first.refresh_from_db()
+        self.assertEqual((self.first.quantity, self.first.sold), (5, 0))
+
+    def test_empty_reservation_touches_no_products(self):
+        with self.assertNumQueries(0):
+            reserve_stock([])
+            release_stock([])
+
+        self.first.refresh_from_db()
+        self.assertEqual((self.first.quantity, self.first.sold), (5, 0))
+
+    def test_reserve_rejects_the_whole_cart_when_stock_is_short(self):
+        lines = cart_lines([
+            CartItem(product=self.first, count=2),
+            CartItem(product=self.second, count=2),
+        ])
+
+        with self.assertRaises(OutOfStockError):
+            reserve_stock(lines)
+
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual(self.first.quantity, 5)
+        self.assertEqual(self.second.quantity, 1)
+
+
+class SerializationFailure(Exception):
+    """
+    Imita el error de psycopg2 cuando Postgres cancela una transacción.
+    """
+
+    pgcode = '40001'
+
+
+def serialization_error():
+    error = OperationalError('could not serialize access')
+    error.__cause__ = SerializationFailure()
+    return error
+
+
+class StockReservationRetryTests(TransactionTestCase):
+    """
+    Verifica los reintentos de la reserva ante conflictos de serialización.
+
+    Usa TransactionTestCase porque la reserva solo se reintenta cuando no
+    está dentro de otra transacción.
+    """
+
+    def setUp(self):
+        category = Category.objects.create(name='Category')
+        self.product = Product.objects.create(
+            name='Product', description='Description', price='10.00',
+            compare_price='12.00', category=category, quantity=5)
+        self.lines = [Line(self.product.id, self.product.name,
+                           self.product.price, self.product.compare_price, 2)]
+
+    def test_serialization_failure_is_retried(self):
+        errors = [serialization_error()]
+        apply_reservation = services._apply_reservation
+
+        def conflict_once(guard, counts):
+            if errors:
+                raise errors.pop()
+            apply_reservation(guard, counts)
+
+        with mock.patch('payment.services._apply_reservation',
+                        side_effect=conflict_once) as reservation:
+            reserve_stock(self.lines)
+
+        self.assertEqual(reservation.call_count, 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 3)
+
+    def test_repeated_serialization_failures_are_out_of_stock(self):
+        with mock.patch('payment.services._apply_reservation',
+                        side_effect=serialization_error()) as reservation:
+            with self.assertRaises(OutOfStockError):
+                reserve_stock(self.lines)
+
+        self.assertEqual(reservation.call_count, services.RESERVE_ATTEMPTS)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 5)
+
+    def test_other_database_errors_are_not_retried(self):
+        with mock.patch('payment.services._apply_reservation',
+                        side_effect=OperationalError('disk full')) as reservation:
+            with self.assertRaises(OperationalError):
+                reserve_stock(self.lines)
+
+        self.assertEqual(reservation.call_count, 1)
+
+
+def fail(payload):
+    raise RuntimeError('boom')
+
+
+class OutboxTests(TestCase):
+    """
+    Verifica la ejecución de los trabajos del outbox.
+    """
+
+    def test_order_confirmation_email_is_sent_by_worker(self):
+        job = outbox.enqueue('order_confirmation_email', {
+            'full_name': 'Test User', 'email': 'buyer@example.com'})
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(outbox.process_batch(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, OutboxJob.JobStatus.done)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['buyer@example.com'])
+        self.assertEqual(outbox.process_batch(), 0)
+
+    # El handler se registra solo durante la prueba para no dejarlo en el
+    # registro global del outbox
+    @mock.patch.dict(outbox._handlers, {'test_failure': fail})
+    def test_failed_jobs_are_retried_with_backoff(self):
+        job = outbox.enqueue('test_failure', {})
+
+        outbox.process_batch()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, OutboxJob.JobStatus.pending)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('boom', job.last_error)
+        self.assertGreater(job.available_at, timezone.now())
+        self.assertEqual(outbox.process_batch(), 0)
+
+        OutboxJob.objects.filter(pk=job.pk).update(
+            attempts=outbox.MAX_ATTEMPTS - 1, available_at=timezone.now())
+        outbox.process_batch()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, OutboxJob.JobStatus.failed)
+
+
+class PricingTests(TestCase):
+    """
+    Verifica el motor de precios compartido por el carrito y el pago.
+    """
+
+    lines = [
+        Line(1, 'First', Decimal('10.00'), Decimal('12.00'), 3),
+        Line(2, 'Second', Decimal('5.55'), Decimal('6.00'), 1),
+    ]
+
+    def test_quote_without_coupon(self):
+        quote = price_lines(
+            self.lines, shipping=Shipping(price=Decimal('7.50')))
+
+        self.assertEqual(quote.original_price, Decimal('35.55'))
+        self.assertEqual(quote.total_compare_amount, Decimal('42.00'))
+        self.assertEqual(quote.total_after_coupon, Decimal('35.55'))
+        self.assertEqual(quote.estimated_tax, Decimal('4.98'))
+        self.assertEqual(quote.total_amount, Decimal('48.03'))
+
+    def test_quote_with_coupons(self):
+        fixed = price_lines(
+            self.lines, coupon=FixedPriceCoupon(discount_price=Decimal('5.55')))
+        percentage = price_lines(
+            self.lines, coupon=PercentageCoupon(discount_percentage=10))
+        too_large = price_lines(
+            self.lines, coupon=FixedPriceCoupon(discount_price=Decimal('99')))
+
+        self.assertEqual(fixed.total_after_coupon, Decimal('30.00'))
+        self.assertEqual(percentage.total_after_coupon, Decimal('32.00'))
+        self.assertEqual(too_large.total_after_coupon, Decimal('35.55'))
+
+
+class QuoteTokenTests(TestCase):
+    """
+    Verifica los tokens de cotización firmados.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='quote@example.com', password='Test12345',
+            first_name='Quote', last_name='Tester')
+        self.shipping = Shipping.objects.create(
+            name='Express', time_to_delivery='1 day', price=Decimal('7.50'))
+        self.lines = [Line(1, 'First', Decimal('10.00'), Decimal('12.00'), 3)]
+        self.quote = price_lines(self.lines, shipping=self.shipping)
+        self.token = issue_quote_token(
+            self.user, 4, self.lines, self.quote, '', self.shipping)
+
+    def test_token_round_trip(self):
+        checkout = load_quote_token(
+            self.token, self.user, 4, str(self.shipping.id), '')
+
+        self.assertEqual(checkout.lines, self.lines)
+        self.assertEqual(checkout.quote, self.quote)
+        self.assertEqual(checkout.shipping.price, Decimal('7.50'))
+
+    def test_token_is_rejected_when_checkout_changed(self):
+        self.assertIsNone(load_quote_token(
+            self.token, self.user, 5, self.shipping.id, ''))
+        self.assertIsNone(load_quote_token(
+            self.token, self.user, 4, self.shipping.id, 'COUPON'))
+        self.assertIsNone(load_quote_token(
+            self.token + 'x', self.user, 4, self.shipping.id, ''))
+
+
+class IdempotencyTests(TestCase):
+    """
+    Verifica que make-payment respete la cabecera Idempotency-Key.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='idempotency@example.com', password='Test12345',
+            first_name='Idempotency', last_name='Tester')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.data = {
+            'nonce': {'nonce': 'fake-valid-nonce'},
+            'shipping_id': 999,
+            'coupon_name': '',
+            'full_name': 'Idempotency Tester',
+            'address_line_1': 'Street 1',
+            'address_line_2': '',
+            'city': 'City',
+            'state_province_region': 'State',
+            'postal_zip_code': '01001',
+            'country_region': 'Guatemala',
+            'telephone_number': '5555-5555',
+        }
+
+    def pay(self, data, key):
+        return self.client.post('/api/payment/make-payment', data,
+                                format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replay_returns_stored_response(self):
+        first = self.pay(self.data, 'key-1')
+        self.assertEqual(first.status_code, 404)
+
+        with self.assertNumQueries(1):
+            replay = self.pay(self.data, 'key-1')
+
+        self.assertEqual(replay.status_code, 404)
+        self.assertEqual(replay.data, first.data)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+    def test_key_reused_with_different_request_is_rejected(self):
+        self.pay(self.data, 'key-2')
+
+        response = self.pay(dict(self.data, shipping_id=1000), 'key-2')
+
+        self.assertEqual(response.status_code, 422)
+
+
+@override_settings(PAYMENT_GATEWAY='payment.gateways.FakeGateway',
+                   PAYMENT_GATEWAY_OPTIONS={})
+class IdempotentCheckoutTests(TestCase):
+    """
+    Verifica que los reintentos de make-payment no repitan el cobro.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='idempotent-checkout@example.com', password='Test12345',
+            first_name='Idempotent', last_name='Tester')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        category = Category.objects.create(name='Category')
+        product = Product.objects.create(
+            name='Product', description='Description', price='10.00',
+            compare_price='12.00', category=category, quantity=5)
+        shipping = Shipping.objects.create(
+            name='Standard', time_to_delivery='1 day', price='5.00')
+        CartItem.objects.create(cart=self.user.cart, product=product, count=1)
+        self.data = {
+            'nonce': {'nonce': 'fake-valid-nonce'},
+            'shipping_id': shipping.id,
+            'coupon_name': '',
+            'full_name': 'Idempotent Tester',
+            'address_line_1': 'Street 1',
+            'address_line_2': '',
+            'city': 'City',
+            'state_province_region': 'State',
+            'postal_zip_code': '01001',
+            'country_region': 'Guatemala',
+            'telephone_number': '5555-5555',
+        }
+
+    def pay(self):
+        return self.client.post('/api/payment/make-payment', self.data,
+                                format='json', HTTP_IDEMPOTENCY_KEY='checkout')
+
+    def test_successful_payment_is_charged_once(self):
+        with mock.patch.object(FakeGateway, 'sale', autospec=True,
+                               side_effect=FakeGateway.sale) as sale:
+            first = self.pay()
+            replay = self.pay()
+
+        self.assertEqual(sale.call_count, 1)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(replay.status_code, 200)
+        self.assertEqual(replay.data, first.data)
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 1)
+
+    def test_gateway_error_is_stored_and_not_charged_again(self):
+        with override_settings(PAYMENT_GATEWAY_OPTIONS={'error_rate': 1}):
+            first = self.pay()
+
+            with mock.patch.object(FakeGateway, 'sale') as sale:
+                replay = self.pay()
+
+        self.assertEqual(first.status_code, 500)
+        self.assertEqual(replay.status_code, 500)
+        self.assertEqual(replay.data, first.data)
+        sale.assert_not_called()
+
+    def test_order_failure_after_charge_is_not_charged_again(self):
+        with mock.patch('payment.views.create_order_items',
+                        side_effect=RuntimeError('boom')):
+            first = self.pay()
+
+        with mock.patch.object(FakeGateway, 'sale') as sale:
+            replay = self.pay()
+
+        self.assertEqual(first.status_code, 500)
+        self.assertEqual(replay.status_code, 500)
+        sale.assert_not_called()
+        self.assertFalse(Order.objects.exists())
+
+    def test_error_before_charge_can_be_retried(self):
+        with mock.patch('payment.views.reserve_stock',
+                        side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                self.pay()
+
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        retry = self.pay()
+
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 1)
+
+    def claim(self, **kwargs):
+        return IdempotencyKey.objects.create(
+            user=self.user, key='checkout',
+            fingerprint=hashlib.sha256(json.dumps(
+                self.data, sort_keys=True, default=str).encode()).hexdigest(),
+            **kwargs)
+
+    def test_duplicate_in_progress_is_rejected(self):
+        self.claim(locked_until=timezone.now() + timedelta(minutes=1))
+
+        response = self.pay()
+
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('Retry-After', response.headers)
+        self.assertFalse(Order.objects.exists())
+
+    def test_abandoned_claim_is_taken_over(self):
+        self.claim(locked_until=timezone.now() - timedelta(seconds=1))
+
+        response = self.pay()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 200)
+
+    def test_abandoned_charged_claim_is_not_charged_again(self):
+        self.claim(charged=True,
+                   locked_until=timezone.now() - timedelta(seconds=1))
+
+        with mock.patch.object(FakeGateway, 'sale') as sale:
+            response = self.pay()
+
+        self.assertEqual(response.status_code, 500)
+        sale.assert_not_called()
+        self.assertFalse(Order.objects.exists())
+
+
+class FakeGatewayTests(TestCase):
+    """
+    Verifica la pasarela local usada para pruebas de carga.
+    """
+
+    def test_results_are_deterministic(self):
+        def outcomes(seed):
+            gateway = FakeGateway(failure_rate=0.3, error_rate=0.2, seed=seed)
+            results = []
+            for _ in range(50):
+                try:
+                    results.append(gateway.sale(Decimal('10.00'), 'nonce'))
+                except GatewayError:
+                    results.append(None)
+            return results
+
+        first = outcomes(7)
+
+        self.assertEqual(first, outcomes(7))
+        self.assertIn(None, first)
+        self.assertTrue(any(r is not None and not r.is_success for r in first))
+        self.assertTrue(any(r is not None and r.is_success for r in first))
+
+
+@override_settings(PAYMENT_GATEWAY='payment.gateways.FakeGateway')
+class CheckoutTests(TestCase):
+    """
+    Verifica make-payment de punta a punta con la pasarela local.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='checkout@example.com', password='Test12345',
+            first_name='Checkout', last_name='Tester')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        category = Category.objects.create(name='Category')
+        self.product = Product.objects.create(
+            name='Product', description='Description', price='10.00',
+            compare_price='12.00', category=category, quantity=5)
+        shipping = Shipping.objects.create(
+            name='Standard', time_to_delivery='1 day', price='5.00')
+        CartItem.objects.create(
+            cart=self.user.cart, product=self.product, count=2)
+        self.data = {
+            'nonce': {'nonce': 'fake-valid-nonce'},
+            'shipping_id': shipping.id,
+            'coupon_name': '',
+            'full_name': 'Checkout Tester',
+            'address_line_1': 'Street 1',
+            'address_line_2': '',
+            'city': 'City',
+            'state_province_region': 'State',
+            'postal_zip_code': '01001',
+            'country_region': 'Guatemala',
+            'telephone_number': '5555-5555',
+        }
+
+    def pay(self):
+        return self.client.post('/api/payment/make-payment', self.data,
+                                format='json')
+
+    @override_settings(PAYMENT_GATEWAY_OPTIONS={})
+    def test_successful_payment_creates_order(self):
+        response = self.pay()
+
+        self.assertEqual(response.status_code, 200)
+        order = Order.objects.get(user=self.user)
+        self.assertEqual(order.transaction_id, 'fake-00000001')
+        self.assertEqual(order.amount, Decimal('27.80'))
+        self.assertFalse(CartItem.objects.filter(cart__user=self.user).exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 3)
+
+    @override_settings(PAYMENT_GATEWAY_OPTIONS={'failure_rate': 1})
+    def test_declined_payment_releases_stock(self):
+        response = self.pay()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 5)
@@ -1,44 +1,36 @@
-import braintree
-from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from cart.models import Cart, CartItem
-from coupons.models import FixedPriceCoupon, PercentageCoupon
-from orders.models import Order, OrderItem
-from products.models import Product
-from shipping.models import Shipping
-from django.core.mail import send_mail
+from cart.services import bump_cart_version, get_cart_version
+from orders.models import Order
+from django.db import transaction
+from .gateways import get_gateway
+from .idempotency import idempotent, mark_charged
+from .pricing import price_lines, cart_lines, find_coupon, find_shipping
+from .quotes import issue_quote_token, load_quote_token
+from .services import reserve_stock, release_stock, create_order_items, enqueue_order_side_effects, OutOfStockError
 
 # Create your views here.
 
-gateway = braintree.BraintreeGateway(
-    braintree.Configuration(
-        environment=settings.BT_ENVIRONMENT,
-        merchant_id=settings.BT_MERCHANT_ID,
-        public_key=settings.BT_PUBLIC_KEY,
-        private_key=settings.BT_PRIVATE_KEY
-    )
-)
-
 
 class GenerateTokenView(APIView):
     """
-    Vista para generar un token de Braintree para procesamiento de pagos.
+    Vista para generar un token de la pasarela de pago para procesamiento de pagos.
 
     Métodos permitidos: GET
     """
 
     def get(self, request, format=None):
         """
-        Genera un token de Braintree y lo devuelve en la respuesta.
+        Genera un token de la pasarela de pago y lo devuelve en la respuesta.
 
         Returns:
-            Response: JSON con el token de Braintree.
+            Response: JSON con el token de la pasarela de pago.
         """
 
         try:
-            token = gateway.client_token.generate()
+            token = get_gateway().generate_client_token()
 
             return Response(
                 {'braintree_token': token},
@@ -67,107 +59,47 @@ class GetPaymentTotalView(APIView):
             coupon_name (str): Nombre del cupón aplicado.
 
         Returns:
-            Response: JSON con los detalles del total de pago estimado.
+            Response: JSON con los detalles del total de pago estimado y un
+            'quote_token' firmado que puede enviarse a make-payment.
         """
 
         user = self.request.user
 
-        tax = 0.14  # Guatemala
-
         shipping_id = request.query_params.get('shipping_id')
-        shipping_id = str(shipping_id)
-
         coupon_name = request.query_params.get('coupon_name')
-        coupon_name = str(coupon_name)
 
         try:
-            cart = Cart.objects.get(user=user)
+            cart_version = get_cart_version(user)
+            cart_items = list(
+                CartItem.objects.select_related('product').filter(cart__user=user))
 
-            # revisar si existen iitems
-            if not CartItem.objects.filter(cart=cart).exists():
+            # revisar si existen items
+            if not cart_items:
                 return Response(
                     {'error': 'Need to have items in cart'},
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            cart_items = CartItem.objects.filter(cart=cart)
-
             for cart_item in cart_items:
-                if not Product.objects.filter(id=cart_item.product.id).exists():
-                    return Response(
-                        {'error': 'A proudct with ID provided does not exist'},
-                        status=status.HTTP_404_NOT_FOUND
-                    )
                 if int(cart_item.count) > int(cart_item.product.quantity):
                     return Response(
                         {'error': 'Not enough items in stock'},
                         status=status.HTTP_200_OK
                     )
 
-                total_amount = 0.0
-                total_compare_amount = 0.0
-
-                for cart_item in cart_items:
-                    total_amount += (float(cart_item.product.price)
-                                     * float(cart_item.count))
-                    total_compare_amount += (float(cart_item.product.compare_price)
-                                             * float(cart_item.count))
-
-                total_compare_amount = round(total_compare_amount, 2)
-                original_price = round(total_amount, 2)
-
-                # Cupones
-                if coupon_name != '':
-                    # Revisar si cupon de precio fijo es valido
-                    if FixedPriceCoupon.objects.filter(name__iexact=coupon_name).exists():
-                        fixed_price_coupon = FixedPriceCoupon.objects.get(
-                            name=coupon_name
-                        )
-                    discount_amount = float(fixed_price_coupon.discount_price)
-                    if discount_amount < total_amount:
-                        total_amount -= discount_amount
-                        total_after_coupon = total_amount
-
-                    elif PercentageCoupon.objects.filter(name__iexact=coupon_name).exists():
-                        percentage_coupon = PercentageCoupon.objects.get(
-                            name=coupon_name
-                        )
-                        discount_percentage = float(
-                            percentage_coupon.discount_percentage)
-
-                        if discount_percentage > 1 and discount_percentage < 100:
-                            total_amount -= (total_amount *
-                                             (discount_percentage / 100))
-                            total_after_coupon = total_amount
-
-                # Total despues del cupon
-                total_after_coupon = round(total_after_coupon, 2)
-
-                # Impuesto estimado
-                estimated_tax = round(total_amount * tax, 2)
-
-                total_amount += (total_amount * tax)
-
-                shipping_cost = 0.0
-                # verificar que el envio sea valido
-                if Shipping.objects.filter(id__iexact=shipping_id).exists():
-                    # agregar shipping a total amount
-                    shipping = Shipping.objects.get(id=shipping_id)
-                    shipping_cost = shipping.price
-                    total_amount += float(shipping_cost)
-
-                total_amount = round(total_amount, 2)
-
-                return Response({
-                    'original_price': f'{original_price:.2f}',
-                    'total_after_coupon': f'{total_after_coupon:.2f}',
-                    'total_amount': f'{total_amount:.2f}',
-                    'total_compare_amount': f'{total_compare_amount:.2f}',
-                    'estimated_tax': f'{estimated_tax:.2f}',
-                    'shipping_cost': f'{shipping_cost:.2f}'
-                },
-                    status=status.HTTP_200_OK
-                )
+            lines = cart_lines(cart_items)
+            shipping = find_shipping(shipping_id)
+            quote = price_lines(
+                lines,
+                coupon=find_coupon(coupon_name),
+                shipping=shipping
+            )
+
+            result = quote.as_dict()
+            result['quote_token'] = issue_quote_token(
+                user, cart_version, lines, quote, coupon_name, shipping)
+
+            return Response(result, status=status.HTTP_200_OK)
 
         except:
             return Response(
@@ -178,14 +110,18 @@ class GetPaymentTotalView(APIView):
 
 class ProcessPaymentView(APIView):
     """
-    Vista para procesar un pago utilizando Braintree y crear una orden.
+    Vista para procesar un pago utilizando la pasarela configurada y crear una orden.
 
     Métodos permitidos: POST
     """
 
+    @idempotent
     def post(self, request, format=None):
         """
-        Procesa el pago utilizando Braintree y crea una orden asociada.
+        Procesa el pago utilizando la pasarela configurada en PAYMENT_GATEWAY y crea una orden asociada.
+
+        Si la petición incluye la cabecera Idempotency-Key, los reintentos con la
+        misma llave devuelven la respuesta original sin repetir el cobro.
 
         Body Parameters:
             nonce (str): Nonce del método de pago obtenido desde el cliente.
@@ -199,6 +135,8 @@ class ProcessPaymentView(APIView):
             postal_zip_code (str): Código postal del cliente.
             country_region (str): País/Región del cliente.
             telephone_number (str): Número de teléfono del cliente.
+            quote_token (str, opcional): Token devuelto por get-payment-total.
+                Si el carrito no cambió se usa sin volver a cotizar.
 
         Returns:
             Response: Estado de la transacción y detalles de la orden.
@@ -207,10 +145,8 @@ class ProcessPaymentView(APIView):
         user = self.request.user
         data = self.request.data
 
-        tax = 0.14 # Impuesto para Guatemala
-
         nonce = data['nonce']
-        shipping_id = str(data['shipping_id'])
+        shipping_id = data['shipping_id']
         coupon_name = str(data['coupon_name'])
 
         full_name = data['full_name']
@@ -222,180 +158,123 @@ class ProcessPaymentView(APIView):
         country_region = data['country_region']
         telephone_number = data['telephone_number']
 
-        # revisar si datos de shipping son validos
-        if not Shipping.objects.filter(id__iexact=shipping_id).exists():
-            return Response(
-                {'error': 'Invalid shipping option'},
-                status=status.HTTP_404_NOT_FOUND
-            )
-
         cart = Cart.objects.get(user=user)
 
-        # revisar si usuario tiene items en carrito
-        if not CartItem.objects.filter(cart=cart).exists():
-            return Response(
-                {'error': 'Need to have items in cart'},
-                status=status.HTTP_404_NOT_FOUND
-            )
+        # Usar la cotizacion firmada si el carrito no cambio desde entonces
+        checkout = None
+        quote_token = data.get('quote_token')
 
-        # Obtener carrito del usuario
-        cart_items = CartItem.objects.filter(cart=cart)
+        if quote_token:
+            checkout = load_quote_token(
+                quote_token, user, cart.version, shipping_id, coupon_name)
 
-        # revisar si hay stock
+        if checkout is not None:
+            try:
+                # La reserva tambien verifica que los precios no cambiaron
+                reserve_stock(checkout.lines, check_prices=True)
+            except OutOfStockError:
+                checkout = None
+
+        if checkout is not None:
+            lines = checkout.lines
+            quote = checkout.quote
+            shipping = checkout.shipping
+        else:
+            # revisar si datos de shipping son validos
+            shipping = find_shipping(shipping_id)
 
-        for cart_item in cart_items:
-            if not Product.objects.filter(id=cart_item.product.id).exists():
+            if shipping is None:
                 return Response(
-                    {'error': 'Transaction failed, a proudct ID does not exist'},
+                    {'error': 'Invalid shipping option'},
                     status=status.HTTP_404_NOT_FOUND
                 )
-            if int(cart_item.count) > int(cart_item.product.quantity):
-                return Response(
-                    {'error': 'Not enough items in stock'},
-                    status=status.HTTP_200_OK
-                )
 
-        total_amount = 0.0
+            # Obtener carrito del usuario con sus productos
+            cart_items = list(
+                CartItem.objects.select_related('product').filter(cart=cart))
 
-        for cart_item in cart_items:
-            total_amount += (float(cart_item.product.price)
-                             * float(cart_item.count))
-
-        # Cupones
-        if coupon_name != '':
-            if FixedPriceCoupon.objects.filter(name__iexact=coupon_name).exists():
-                fixed_price_coupon = FixedPriceCoupon.objects.get(
-                    name=coupon_name
+            # revisar si usuario tiene items en carrito
+            if not cart_items:
+                return Response(
+                    {'error': 'Need to have items in cart'},
+                    status=status.HTTP_404_NOT_FOUND
                 )
-                discount_amount = float(fixed_price_coupon.discount_price)
 
-                if discount_amount < total_amount:
-                    total_amount -= discount_amount
-
-            elif PercentageCoupon.objects.filter(name__iexact=coupon_name).exists():
-                percentage_coupon = PercentageCoupon.objects.get(
-                    name=coupon_name
-                )
-                discount_percentage = float(
-                    percentage_coupon.discount_percentage)
+            # revisar si hay stock
+            for cart_item in cart_items:
+                if int(cart_item.count) > int(cart_item.product.quantity):
+                    return Response(
+                        {'error': 'Not enough items in stock'},
+                        status=status.HTTP_200_OK
+                    )
 
-                if discount_percentage > 1 and discount_percentage < 100:
-                    total_amount -= (total_amount *
-                                     (discount_percentage / 100))
+            lines = cart_lines(cart_items)
+            quote = price_lines(
+                lines,
+                coupon=find_coupon(coupon_name),
+                shipping=shipping
+            )
 
-        total_amount += (total_amount * tax)
+            # Reservar el stock antes de cobrar; la actualizacion es atomica
+            try:
+                reserve_stock(lines)
+            except OutOfStockError:
+                return Response(
+                    {'error': 'Not enough items in stock'},
+                    status=status.HTTP_200_OK
+                )
 
-        shipping = Shipping.objects.get(id=int(shipping_id))
+        total_amount = quote.total_amount
 
         shipping_name = shipping.name
         shipping_time = shipping.time_to_delivery
         shipping_price = shipping.price
 
-        total_amount += float(shipping_price)
-        total_amount = round(total_amount, 2)
+        # Desde aqui el cobro pudo hacerse: un reintento no debe repetirlo
+        mark_charged(request)
 
         try:
-            # Crear transaccion con braintree
-            newTransaction = gateway.transaction.sale(
-                {
-                    'amount': str(total_amount),
-                    'payment_method_nonce': str(nonce['nonce']),
-                    'options': {
-                        'submit_for_settlement': True
-                    }
-                }
-            )
+            # Crear transaccion con la pasarela de pago
+            newTransaction = get_gateway().sale(total_amount, nonce['nonce'])
         except:
+            release_stock(lines)
             return Response(
                 {'error': 'Error processing the transaction'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-        if newTransaction.is_success or newTransaction.transaction:
-            for cart_item in cart_items:
-                update_product = Product.objects.get(id=cart_item.product.id)
-
-                # encontrar cantidad despues de coompra
-                quantity = int(update_product.quantity) - int(cart_item.count)
-
-                # obtener cantidad de producto por vender
-                sold = int(update_product.sold) + int(cart_item.count)
-
-                # actualizar el producto
-                Product.objects.filter(id=cart_item.product.id).update(
-                    quantity=quantity, sold=sold
-                )
-
-            # crear orden
+        if newTransaction.is_success or newTransaction.transaction_id:
+            # crear orden con todos sus items, vaciar el carrito y encolar
+            # los efectos secundarios en una sola transaccion
             try:
-                order = Order.objects.create(
-                    user=user,
-                    transaction_id=newTransaction.transaction.id,
-                    amount=total_amount,
-                    full_name=full_name,
-                    address_line_1=address_line_1,
-                    address_line_2=address_line_2,
-                    city=city,
-                    state_province_region=state_province_region,
-                    postal_zip_code=postal_zip_code,
-                    country_region=country_region,
-                    telephone_number=telephone_number,
-                    shipping_name=shipping_name,
-                    shipping_time=shipping_time,
-                    shipping_price=float(shipping_price)
-                )
-            except:
-                return Response(
-                    {'error': 'Transaction succeeded but failed to create the order'},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-
-            for cart_item in cart_items:
-                try:
-                    # agarrar el producto
-                    product = Product.objects.get(id=cart_item.product.id)
-
-                    OrderItem.objects.create(
-                        product=product,
-                        order=order,
-                        name=product.name,
-                        price=cart_item.product.price,
-                        count=cart_item.count
-                    )
-                except:
-                    return Response(
-                        {'error': 'Transaction succeeded and order created, but failed to create an order item'},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                with transaction.atomic():
+                    order = Order.objects.create(
+                        user=user,
+                        transaction_id=newTransaction.transaction_id,
+                        amount=total_amount,
+                        full_name=full_name,
+                        address_line_1=address_line_1,
+                        address_line_2=address_line_2,
+                        city=city,
+                        state_province_region=state_province_region,
+                        postal_zip_code=postal_zip_code,
+                        country_region=country_region,
+                        telephone_number=telephone_number,
+                        shipping_name=shipping_name,
+                        shipping_time=shipping_time,
+                        shipping_price=shipping_price
                     )
 
-            try:
-                send_mail(
-                    'Your Order Details',
-                    'Hey ' + full_name + ','
-                    + '\n\nWe recieved your order!'
-                    + '\n\nGive us some time to process your order and ship it out to you.'
-                    + '\n\nYou can go on your user dashboard to check the status of your order.'
-                    + '\n\nSincerely,'
-                    + '\nShop Time',
-                    'mail@ninerogues.com',
-                    [user.email],
-                    fail_silently=False
-                )
-            except:
-                return Response(
-                    {'error': 'Transaction succeeded and order created, but failed to send email'},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
+                    create_order_items(order, lines)
 
-            try:
-                # Vaciar carrito de compras
-                CartItem.objects.filter(cart=cart).delete()
+                    CartItem.objects.filter(cart=cart).delete()
+                    Cart.objects.filter(user=user).update(total_items=0)
+                    bump_cart_version(user)
 
-                # Actualizar carrito
-                Cart.objects.filter(user=user).update(total_items=0)
+                    enqueue_order_side_effects(order, user)
             except:
                 return Response(
-                    {'error': 'Transaction succeeded and order successful, but failed to clear cart'},
+                    {'error': 'Transaction succeeded but failed to create the order'},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
 
@@ -404,6 +283,7 @@ class ProcessPaymentView(APIView):
                 status=status.HTTP_200_OK
             )
         else:
+            release_stock(lines)
             return Response(
                 {'error': 'Transaction failed'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,255 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from itertools import chain
+from django.db import DatabaseError, connections
+from .models import Product
+from .search import tokenize
+
+MIN_QUERY_LENGTH = 2
+MAX_SUGGESTIONS = 20
+SIMILARITY_THRESHOLD = 0.3
+REFRESH_SECONDS = 5 * 60
+
+
+def trigrams(word):
+    """
+    Obtiene los trigramas de una palabra rellenada con un espacio a cada lado.
+
+    A diferencia de pg_trgm no se usa el trigrama de la primera letra sola, que
+    aparece en demasiados productos y haría lenta la búsqueda aproximada.
+
+    Returns:
+        set: Trigramas de la palabra.
+    """
+    word = ' %s ' % word
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+class AutocompleteIndex:
+    """
+    Índice en memoria de los nombres de productos para sugerencias al escribir.
+
+    Las palabras de cada nombre se guardan en una lista ordenada para resolver
+    prefijos con búsqueda binaria, y sus trigramas en un índice invertido para
+    tolerar errores de escritura. Cada producto guarda además sus ventas para
+    ordenar las sugerencias por popularidad.
+    """
+
+    def __init__(self):
+        self._names = {}
+        self._sold = {}
+        self._words = {}
+        self._tokens = []
+        self._postings = {}
+        self._trigrams = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, product_id, name, sold):
+        words = set(tokenize(name))
+
+        with self._lock:
+            self._remove(product_id)
+
+            self._names[product_id] = name
+            self._sold[product_id] = sold
+            self._words[product_id] = words
+
+            for word in words:
+                if word not in self._postings:
+                    self._postings[word] = set()
+                    self._tokens.insert(bisect_left(self._tokens, word), word)
+                self._postings[word].add(product_id)
+
+                for trigram in trigrams(word):
+                    self._trigrams.setdefault(trigram, set()).add(product_id)
+
+    def remove(self, product_id):
+        with self._lock:
+            self._remove(product_id)
+
+    def suggest(self, text, limit=10):
+        """
+        Sugiere productos para un texto incompleto.
+
+        Primero busca productos cuyo nombre tenga cada palabra del texto como
+        prefijo. Si no alcanzan, completa con productos cuyo nombre se parezca
+        a la última palabra por trigramas, para tolerar errores de escritura.
+        Dentro de cada grupo se ordena por unidades vendidas.
+
+        Returns:
+            list: Diccionarios con 'id' y 'name' de cada sugerencia.
+        """
+        terms = tokenize(text)
+
+        if not terms or len(' '.join(terms)) < MIN_QUERY_LENGTH:
+            return []
+
+        with self._lock:
+            matches = self._prefix_matches(terms)
+            result = heapq.nlargest(
+                limit, matches, key=lambda product_id: (
+                    self._sold[product_id], -product_id))
+
+            if len(result) < limit and len(terms[-1]) >= 3:
+                result += self._similar(terms[-1], limit - len(result), matches)
+
+            return [
+                {'id': product_id, 'name': self._names[product_id]}
+                for product_id in result
+            ]
+
+    def _prefix_matches(self, terms):
+        matches = None
+
+        for term in terms:
+            start = end = bisect_left(self._tokens, term)
+
+            while (end < len(self._tokens)
+                   and self._tokens[end].startswith(term)):
+                end += 1
+
+            term_matches = set().union(*[
+                self._postings[token] for token in self._tokens[start:end]])
+
+            matches = term_matches if matches is None else matches & term_matches
+
+            if not matches:
+                break
+
+        return matches
+
+    def _similar(self, term, limit, exclude):
+        term_trigrams = trigrams(term)
+        shared = Counter(chain.from_iterable(
+            self._trigrams.get(trigram, ()) for trigram in term_trigrams))
+
+        minimum = SIMILARITY_THRESHOLD * len(term_trigrams)
+        candidates = [
+            product_id for product_id, count in shared.items()
+            if count >= minimum and product_id not in exclude
+        ]
+
+        return heapq.nlargest(limit, candidates, key=lambda product_id: (
+            shared[product_id], self._sold[product_id], -product_id))
+
+    def _remove(self, product_id):
+        if product_id not in self._names:
+            return
+
+        del self._names[product_id]
+        del self._sold[product_id]
+
+        for word in self._words.pop(product_id):
+            postings = self._postings[word]
+            postings.discard(product_id)
+
+            if not postings:
+                del self._postings[word]
+                del self._tokens[bisect_left(self._tokens, word)]
+
+            for trigram in trigrams(word):
+                postings = self._trigrams[trigram]
+                postings.discard(product_id)
+
+                if not postings:
+                    del self._trigrams[trigram]
+
+
+_index = None
+_built_at = 0
+_lock = threading.Lock()
+_refreshing = threading.Event()
+
+
+def build_index():
+    """
+    Construye el índice de autocompletado con una sola consulta.
+
+    Returns:
+        AutocompleteIndex: Índice con todos los productos.
+    """
+    index = AutocompleteIndex()
+
+    for product_id, name, sold in Product.objects.values_list(
+            'id', 'name', 'sold').iterator():
+        index.add(product_id, name, sold)
+
+    return index
+
+
+def get_index():
+    """
+    Obtiene el índice de autocompletado del proceso.
+
+    Se construye en el primer uso si warm_up no lo hizo al arrancar. Después
+    de REFRESH_SECONDS se reconstruye en un hilo aparte para incorporar las
+    ventas y los cambios hechos por otros procesos, sin bloquear la petición.
+    """
+    global _index, _built_at
+
+    with _lock:
+        if _index is None:
+            _index = build_index()
+            _built_at = time.monotonic()
+        elif (time.monotonic() - _built_at > REFRESH_SECONDS
+              and not _refreshing.is_set()):
+            _refreshing.set()
+            threading.Thread(target=_refresh, daemon=True).start()
+
+        return _index
+
+
+def warm_up():
+    """
+    Construye el índice al arrancar el servidor.
+    """
+    try:
+        get_index()
+    except DatabaseError:
+        # Sin base de datos se construirá en la primera petición
+        pass
+
+
+def index_product(product):
+    """
+    Agrega o actualiza un producto guardado en el índice, si ya existe.
+    """
+    if _index is not None:
+        _index.add(product.id, product.name, product.sold)
+
+
+def unindex_product(product_id):
+    """
+    Quita un producto eliminado del índice, si ya existe.
+    """
+    if _index is not None:
+        _index.remove(product_id)
+
+
+def refresh_index():
+    """
+    Reconstruye el índice de autocompletado y reemplaza el actual.
+    """
+    global _index, _built_at
+
+    index = build_index()
+
+    with _lock:
+        _index = index
+        _built_at = time.monotonic()
+
+
+def _refresh():
+    try:
+        refresh_index()
+    except DatabaseError:
+        pass
+    finally:
+        _refreshing.clear()
+        connections.close_all()
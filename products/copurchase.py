@@ -0,0 +1,171 @@
+import numpy as np
+from scipy import sparse
+from django.db import transaction
+from orders.models import OrderItem
+from .models import Product, RelatedProduct
+
+COPURCHASE = RelatedProduct.Source.copurchase
+
+NEIGHBOURS = 10
+MIN_COUNT = 2
+CHUNK_SIZE = 100000
+METRICS = ('cosine', 'lift')
+_BATCH_SIZE = 5000
+
+
+def iter_order_chunks(chunk_size=CHUNK_SIZE):
+    """
+    Recorre los items de todos los pedidos en bloques de pedidos completos.
+
+    Los items se leen ordenados por pedido con un cursor, por lo que solo un
+    bloque está en memoria. Los items del último pedido de cada bloque pasan
+    al siguiente para no partir un pedido en dos.
+
+    Yields:
+        tuple: Arreglos con el pedido y el producto de cada item del bloque.
+    """
+    items = OrderItem.objects.order_by('order_id').values_list(
+        'order_id', 'product_id').iterator(chunk_size=min(chunk_size, 10000))
+
+    orders = []
+    products = []
+
+    for order_id, product_id in items:
+        if len(orders) >= chunk_size and order_id != orders[-1]:
+            yield np.array(orders), np.array(products)
+            orders = []
+            products = []
+
+        orders.append(order_id)
+        products.append(product_id)
+
+    if orders:
+        yield np.array(orders), np.array(products)
+
+
+def build_cooccurrence(product_ids, chunk_size=CHUNK_SIZE):
+    """
+    Construye la matriz dispersa de pedidos en común entre productos.
+
+    Cada bloque de pedidos se convierte en una matriz de incidencia binaria B
+    (pedido x producto) y se acumula B.T @ B, de modo que la memoria depende
+    del número de pares distintos y no del número de items.
+
+    Args:
+        product_ids (numpy.ndarray): IDs de los productos ordenados; su
+            posición es la fila y columna de cada producto en la matriz.
+        chunk_size (int): Items leídos por bloque.
+
+    Returns:
+        tuple: Matriz CSR con el número de pedidos que contienen cada par de
+        productos (en la diagonal, los de cada producto) y número de pedidos.
+    """
+    size = len(product_ids)
+    cooccurrence = sparse.csr_matrix((size, size), dtype=np.int64)
+    order_count = 0
+
+    for orders, products in iter_order_chunks(chunk_size):
+        columns = np.searchsorted(product_ids, products)
+        # Ignorar items de productos que ya no existen
+        found = columns < size
+        found[found] &= product_ids[columns[found]] == products[found]
+
+        rows = np.unique(orders, return_inverse=True)[1]
+        incidence = sparse.csr_matrix(
+            (np.ones(found.sum(), dtype=np.int64),
+             (rows[found], columns[found])),
+            shape=(rows.max() + 1, size))
+        # Un producto repetido en un pedido cuenta una vez
+        incidence.data[:] = 1
+
+        cooccurrence = cooccurrence + incidence.T @ incidence
+        order_count += int(rows.max()) + 1
+
+    return cooccurrence.tocsr(), order_count
+
+
+def score_pairs(cooccurrence, order_count, metric='cosine', min_count=MIN_COUNT):
+    """
+    Puntúa los pares de productos comprados juntos.
+
+    Con 'cosine' el puntaje es c / sqrt(n_a * n_b) y con 'lift' es
+    c * N / (n_a * n_b), donde c son los pedidos con ambos productos, n los
+    pedidos con cada uno y N el total de pedidos.
+
+    Returns:
+        scipy.sparse.coo_matrix: Puntaje de cada par con al menos min_count
+        pedidos en común, sin la diagonal.
+    """
+    counts = cooccurrence.diagonal().astype(np.float64)
+    pairs = cooccurrence.tocoo()
+
+    keep = (pairs.row != pairs.col) & (pairs.data >= min_count)
+    rows = pairs.row[keep]
+    cols = pairs.col[keep]
+    together = pairs.data[keep].astype(np.float64)
+
+    if metric == 'lift':
+        scores = together * order_count / (counts[rows] * counts[cols])
+    else:
+        scores = together / np.sqrt(counts[rows] * counts[cols])
+
+    return sparse.coo_matrix((scores, (rows, cols)), shape=cooccurrence.shape)
+
+
+def top_neighbours(scores, k=NEIGHBOURS):
+    """
+    Obtiene los k vecinos de mayor puntaje de cada producto.
+
+    Los pares se ordenan por fila y puntaje con un solo lexsort y la posición
+    de cada par dentro de su fila se calcula sin recorrer las filas en Python.
+
+    Returns:
+        tuple: Arreglos con la fila, la columna, la posición y el puntaje de
+        cada vecino.
+    """
+    order = np.lexsort((scores.col, -scores.data, scores.row))
+    rows = scores.row[order]
+    cols = scores.col[order]
+    data = scores.data[order]
+
+    ranks = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    keep = ranks < k
+
+    return rows[keep], cols[keep], ranks[keep], data[keep]
+
+
+def rebuild_copurchase(k=NEIGHBOURS, metric='cosine', min_count=MIN_COUNT,
+                       chunk_size=CHUNK_SIZE):
+    """
+    Recalcula los productos comprados juntos de todos los productos a partir
+    del historial de pedidos y los guarda en RelatedProduct.
+
+    Returns:
+        int: Número de pares guardados.
+    """
+    product_ids = np.array(
+        Product.objects.order_by('id').values_list('id', flat=True),
+        dtype=np.int64)
+
+    cooccurrence, order_count = build_cooccurrence(product_ids, chunk_size)
+    rows, cols, ranks, data = top_neighbours(
+        score_pairs(cooccurrence, order_count, metric, min_count), k)
+
+    products = product_ids[rows].tolist()
+    related = product_ids[cols].tolist()
+    ranks = ranks.tolist()
+    data = data.tolist()
+
+    with transaction.atomic():
+        RelatedProduct.objects.filter(source=COPURCHASE).delete()
+
+        for start in range(0, len(products), _BATCH_SIZE):
+            end = start + _BATCH_SIZE
+            RelatedProduct.objects.bulk_create(
+                RelatedProduct(product_id=product_id, related_id=related_id,
+                               source=COPURCHASE, rank=rank, score=score)
+                for product_id, related_id, rank, score in zip(
+                    products[start:end], related[start:end],
+                    ranks[start:end], data[start:end]))
+
+    return len(products)
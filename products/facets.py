@@ -0,0 +1,157 @@
+from decimal import Decimal
+from django.db.models import Count, Q
+from category.services import get_child_categories, get_descendant_ids
+from .models import Product
+
+# Rangos de precio de las facetas: nombre, mínimo incluido y máximo excluido.
+# Los nombres son los valores que acepta el parámetro price_range.
+PRICE_BUCKETS = [
+    ('1 - 19', Decimal(1), Decimal(20)),
+    ('20 - 39', Decimal(20), Decimal(40)),
+    ('40 - 59', Decimal(40), Decimal(60)),
+    ('60 - 79', Decimal(60), Decimal(80)),
+    ('More than 80', Decimal(80), None),
+]
+
+
+class UnknownCategory(Exception):
+    """
+    Se lanza cuando una categoría del filtro no existe.
+    """
+
+
+def price_bounds(price_range):
+    """
+    Convierte uno de los nombres de PRICE_BUCKETS en límites de precio.
+
+    Returns:
+        tuple: Mínimo y máximo del rango, o (None, None) si el nombre no
+        corresponde a ningún rango.
+    """
+    for label, low, high in PRICE_BUCKETS:
+        if label == price_range:
+            return low, high
+
+    return None, None
+
+
+def _price_q(low, high):
+    q = Q()
+
+    if low is not None:
+        q &= Q(price__gte=low)
+    if high is not None:
+        q &= Q(price__lt=high)
+
+    return q
+
+
+def _category_q(category_id):
+    category_ids = get_descendant_ids(category_id)
+
+    if category_ids is None:
+        raise UnknownCategory()
+
+    return Q(category_id__in=category_ids)
+
+
+class ProductFilter:
+    """
+    Filtro de productos por categoría, precio y disponibilidad, con el conteo
+    de resultados de cada faceta.
+
+    El filtro se divide por dimensión para que el conteo de cada opción de una
+    faceta aplique todos los filtros salvo los de su propia dimensión: el
+    conteo de cada categoría respeta el precio elegido y el de cada rango de
+    precio respeta las categorías elegidas. Así cada insignia indica cuántos
+    resultados habría al elegir esa opción.
+
+    Args:
+        category_id (int): Categoría cuyo subárbol se busca, o 0 para todas.
+            Sus subcategorías directas son las opciones de la faceta de
+            categorías.
+        category_ids (list): Categorías elegidas dentro de category_id; un
+            producto coincide si está en el subárbol de alguna. Vacía o None
+            para no filtrar.
+        price_min (Decimal): Precio mínimo, incluido, o None.
+        price_max (Decimal): Precio máximo, excluido, o None.
+        in_stock (bool): Solo productos con unidades disponibles.
+
+    Raises:
+        UnknownCategory: Si category_id o alguna de category_ids no existe.
+    """
+
+    def __init__(self, category_id=0, category_ids=None, price_min=None,
+                 price_max=None, in_stock=False):
+        self.children = get_child_categories(category_id)
+
+        if self.children is None:
+            raise UnknownCategory()
+
+        self.base = Q()
+
+        if category_id != 0:
+            self.base &= _category_q(category_id)
+        if in_stock:
+            self.base &= Q(quantity__gt=0)
+
+        self.categories = Q()
+
+        for selected_id in category_ids or []:
+            self.categories |= _category_q(selected_id)
+
+        self.prices = _price_q(price_min, price_max)
+
+    def queryset(self):
+        """
+        Productos que cumplen todos los filtros.
+        """
+        return Product.objects.filter(self.base, self.categories, self.prices)
+
+    def facet_counts(self):
+        """
+        Cuenta los resultados de cada opción de las facetas.
+
+        Todos los conteos salen de una sola consulta agregada sobre los
+        productos de category_id, con un COUNT(...) FILTER (WHERE ...) por
+        opción.
+
+        Returns:
+            dict: 'total' con el número de resultados, 'categories' con 'id',
+            'name' y 'count' de cada subcategoría y 'prices' con 'label',
+            'min', 'max' y 'count' de cada rango de PRICE_BUCKETS.
+        """
+        counts = {
+            'total': Count('id', filter=self.categories & self.prices),
+        }
+
+        for child in self.children:
+            counts['category_%s' % child['id']] = Count(
+                'id', filter=_category_q(child['id']) & self.prices)
+
+        for i, (label, low, high) in enumerate(PRICE_BUCKETS):
+            counts['price_%s' % i] = Count(
+                'id', filter=_price_q(low, high) & self.categories)
+
+        row = Product.objects.filter(self.base).aggregate(**counts)
+
+        return {
+            'total': row['total'],
+            'categories': [
+                {
+                    'id': child['id'],
+                    'name': child['name'],
+                    'count': row['category_%s' % child['id']],
+                }
+                for child in self.children
+            ],
+            'prices': [
+                {
+                    'label': label,
+                    'min': low,
+                    'max': high,
+                    'count': row['price_%s' % i],
+                }
+                for i, (label, low, high) in enumerate(PRICE_BUCKETS)
+            ],
+        }
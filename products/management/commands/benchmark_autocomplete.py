@@ -0,0 +1,51 @@
+import random
+import string
+import timeit
+from django.core.management.base import BaseCommand
+from products.autocomplete import AutocompleteIndex
+
+
+class Command(BaseCommand):
+    help = ('Mide el tiempo de las sugerencias de autocompletado sobre un '
+            'índice en memoria con nombres generados.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000,
+                            help='Productos del índice.')
+        parser.add_argument('--repeat', type=int, default=1000,
+                            help='Sugerencias medidas.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        vocabulary = [
+            ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9)))
+            for _ in range(5000)
+        ]
+
+        # Índice sin base de datos: la medición no incluye la construcción
+        index = AutocompleteIndex()
+        for product_id in range(options['products']):
+            index.add(product_id, ' '.join(rng.choices(vocabulary, k=3)),
+                      rng.randint(0, 1000))
+
+        queries = []
+        for _ in range(options['repeat']):
+            word = rng.choice(vocabulary)
+            if rng.random() < 0.2:
+                # Simular un error de escritura intercambiando dos letras
+                position = rng.randrange(len(word) - 1)
+                word = (word[:position] + word[position + 1]
+                        + word[position] + word[position + 2:])
+            queries.append(word[:rng.randint(2, len(word))])
+
+        timings = [
+            timeit.timeit(lambda: index.suggest(query), number=1)
+            for query in queries
+        ]
+        timings.sort()
+
+        self.stdout.write(
+            '%s products: median %.3f ms, p99 %.3f ms' % (
+                options['products'],
+                timings[len(timings) // 2] * 1000,
+                timings[int(len(timings) * 0.99) - 1] * 1000))
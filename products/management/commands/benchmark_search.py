@@ -0,0 +1,87 @@
+import random
+import string
+import timeit
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from category.models import Category
+from products.models import Product
+from products.search import rebuild_index, search_products, uses_postgres
+
+WORDS = [
+    'camisa', 'pantalon', 'zapato', 'gorra', 'chaqueta', 'vestido', 'falda',
+    'calcetin', 'bufanda', 'guante', 'cinturon', 'mochila', 'reloj', 'anillo',
+    'collar', 'pulsera', 'lentes', 'sombrero', 'blusa', 'sudadero', 'algodon',
+    'lana', 'cuero', 'seda', 'lino', 'rojo', 'azul', 'verde', 'negro', 'blanco',
+    'gris', 'amarillo', 'deportivo', 'elegante', 'casual', 'verano', 'invierno',
+    'hombre', 'mujer', 'nino', 'talla', 'grande', 'pequeno', 'mediano', 'nuevo',
+    'clasico', 'moderno', 'comodo', 'ligero', 'resistente',
+]
+
+
+class Command(BaseCommand):
+    help = ('Compara el tiempo de la búsqueda indexada con la búsqueda '
+            'icontains. Los productos generados se revierten al terminar.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000,
+                            help='Productos generados para la medición.')
+        parser.add_argument('--repeat', type=int, default=50,
+                            help='Búsquedas medidas por cada método.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        # Vocabulario con palabras generadas para que cada búsqueda coincida
+        # con una fracción pequeña del catálogo, como en un catálogo real
+        vocabulary = WORDS + [
+            ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 10)))
+            for _ in range(5000)
+        ]
+
+        with transaction.atomic():
+            category = Category.objects.create(name='Benchmark search')
+            Product.objects.bulk_create(
+                (Product(
+                    name=' '.join(rng.choices(vocabulary, k=3)),
+                    description=' '.join(rng.choices(vocabulary, k=20)),
+                    price='10.00', compare_price='12.00', category=category)
+                 for _ in range(options['products'])),
+                batch_size=1000
+            )
+            rebuild_index()
+
+            queries = [
+                rng.choice(vocabulary)[:5] for _ in range(options['repeat'])
+            ]
+
+            indexed = self._measure(queries, lambda search: search_products(
+                Product.objects.all(), search))
+            icontains = self._measure(queries, lambda search: (
+                Product.objects.filter(
+                    Q(description__icontains=search) | Q(name__icontains=search)
+                ).order_by('-date_created')))
+
+            transaction.set_rollback(True)
+
+        # Quitar del índice en memoria los productos revertidos
+        rebuild_index()
+
+        self.stdout.write('%s products, %s' % (
+            options['products'],
+            'tsvector' if uses_postgres() else 'in-memory index'))
+        for label, timings in (('indexed', indexed), ('icontains', icontains)):
+            self.stdout.write('%s: median %.3f ms, p99 %.3f ms' % (
+                label,
+                timings[len(timings) // 2] * 1000,
+                timings[int(len(timings) * 0.99) - 1] * 1000))
+
+    def _measure(self, queries, search):
+        timings = [
+            timeit.timeit(
+                lambda: list(search(query)),
+                number=1)
+            for query in queries
+        ]
+        timings.sort()
+
+        return timings
@@ -0,0 +1,65 @@
+import random
+import string
+import time
+from django.core.management.base import BaseCommand
+from products.similar import BLOCK_SIZE, NEIGHBOURS, SimilarityIndex
+from .benchmark_search import WORDS
+
+
+class Command(BaseCommand):
+    help = ('Mide la construcción del índice de productos similares, el '
+            'cálculo de todos los vecinos y la actualización de un producto, '
+            'sobre un índice en memoria con textos generados.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000,
+                            help='Productos del índice.')
+        parser.add_argument('--block-size', type=int, default=BLOCK_SIZE,
+                            help='Productos calculados por multiplicación.')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Actualizaciones medidas.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        vocabulary = WORDS + [
+            ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 10)))
+            for _ in range(5000)
+        ]
+
+        def text(words):
+            return ' '.join(rng.choices(vocabulary, k=words))
+
+        documents = [
+            (product_id, text(3), text(20))
+            for product_id in range(options['products'])
+        ]
+
+        # Índice sin base de datos: se mide solo el cálculo
+        start = time.perf_counter()
+        index = SimilarityIndex(documents)
+        built = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pairs = sum(
+            len(rows) for rows, _, _, _ in index.neighbours(
+                range(len(documents)), NEIGHBOURS, options['block_size']))
+        computed = time.perf_counter() - start
+
+        timings = []
+        for _ in range(options['repeat']):
+            product_id = rng.randrange(options['products'])
+
+            start = time.perf_counter()
+            position = index.update(product_id, text(3), text(20))
+            positions = set(index.candidates(position).tolist())
+            positions.add(position)
+            for _ in index.neighbours(sorted(positions)):
+                pass
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+
+        self.stdout.write(
+            '%s products, %s terms: build %.1f s, %s pairs in %.1f s, '
+            'update median %.3f s, max %.3f s' % (
+                options['products'], len(index.vocabulary), built, pairs,
+                computed, timings[len(timings) // 2], timings[-1]))
@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand
+from products.copurchase import (
+    CHUNK_SIZE, METRICS, MIN_COUNT, NEIGHBOURS, rebuild_copurchase
+)
+
+
+class Command(BaseCommand):
+    help = ('Recalcula los productos comprados juntos a partir del historial '
+            'de pedidos.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--neighbours', type=int, default=NEIGHBOURS,
+                            help='Productos guardados por cada producto.')
+        parser.add_argument('--metric', choices=METRICS, default='cosine',
+                            help='Puntaje de cada par de productos.')
+        parser.add_argument('--min-count', type=int, default=MIN_COUNT,
+                            help='Pedidos en común mínimos de un par.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Items de pedidos leídos por bloque.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = rebuild_copurchase(
+            options['neighbours'], options['metric'], options['min_count'],
+            options['chunk_size'])
+
+        self.stdout.write('Stored %s co-purchase pairs in %.1f s' % (
+            count, time.perf_counter() - start))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from products.related import rebuild_related_products
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los productos relacionados de todos los productos.'
+
+    def handle(self, *args, **options):
+        count = rebuild_related_products()
+
+        self.stdout.write('Rebuilt related products for %s categories' % count)
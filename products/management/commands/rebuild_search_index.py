@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from products.search import rebuild_index, uses_postgres
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda de todos los productos.'
+
+    def handle(self, *args, **options):
+        count = rebuild_index()
+
+        self.stdout.write('Indexed %s products (%s)' % (
+            count, 'tsvector' if uses_postgres() else 'in-memory index'))
@@ -0,0 +1,19 @@
+import time
+from django.core.management.base import BaseCommand
+from products.similar import BLOCK_SIZE, rebuild_similar_products
+
+
+class Command(BaseCommand):
+    help = ('Recalcula los productos similares de todos los productos a '
+            'partir de su nombre y descripción.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--block-size', type=int, default=BLOCK_SIZE,
+                            help='Productos calculados por multiplicación.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = rebuild_similar_products(options['block_size'])
+
+        self.stdout.write('Stored %s similar product pairs in %.1f s' % (
+            count, time.perf_counter() - start))
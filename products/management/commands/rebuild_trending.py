@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from products.trending import rebuild_trending
+
+
+class Command(BaseCommand):
+    help = ('Reconstruye las tablas de productos en tendencia a partir de '
+            'los pedidos recientes. Debe ejecutarse periódicamente, por '
+            'ejemplo cada hora, para corregir las ventas perdidas por '
+            'escrituras simultáneas.')
+
+    def handle(self, *args, **options):
+        count = rebuild_trending()
+
+        self.stdout.write('Rebuilt %s trending leaderboards' % count)
@@ -0,0 +1,48 @@
+# Generated by Django 5.0.6 on 2026-10-18 20:15
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+# El índice GIN y el vector solo existen en PostgreSQL; en otras bases de datos
+# la búsqueda usa el índice invertido en memoria de products.search.
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute(
+        "UPDATE products_product SET search_vector = "
+        "setweight(to_tsvector(%s::regconfig, coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector(%s::regconfig, coalesce(description, '')), 'B')",
+        [settings.SEARCH_CONFIG, settings.SEARCH_CONFIG]
+    )
+    schema_editor.execute(
+        'CREATE INDEX products_product_search_vector_gin '
+        'ON products_product USING gin (search_vector)'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute(
+        'DROP INDEX IF EXISTS products_product_search_vector_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_alter_product_category_alter_product_compare_price_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Vector de búsqueda'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
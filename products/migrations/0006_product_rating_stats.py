@@ -0,0 +1,86 @@
+# Generated by Django 5.0.6 on 2026-10-18 20:24
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def populate_rating_stats(apps, schema_editor):
+    # Calcular los agregados de las reseñas existentes, igual que
+    # reviews.services.rebuild_rating_stats
+    Product = apps.get_model('products', 'Product')
+    Review = apps.get_model('reviews', 'Review')
+
+    stats = {'rating_count': Count('id'), 'rating_sum': Sum('rating')}
+    for star in range(1, 6):
+        low = star - 1 if star > 1 else -100
+        high = star if star < 5 else 100
+        stats['rating_%d' % star] = Count('id', filter=Q(rating__gt=low, rating__lte=high))
+
+    products = []
+    for row in Review.objects.values('product').annotate(**stats):
+        product = Product(id=row.pop('product'), **row)
+        product.rating_average = (
+            Decimal(product.rating_sum) / product.rating_count
+        ).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        products.append(product)
+
+    Product.objects.bulk_update(products, list(stats) + ['rating_average'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0002_category_path'),
+        ('products', '0005_hot_query_indexes'),
+        ('reviews', '0003_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_1',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Reseñas de 1 estrella'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Reseñas de 2 estrellas'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Reseñas de 3 estrellas'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Reseñas de 4 estrellas'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Reseñas de 5 estrellas'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_average',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=3, verbose_name='Calificación promedio'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Número de reseñas'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.DecimalField(decimal_places=1, default=0, editable=False, max_digits=10, verbose_name='Suma de calificaciones'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['rating_average', 'id'], name='products_pr_rating__a73453_idx'),
+        ),
+        migrations.RunPython(populate_rating_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 20:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_related_product'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='relatedproduct',
+            name='source',
+            field=models.CharField(choices=[('category', 'Category'), ('copurchase', 'Copurchase')], max_length=20, verbose_name='Origen'),
+        ),
+    ]
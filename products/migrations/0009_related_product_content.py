@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 20:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_related_product_copurchase'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='relatedproduct',
+            name='source',
+            field=models.CharField(choices=[('category', 'Category'), ('copurchase', 'Copurchase'), ('content', 'Content')], max_length=20, verbose_name='Origen'),
+        ),
+    ]
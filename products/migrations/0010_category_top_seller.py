@@ -0,0 +1,67 @@
+# Generated by Django 5.0.6 on 2026-10-18 21:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# RELATED_LIMIT + 1 de products.related, copiado para no depender del código
+# actual de la aplicación
+TOP_SELLERS = 4
+
+
+def fill_top_sellers(apps, schema_editor):
+    # Los relacionados por categoría pasan de una lista por producto a una
+    # por categoría; se calculan aquí para que la vista no quede vacía hasta
+    # correr rebuild_related_products
+    Category = apps.get_model('category', 'Category')
+    CategoryTopSeller = apps.get_model('products', 'CategoryTopSeller')
+    Product = apps.get_model('products', 'Product')
+    RelatedProduct = apps.get_model('products', 'RelatedProduct')
+
+    rows = []
+
+    for category_id, path in Category.objects.exclude(
+            path=''
+    ).values_list('id', 'path'):
+        # La ruta materializada de un descendiente empieza con la de la categoría
+        top = Product.objects.filter(
+            category__path__startswith=path
+        ).order_by('-sold', '-id').values_list('id', 'sold')[:TOP_SELLERS]
+
+        rows.extend(
+            CategoryTopSeller(category_id=category_id, product_id=product_id,
+                              rank=rank, score=sold)
+            for rank, (product_id, sold) in enumerate(top)
+        )
+
+    CategoryTopSeller.objects.bulk_create(rows, batch_size=1000)
+    RelatedProduct.objects.filter(source='category').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0002_category_path'),
+        ('products', '0009_related_product_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryTopSeller',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Posición')),
+                ('score', models.FloatField(verbose_name='Puntaje')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='category.category', verbose_name='Categoría')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Category top seller',
+                'verbose_name_plural': 'Category top sellers',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='categorytopseller',
+            constraint=models.UniqueConstraint(fields=('category', 'rank'), name='unique_category_top_seller_rank'),
+        ),
+        migrations.RunPython(fill_top_sellers, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,4 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from datetime import datetime
 from category.models import Category
@@ -7,6 +8,21 @@ from django.utils.translation import gettext_lazy as _
 
 
 class Product(models.Model):
+    class Meta:
+        # Índices para la paginación por llave (campo, id) de los listados
+        indexes = [
+            models.Index(fields=['date_created', 'id']),
+            models.Index(fields=['price', 'id']),
+            models.Index(fields=['sold', 'id']),
+            models.Index(fields=['name', 'id']),
+            # Listados filtrados por categoría
+            models.Index(fields=['category', 'sold']),
+            models.Index(fields=['category', 'price']),
+            models.Index(fields=['category', 'date_created']),
+            # Orden por calificación
+            models.Index(fields=['rating_average', 'id']),
+        ]
+
     name = models.CharField(max_length=255, verbose_name=_('Nomber'))
     description = models.TextField(verbose_name=_('Descripción'))
     price = models.DecimalField(max_digits=6, decimal_places=2, verbose_name=_('Precio'))
@@ -15,6 +31,93 @@ class Product(models.Model):
     quantity = models.IntegerField(default=0, verbose_name=_('Cantidad'))
     sold = models.IntegerField(default=0, verbose_name=_('Vendidos'))
     date_created = models.DateTimeField(default=datetime.now, verbose_name=_('Fecha de creación'))
+    # Solo se usa en PostgreSQL, ver products.search
+    search_vector = SearchVectorField(null=True, editable=False, verbose_name=_('Vector de búsqueda'))
+    # Agregados de las reseñas, mantenidos por reviews.services
+    rating_count = models.IntegerField(default=0, editable=False, verbose_name=_('Número de reseñas'))
+    rating_sum = models.DecimalField(
+        max_digits=10, decimal_places=1, default=0, editable=False, verbose_name=_('Suma de calificaciones'))
+    rating_average = models.DecimalField(
+        max_digits=3, decimal_places=2, default=0, editable=False, verbose_name=_('Calificación promedio'))
+    rating_1 = models.IntegerField(default=0, editable=False, verbose_name=_('Reseñas de 1 estrella'))
+    rating_2 = models.IntegerField(default=0, editable=False, verbose_name=_('Reseñas de 2 estrellas'))
+    rating_3 = models.IntegerField(default=0, editable=False, verbose_name=_('Reseñas de 3 estrellas'))
+    rating_4 = models.IntegerField(default=0, editable=False, verbose_name=_('Reseñas de 4 estrellas'))
+    rating_5 = models.IntegerField(default=0, editable=False, verbose_name=_('Reseñas de 5 estrellas'))
 
     def __str__(self):
         return self.name
+
+    @property
+    def rating_histogram(self):
+        """
+        Número de reseñas por estrella, de 1 a 5.
+        """
+        return {
+            star: getattr(self, 'rating_%d' % star) for star in range(1, 6)
+        }
+
+
+class RelatedProduct(models.Model):
+    """
+    Lista precalculada de productos relacionados con un producto.
+
+    Cada fila es una posición (rank) de la lista de un producto para un
+    origen, de modo que leer los primeros k es una sola búsqueda en el índice
+    único (product, source, rank).
+    """
+
+    class Meta:
+        verbose_name = 'Related product'
+        verbose_name_plural = 'Related products'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'source', 'rank'], name='unique_related_product_rank'),
+        ]
+
+    class Source(models.TextChoices):
+        # Más vendidos de la categoría; no se guardan por producto sino una
+        # sola vez por categoría en CategoryTopSeller, ver products.related
+        category = 'category'
+        # Comprados juntos en los mismos pedidos, ver products.copurchase
+        copurchase = 'copurchase'
+        # Nombre y descripción parecidos, ver products.similar
+        content = 'content'
+
+    product = models.ForeignKey(
+        Product, related_name='related_products', on_delete=models.CASCADE, verbose_name=_('Producto'))
+    related = models.ForeignKey(
+        Product, related_name='+', on_delete=models.CASCADE, verbose_name=_('Producto relacionado'))
+    source = models.CharField(max_length=20, choices=Source.choices, verbose_name=_('Origen'))
+    rank = models.PositiveSmallIntegerField(verbose_name=_('Posición'))
+    score = models.FloatField(verbose_name=_('Puntaje'))
+
+    def __str__(self):
+        return '%s -> %s' % (self.product_id, self.related_id)
+
+
+class CategoryTopSeller(models.Model):
+    """
+    Más vendidos precalculados del subárbol de una categoría.
+
+    Todos los productos de una categoría comparten los mismos relacionados,
+    así que la lista se guarda una sola vez por categoría: una venta que
+    cambia el orden reescribe unas pocas filas por categoría en lugar de la
+    lista de cada uno de sus productos.
+    """
+
+    class Meta:
+        verbose_name = 'Category top seller'
+        verbose_name_plural = 'Category top sellers'
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'rank'], name='unique_category_top_seller_rank'),
+        ]
+
+    category = models.ForeignKey(
+        Category, related_name='+', on_delete=models.CASCADE, verbose_name=_('Categoría'))
+    product = models.ForeignKey(
+        Product, related_name='+', on_delete=models.CASCADE, verbose_name=_('Producto'))
+    rank = models.PositiveSmallIntegerField(verbose_name=_('Posición'))
+    score = models.FloatField(verbose_name=_('Puntaje'))
+
+    def __str__(self):
+        return '%s -> %s' % (self.category_id, self.product_id)
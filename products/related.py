@@ -0,0 +1,198 @@
+from django.db import transaction
+from django.db.models import Subquery, Sum
+from category.models import Category
+from category.services import get_descendant_ids
+from payment import outbox
+from .models import CategoryTopSeller, Product, RelatedProduct
+
+RELATED_LIMIT = 3
+BOUGHT_TOGETHER_LIMIT = 4
+SIMILAR_LIMIT = 4
+
+CATEGORY = RelatedProduct.Source.category
+COPURCHASE = RelatedProduct.Source.copurchase
+CONTENT = RelatedProduct.Source.content
+
+
+def get_related_products(product_id, source=CATEGORY, limit=RELATED_LIMIT):
+    """
+    Obtiene los productos relacionados precalculados de un producto.
+
+    Las filas y sus productos se leen con un único JOIN sobre el índice
+    (product, source, rank). Los más vendidos de la categoría se leen de la
+    lista de la categoría del producto, sin el propio producto.
+
+    Returns:
+        list: Productos relacionados, del más al menos relevante.
+    """
+    if source == CATEGORY:
+        return [
+            top.product for top in CategoryTopSeller.objects.filter(
+                category_id=Subquery(Product.objects.filter(
+                    id=product_id).values('category_id')[:1])
+            ).exclude(
+                product_id=product_id
+            ).select_related('product').order_by('rank')[:limit]
+        ]
+
+    return [
+        related.related for related in RelatedProduct.objects.filter(
+            product_id=product_id, source=source
+        ).select_related('related').order_by('rank')[:limit]
+    ]
+
+
+def get_bought_together(product_ids, limit=BOUGHT_TOGETHER_LIMIT):
+    """
+    Obtiene los productos comprados junto con un grupo de productos, como los
+    de un carrito.
+
+    Se suman los puntajes de compra conjunta precalculados de cada producto
+    del grupo con una consulta agregada y se excluyen los del propio grupo.
+
+    Returns:
+        list: Productos, del mayor al menor puntaje total.
+    """
+    scores = list(RelatedProduct.objects.filter(
+        product_id__in=product_ids, source=COPURCHASE
+    ).exclude(
+        related_id__in=product_ids
+    ).values('related_id').annotate(
+        total=Sum('score')
+    ).order_by('-total', 'related_id')[:limit])
+
+    products = Product.objects.in_bulk([row['related_id'] for row in scores])
+
+    return [
+        products[row['related_id']] for row in scores
+        if row['related_id'] in products
+    ]
+
+
+def top_sellers(category_id, limit=RELATED_LIMIT + 1):
+    """
+    Obtiene los productos más vendidos de una categoría y sus subcategorías.
+
+    Se pide uno más que RELATED_LIMIT para poder excluir al propio producto
+    de su lista.
+
+    Returns:
+        list: Pares (ID de producto, vendidos), de más a menos vendido.
+    """
+    category_ids = get_descendant_ids(category_id) or [category_id]
+
+    return list(Product.objects.filter(
+        category_id__in=category_ids
+    ).order_by('-sold', '-id').values_list('id', 'sold')[:limit])
+
+
+def rebuild_category(category_id, top=None):
+    """
+    Reescribe la lista de más vendidos de una categoría si cambió.
+
+    La lista tiene RELATED_LIMIT + 1 filas y la comparten todos los productos
+    de la categoría, así que reescribirla no depende de cuántos productos
+    tenga.
+
+    Args:
+        category_id (int): ID de la categoría.
+        top (list): Resultado de top_sellers si ya se calculó.
+
+    Returns:
+        bool: True si la lista cambió.
+    """
+    if top is None:
+        top = top_sellers(category_id)
+
+    current = list(CategoryTopSeller.objects.filter(
+        category_id=category_id
+    ).order_by('rank').values_list('product_id', 'score'))
+
+    if current == [(product_id, float(sold)) for product_id, sold in top]:
+        return False
+
+    with transaction.atomic():
+        CategoryTopSeller.objects.filter(category_id=category_id).delete()
+        CategoryTopSeller.objects.bulk_create(
+            CategoryTopSeller(category_id=category_id, product_id=product_id,
+                              rank=rank, score=sold)
+            for rank, (product_id, sold) in enumerate(top)
+        )
+
+    return True
+
+
+def rebuild_related_products(category_ids=None):
+    """
+    Reescribe las listas de más vendidos de varias categorías.
+
+    Args:
+        category_ids: IDs de las categorías, o None para todas.
+
+    Returns:
+        int: Número de listas que cambiaron.
+    """
+    if category_ids is None:
+        category_ids = Category.objects.values_list('id', flat=True)
+
+    return sum(rebuild_category(category_id) for category_id in category_ids)
+
+
+def enqueue_refresh(product_ids):
+    """
+    Encola la actualización de las listas afectadas por varios productos.
+
+    Debe llamarse dentro de la transacción que cambió los productos; el
+    worker del outbox (process_outbox) ejecuta refresh_product fuera de la
+    petición.
+    """
+    outbox.enqueue('refresh_related_products', {'product_ids': list(product_ids)})
+
+
+def enqueue_rebuild(category_ids):
+    """
+    Encola la reconstrucción de las listas de varias categorías.
+    """
+    outbox.enqueue(
+        'rebuild_related_products', {'category_ids': list(category_ids)})
+
+
+@outbox.handler('refresh_related_products')
+def refresh_products(payload):
+    for product_id in payload['product_ids']:
+        refresh_product(product_id)
+
+
+@outbox.handler('rebuild_related_products')
+def rebuild_categories(payload):
+    rebuild_related_products(payload['category_ids'])
+
+
+def affected_categories(product_id):
+    """
+    Categorías cuyas listas de más vendidos incluyen hoy a un producto.
+    """
+    return set(CategoryTopSeller.objects.filter(
+        product_id=product_id).values_list('category_id', flat=True))
+
+
+def refresh_product(product_id):
+    """
+    Actualiza las listas de más vendidos afectadas por un producto guardado o
+    vendido.
+
+    Se recalculan las de la categoría del producto y sus categorías padre, y
+    las de las categorías de las que salió si cambió de categoría; cada lista
+    solo se escribe si cambió.
+    """
+    path = Product.objects.filter(
+        id=product_id).values_list('category__path', flat=True).first()
+    ancestor_ids = [
+        int(category_id) for category_id in path.strip('/').split('/')
+    ] if path else []
+
+    for category_id in ancestor_ids:
+        rebuild_category(category_id)
+
+    for category_id in affected_categories(product_id).difference(ancestor_ids):
+        rebuild_category(category_id)
@@ -0,0 +1,251 @@
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F
+from .models import Product
+
+# Pesos de ts_rank en orden D, C, B, A: el nombre usa A y la descripción B
+RANK_WEIGHTS = [0.1, 0.2, 0.4, 1.0]
+NAME_WEIGHT = RANK_WEIGHTS[3]
+DESCRIPTION_WEIGHT = RANK_WEIGHTS[2]
+
+_WORD_RE = re.compile(r'\w+')
+_FETCH_CHUNK = 500
+
+
+def uses_postgres():
+    """
+    Indica si la búsqueda usa el índice tsvector de PostgreSQL.
+    """
+    return connection.vendor == 'postgresql'
+
+
+def search_vector():
+    """
+    Expresión del vector de búsqueda de un producto con el nombre de peso A y
+    la descripción de peso B.
+    """
+    return (
+        SearchVector('name', weight='A', config=settings.SEARCH_CONFIG)
+        + SearchVector('description', weight='B', config=settings.SEARCH_CONFIG)
+    )
+
+
+def search_products(queryset, text):
+    """
+    Filtra y ordena productos por relevancia para un texto de búsqueda.
+
+    Cada palabra del texto se busca como prefijo y todas deben aparecer en el
+    nombre o la descripción. Las coincidencias en el nombre pesan más que las
+    de la descripción. En PostgreSQL se usa la columna search_vector con su
+    índice GIN; en otras bases de datos un índice invertido en memoria.
+
+    Args:
+        queryset: Productos sobre los que se busca.
+        text (str): Texto de búsqueda.
+
+    Returns:
+        QuerySet | list: Productos encontrados, ordenados por relevancia
+        ('rank') y luego por ID, de mayor a menor. Sin PostgreSQL se devuelve
+        una lista ya evaluada y cada producto lleva su atributo 'rank'.
+    """
+    if uses_postgres():
+        terms = _WORD_RE.findall(text.lower())
+    else:
+        terms = tokenize(text)
+
+    if not terms:
+        return queryset.none()
+
+    if uses_postgres():
+        query = SearchQuery(
+            ' & '.join('%s:*' % term for term in terms),
+            search_type='raw', config=settings.SEARCH_CONFIG)
+
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query, weights=RANK_WEIGHTS)
+        ).order_by('-rank', '-id')
+
+    ranks = dict(get_python_index().search(terms))
+    product_ids = list(ranks)
+
+    # Consultar por bloques para no superar el límite de parámetros de SQLite
+    products = []
+    for start in range(0, len(product_ids), _FETCH_CHUNK):
+        products.extend(queryset.filter(
+            id__in=product_ids[start:start + _FETCH_CHUNK]))
+
+    for product in products:
+        product.rank = ranks[product.id]
+
+    products.sort(key=lambda product: (product.rank, product.id), reverse=True)
+
+    return products
+
+
+def index_product(product):
+    """
+    Actualiza el índice de búsqueda de un producto guardado.
+    """
+    if uses_postgres():
+        Product.objects.filter(id=product.id).update(
+            search_vector=search_vector())
+    elif _python_index is not None:
+        _python_index.add(product.id, product.name, product.description)
+
+
+def unindex_product(product_id):
+    """
+    Quita un producto eliminado del índice de búsqueda.
+    """
+    if not uses_postgres() and _python_index is not None:
+        _python_index.remove(product_id)
+
+
+def rebuild_index():
+    """
+    Reconstruye el índice de búsqueda de todos los productos.
+
+    Returns:
+        int: Número de productos indexados.
+    """
+    global _python_index
+
+    if uses_postgres():
+        return Product.objects.update(search_vector=search_vector())
+
+    _python_index = _build_python_index()
+
+    return len(_python_index)
+
+
+def tokenize(text):
+    """
+    Divide un texto en palabras en minúsculas y sin acentos.
+
+    Returns:
+        list: Palabras del texto.
+    """
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+
+    return _WORD_RE.findall(text)
+
+
+class InvertedIndex:
+    """
+    Índice invertido en memoria usado cuando la base de datos no es PostgreSQL.
+
+    Guarda por cada palabra el puntaje de cada producto que la contiene y una
+    lista ordenada de palabras para resolver prefijos con búsqueda binaria.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._tokens = []
+        self._documents = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._documents)
+
+    def add(self, product_id, name, description):
+        scores = {}
+
+        for token in tokenize(name):
+            scores[token] = scores.get(token, 0) + NAME_WEIGHT
+        for token in tokenize(description):
+            scores[token] = scores.get(token, 0) + DESCRIPTION_WEIGHT
+
+        with self._lock:
+            self._remove(product_id)
+
+            for token, score in scores.items():
+                if token not in self._postings:
+                    self._postings[token] = {}
+                    self._tokens.insert(
+                        bisect_left(self._tokens, token), token)
+                self._postings[token][product_id] = score
+
+            self._documents[product_id] = list(scores)
+
+    def remove(self, product_id):
+        with self._lock:
+            self._remove(product_id)
+
+    def search(self, terms):
+        """
+        Busca productos que contengan todas las palabras como prefijo.
+
+        Returns:
+            list: Pares (ID de producto, puntaje), del más al menos relevante.
+        """
+        with self._lock:
+            scores = None
+
+            for term in terms:
+                term_scores = {}
+                position = bisect_left(self._tokens, term)
+
+                while (position < len(self._tokens)
+                       and self._tokens[position].startswith(term)):
+                    for product_id, score in self._postings[
+                            self._tokens[position]].items():
+                        term_scores[product_id] = (
+                            term_scores.get(product_id, 0) + score)
+                    position += 1
+
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        product_id: score + term_scores[product_id]
+                        for product_id, score in scores.items()
+                        if product_id in term_scores
+                    }
+
+                if not scores:
+                    return []
+
+        return sorted(scores.items(), key=lambda item: (item[1], item[0]),
+                      reverse=True)
+
+    def _remove(self, product_id):
+        for token in self._documents.pop(product_id, []):
+            postings = self._postings[token]
+            del postings[product_id]
+
+            if not postings:
+                del self._postings[token]
+                del self._tokens[bisect_left(self._tokens, token)]
+
+
+_python_index = None
+_python_index_lock = threading.Lock()
+
+
+def get_python_index():
+    """
+    Obtiene el índice invertido en memoria, construyéndolo en el primer uso.
+    """
+    global _python_index
+
+    with _python_index_lock:
+        if _python_index is None:
+            _python_index = _build_python_index()
+
+    return _python_index
+
+
+def _build_python_index():
+    index = InvertedIndex()
+
+    for product_id, name, description in Product.objects.values_list(
+            'id', 'name', 'description').iterator():
+        index.add(product_id, name, description)
+
+    return index
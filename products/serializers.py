@@ -2,12 +2,13 @@ from rest_framework import serializers
 from .models import Product
 
 class ProductSerializer(serializers.ModelSerializer):
+    rating_histogram = serializers.ReadOnlyField()
+
     class Meta:
         model = Product
         fields = [
             'id',
             'name',
-            'photo',
             'description',
             'price',
             'compare_price',
@@ -15,5 +16,7 @@ class ProductSerializer(serializers.ModelSerializer):
             'quantity',
             'sold',
             'date_created',
-            'get_thumbnail'
+            'rating_count',
+            'rating_average',
+            'rating_histogram',
         ]
\ No newline at end of file
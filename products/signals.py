@@ -0,0 +1,126 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from ecommerce.versions import bump_version, bump_versions
+from orders.models import OrderItem
+from . import autocomplete, related, search, similar, trending
+from .models import Product
+
+CATALOG_VERSION_KEY = 'products:catalog-version'
+
+
+def product_version_key(product_id):
+    """
+    Llave de la versión de un producto, para los datos en cache que solo
+    dependen de unos pocos productos, como la foto de un carrito.
+    """
+    return 'products:version:%s' % product_id
+
+
+def bump_product_versions(product_ids):
+    """
+    Invalida los datos en cache que incluyen a varios productos.
+    """
+    bump_versions([product_version_key(product_id) for product_id in product_ids])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog(sender, instance, **kwargs):
+    """
+    Invalida los datos en cache que incluyen información de productos.
+
+    Las versiones avanzan al confirmarse la transacción, para que un lector
+    que todavía ve los datos anteriores no los guarde con la versión nueva.
+    """
+    product_id = instance.id
+    transaction.on_commit(lambda: bump_version(CATALOG_VERSION_KEY))
+    transaction.on_commit(lambda: bump_product_versions([product_id]))
+
+
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    """
+    Actualiza el índice de búsqueda cuando cambia el texto de un producto.
+    """
+    if update_fields is None or {'name', 'description'} & set(update_fields):
+        search.index_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_search_index(sender, instance, **kwargs):
+    """
+    Quita del índice de búsqueda un producto eliminado.
+    """
+    search.unindex_product(instance.id)
+
+
+@receiver(post_save, sender=Product)
+def update_autocomplete_index(sender, instance, **kwargs):
+    """
+    Actualiza el índice de autocompletado del proceso con el producto guardado
+    cuando la transacción se confirma.
+    """
+    transaction.on_commit(lambda: autocomplete.index_product(instance))
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_autocomplete_index(sender, instance, **kwargs):
+    """
+    Quita del índice de autocompletado un producto eliminado.
+    """
+    product_id = instance.id
+    transaction.on_commit(lambda: autocomplete.unindex_product(product_id))
+
+
+@receiver(post_save, sender=Product)
+def update_related_products(sender, instance, **kwargs):
+    """
+    Encola la actualización de las listas de productos relacionados afectadas
+    por el producto guardado; el outbox la ejecuta fuera de la petición si la
+    transacción se confirma.
+    """
+    related.enqueue_refresh([instance.id])
+
+
+@receiver(pre_delete, sender=Product)
+def remove_from_related_products(sender, instance, **kwargs):
+    """
+    Encola la reconstrucción de las listas de productos relacionados que
+    incluían a un producto eliminado.
+    """
+    category_ids = related.affected_categories(instance.id)
+
+    if category_ids:
+        related.enqueue_rebuild(category_ids)
+
+
+@receiver(post_save, sender=Product)
+def update_similar_products(sender, instance, update_fields=None, **kwargs):
+    """
+    Encola la actualización de las listas de productos similares cuando
+    cambia el texto del producto guardado; el outbox la ejecuta fuera de la
+    petición.
+    """
+    if update_fields is None or {'name', 'description'} & set(update_fields):
+        similar.enqueue_refresh(instance.id)
+
+
+@receiver(pre_delete, sender=Product)
+def remove_from_similar_products(sender, instance, **kwargs):
+    """
+    Encola la limpieza de las listas de productos similares que incluían a un
+    producto eliminado.
+    """
+    similar.enqueue_removal(instance.id)
+
+
+@receiver(post_save, sender=OrderItem)
+def update_trending(sender, instance, created, **kwargs):
+    """
+    Suma a las tablas de tendencias la venta de un item creado cuando la
+    transacción se confirma. Los items creados con bulk_create se registran
+    en payment.services.create_order_items.
+    """
+    if created:
+        transaction.on_commit(lambda: trending.record_order_items([instance]))
@@ -0,0 +1,456 @@
+import math
+import threading
+import numpy as np
+from scipy import sparse
+from django.db import transaction
+from ecommerce.versions import bump_version, get_version
+from payment import outbox
+from .models import Product, RelatedProduct
+from .related import CONTENT
+from .search import DESCRIPTION_WEIGHT, NAME_WEIGHT, tokenize
+
+SIMILAR_VERSION_KEY = 'products:similar-version'
+
+NEIGHBOURS = 10
+# Filas calculadas por multiplicación: la matriz densa de puntajes de un
+# bloque ocupa BLOCK_SIZE x productos valores
+BLOCK_SIZE = 128
+# Las palabras presentes en más de esta fracción de los productos no
+# distinguen a ninguno y llenarían de puntajes la matriz
+MAX_DF = 0.5
+_BATCH_SIZE = 5000
+_DELETE_CHUNK = 500
+
+
+def term_weights(name, description):
+    """
+    Cuenta las palabras de un producto con los mismos pesos de la búsqueda:
+    las del nombre pesan más que las de la descripción.
+
+    Returns:
+        dict: Peso de cada palabra.
+    """
+    weights = {}
+
+    for token in tokenize(name):
+        weights[token] = weights.get(token, 0) + NAME_WEIGHT
+    for token in tokenize(description):
+        weights[token] = weights.get(token, 0) + DESCRIPTION_WEIGHT
+
+    return weights
+
+
+class SimilarityIndex:
+    """
+    Vectores TF-IDF de los productos para encontrar los de texto parecido.
+
+    Cada fila de la matriz dispersa es el vector de un producto normalizado,
+    de modo que el producto punto de dos filas es su similitud coseno. El
+    vocabulario y los IDF se fijan al construir el índice; las palabras
+    nuevas de un producto guardado después se ignoran hasta la siguiente
+    reconstrucción.
+
+    Args:
+        documents: Tuplas (ID, nombre, descripción) de los productos.
+    """
+
+    def __init__(self, documents):
+        ids = []
+        weights = []
+        document_frequency = {}
+
+        for product_id, name, description in documents:
+            terms = term_weights(name, description)
+            ids.append(product_id)
+            weights.append(terms)
+
+            for term in terms:
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+
+        self.vocabulary = {}
+        idf = []
+
+        for term, frequency in document_frequency.items():
+            if frequency <= MAX_DF * len(ids):
+                self.vocabulary[term] = len(idf)
+                idf.append(math.log((1 + len(ids)) / (1 + frequency)) + 1)
+
+        self.idf = np.array(idf, dtype=np.float32)
+        self.positions = {
+            product_id: position for position, product_id in enumerate(ids)
+        }
+
+        matrix = self._vectors(weights)
+        self._data = matrix.data
+        self._indices = matrix.indices
+        self._indptr = matrix.indptr
+        self._ids = np.array(ids, dtype=np.int64)
+        # Puntaje del último vecino guardado de cada producto, o 0 si su
+        # lista no está completa
+        self._thresholds = np.zeros(len(ids), dtype=np.float32)
+        self._rows = len(ids)
+        self.version = None
+
+    def __len__(self):
+        return len(self.positions)
+
+    @property
+    def matrix(self):
+        """
+        Matriz CSR de los vectores, sin copiar los arreglos del índice.
+        """
+        nnz = self._indptr[self._rows]
+
+        return sparse.csr_matrix(
+            (self._data[:nnz], self._indices[:nnz],
+             self._indptr[:self._rows + 1]),
+            shape=(self._rows, len(self.idf)), copy=False)
+
+    @property
+    def ids(self):
+        """
+        ID del producto de cada fila.
+        """
+        return self._ids[:self._rows]
+
+    @property
+    def thresholds(self):
+        return self._thresholds[:self._rows]
+
+    def update(self, product_id, name, description):
+        """
+        Agrega o reemplaza el vector de un producto.
+
+        Un vector reemplazado no se reescribe en su fila: la fila vieja se
+        vacía en su lugar y el nuevo se agrega al final de los arreglos, que
+        crecen al doble cuando se llenan, así que actualizar un producto no
+        copia la matriz. Las filas vacías se descartan al reconstruir.
+
+        Returns:
+            int: Nueva posición del producto, o None si su vector no cambió.
+        """
+        vector = self._vectors([term_weights(name, description)])
+        position = self.positions.get(product_id)
+
+        if position is not None:
+            if (self.matrix[position] != vector).nnz == 0:
+                return None
+
+            self._clear(position)
+
+        self.positions[product_id] = self._append(product_id, vector)
+
+        return self.positions[product_id]
+
+    def remove(self, product_id):
+        """
+        Quita un producto del índice dejando su fila vacía.
+        """
+        position = self.positions.pop(product_id, None)
+
+        if position is not None:
+            self._clear(position)
+
+    def candidates(self, position):
+        """
+        Productos cuya lista de similares puede cambiar al cambiar el vector
+        de un producto: los que se le parecen al menos tanto como su último
+        vecino guardado.
+
+        Returns:
+            numpy.ndarray: Posiciones de los productos.
+        """
+        matrix = self.matrix
+        scores = matrix @ matrix[position].T.toarray().ravel()
+
+        return np.flatnonzero((scores > 0) & (scores >= self.thresholds))
+
+    def neighbours(self, positions, k=NEIGHBOURS, block_size=BLOCK_SIZE):
+        """
+        Calcula los k productos más parecidos de varios productos.
+
+        Las similitudes se calculan por bloques de block_size productos con
+        una multiplicación de matrices dispersas, y los k mayores de cada fila
+        se eligen con argpartition, sin ordenar la fila completa. La memoria
+        depende del tamaño del bloque y no del número de productos pedidos.
+        También actualiza los umbrales de los productos calculados.
+
+        Yields:
+            tuple: Arreglos con la posición del producto, la del vecino, el
+            lugar del vecino en la lista y su puntaje, por cada bloque.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        count = min(k, len(self.ids))
+        matrix = self.matrix
+        transposed = matrix.T.tocsr()
+
+        for start in range(0, len(positions), block_size):
+            block = positions[start:start + block_size]
+            rows = np.arange(len(block))
+
+            scores = (matrix[block] @ transposed).toarray()
+            scores[rows, block] = 0
+
+            top = np.argpartition(-scores, count - 1, axis=1)[:, :count]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            # Mayor puntaje primero y, en empates, el producto más antiguo
+            order = np.lexsort((top, -top_scores), axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+            keep = top_scores > 0
+            rows = np.broadcast_to(block[:, None], top.shape)[keep]
+            ranks = np.broadcast_to(np.arange(count), top.shape)[keep]
+            top = top[keep]
+            top_scores = top_scores[keep]
+
+            last = ranks == k - 1
+            self.thresholds[block] = 0
+            self.thresholds[rows[last]] = top_scores[last]
+
+            yield rows, top, ranks, top_scores
+
+    def _vectors(self, documents):
+        indptr = [0]
+        indices = []
+        data = []
+
+        for terms in documents:
+            for term, weight in terms.items():
+                column = self.vocabulary.get(term)
+
+                if column is not None:
+                    indices.append(column)
+                    data.append(weight)
+
+            indptr.append(len(indices))
+
+        matrix = sparse.csr_matrix(
+            (np.array(data, dtype=np.float32), indices, indptr),
+            shape=(len(documents), len(self.idf)))
+        matrix = matrix @ sparse.diags(self.idf)
+
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+
+        return sparse.csr_matrix(
+            sparse.diags((1 / norms).astype(np.float32)) @ matrix)
+
+    def _clear(self, position):
+        start, end = self._indptr[position], self._indptr[position + 1]
+        self._data[start:end] = 0
+        self._thresholds[position] = 0
+
+    def _append(self, product_id, vector):
+        position = self._rows
+        start = self._indptr[position]
+        end = start + vector.nnz
+
+        if position >= len(self._ids):
+            self._ids = _grow(self._ids, position + 1)
+            self._thresholds = _grow(self._thresholds, position + 1)
+        if position + 2 > len(self._indptr):
+            self._indptr = _grow(self._indptr, position + 2)
+        if end > len(self._data):
+            self._data = _grow(self._data, end)
+            self._indices = _grow(self._indices, end)
+
+        self._data[start:end] = vector.data
+        self._indices[start:end] = vector.indices
+        self._indptr[position + 1] = end
+        self._ids[position] = product_id
+        self._thresholds[position] = 0
+        self._rows += 1
+
+        return position
+
+
+def _grow(array, size):
+    grown = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+    grown[:len(array)] = array
+
+    return grown
+
+
+_index = None
+_lock = threading.RLock()
+
+
+def build_index():
+    """
+    Construye el índice con los productos y los umbrales de las listas
+    guardadas.
+
+    Returns:
+        SimilarityIndex: Índice con todos los productos.
+    """
+    version = get_version(SIMILAR_VERSION_KEY)
+    index = SimilarityIndex(Product.objects.order_by('id').values_list(
+        'id', 'name', 'description').iterator(chunk_size=2000))
+    index.version = version
+
+    for product_id, score in RelatedProduct.objects.filter(
+            source=CONTENT, rank=NEIGHBOURS - 1
+    ).values_list('product_id', 'score').iterator():
+        position = index.positions.get(product_id)
+
+        if position is not None:
+            index.thresholds[position] = score
+
+    return index
+
+
+def get_index():
+    """
+    Obtiene el índice del proceso.
+
+    Se construye en el primer uso y se reconstruye cuando
+    rebuild_similar_products recalcula todas las listas. Las actualizaciones
+    incrementales de otros procesos no lo invalidan: cada trabajo lee de la
+    base de datos el texto actual de su producto, y las diferencias que
+    queden las corrige la reconstrucción periódica.
+    """
+    global _index
+
+    with _lock:
+        if _index is None or _index.version != get_version(SIMILAR_VERSION_KEY):
+            _index = build_index()
+
+        return _index
+
+
+def rebuild_similar_products(block_size=BLOCK_SIZE):
+    """
+    Recalcula las listas de productos similares de todos los productos.
+
+    Returns:
+        int: Número de pares guardados.
+    """
+    global _index
+
+    index = build_index()
+
+    with transaction.atomic():
+        RelatedProduct.objects.filter(source=CONTENT).delete()
+        count = _store(
+            index, sorted(index.positions.values()), block_size)
+
+    with _lock:
+        index.version = bump_version(SIMILAR_VERSION_KEY)
+        _index = index
+
+    return count
+
+
+def enqueue_refresh(product_id):
+    """
+    Encola la actualización de las listas afectadas por el texto de un
+    producto guardado.
+
+    Debe llamarse dentro de la transacción que guardó el producto; el worker
+    del outbox (process_outbox) ejecuta refresh_product fuera de la petición.
+    """
+    outbox.enqueue('refresh_similar_products', {'product_id': product_id})
+
+
+def enqueue_removal(product_id):
+    """
+    Encola la limpieza de las listas que incluyen a un producto que se va a
+    eliminar. Las filas que lo incluyen se leen antes de borrarlo.
+    """
+    outbox.enqueue('remove_similar_product', {
+        'product_id': product_id,
+        'listing_ids': listing_products(product_id),
+    })
+
+
+@outbox.handler('refresh_similar_products')
+def refresh_product(payload):
+    """
+    Actualiza las listas de similares afectadas por un producto guardado.
+
+    Se recalcula la lista del producto, las que lo incluían y las de los
+    productos a los que ahora se parece lo suficiente para entrar en ellas.
+    """
+    product_id = payload['product_id']
+    text = Product.objects.filter(
+        id=product_id).values_list('name', 'description').first()
+
+    if text is None:
+        # Eliminado después de encolar; lo limpia remove_similar_product
+        return
+
+    with _lock:
+        index = get_index()
+        position = index.update(product_id, *text)
+
+        if position is None:
+            return
+
+        positions = set(index.candidates(position).tolist())
+        positions.add(position)
+        positions.update(
+            index.positions[listing_id]
+            for listing_id in listing_products(product_id)
+            if listing_id in index.positions)
+
+        _rewrite(index, sorted(positions))
+
+
+@outbox.handler('remove_similar_product')
+def remove_product(payload):
+    """
+    Quita del índice un producto eliminado y rellena las listas que lo
+    incluían.
+    """
+    listing_ids = payload['listing_ids']
+
+    if _index is None and not listing_ids:
+        return
+
+    with _lock:
+        index = get_index()
+        index.remove(payload['product_id'])
+
+        _rewrite(index, [
+            index.positions[listing_id] for listing_id in listing_ids
+            if listing_id in index.positions
+        ])
+
+
+def listing_products(product_id):
+    """
+    Productos cuyas listas de similares incluyen hoy a un producto.
+    """
+    return list(RelatedProduct.objects.filter(
+        related_id=product_id, source=CONTENT
+    ).values_list('product_id', flat=True))
+
+
+def _rewrite(index, positions):
+    product_ids = index.ids[positions].tolist()
+
+    with transaction.atomic():
+        for start in range(0, len(product_ids), _DELETE_CHUNK):
+            RelatedProduct.objects.filter(
+                product_id__in=product_ids[start:start + _DELETE_CHUNK],
+                source=CONTENT).delete()
+
+        _store(index, positions)
+
+
+def _store(index, positions, block_size=BLOCK_SIZE):
+    count = 0
+
+    for rows, columns, ranks, scores in index.neighbours(
+            positions, NEIGHBOURS, block_size):
+        RelatedProduct.objects.bulk_create((
+            RelatedProduct(product_id=product_id, related_id=related_id,
+                           source=CONTENT, rank=rank, score=score)
+            for product_id, related_id, rank, score in zip(
+                index.ids[rows].tolist(), index.ids[columns].tolist(),
+                ranks.tolist(), scores.tolist())
+        ), batch_size=_BATCH_SIZE)
+        count += len(rows)
+
+    return count
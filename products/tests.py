@@ -1,3 +1,703 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from cart.models import CartItem
+from category.models import Category
+from orders.models import Order, OrderItem
+from payment import outbox
+from payment.pricing import Line
+from payment.services import create_order_items, reserve_stock
+from . import autocomplete
+from .copurchase import rebuild_copurchase
+from .models import CategoryTopSeller, Product, RelatedProduct
+from .related import rebuild_related_products
+from .search import rebuild_index, search_products
+from .similar import SimilarityIndex, rebuild_similar_products
+from .trending import HALF_LIFE, get_trending, rebuild_trending
 
 # Create your tests here.
+
+
+def run_outbox():
+    """
+    Ejecuta los trabajos del outbox como lo haría process_outbox.
+
+    Un solo hilo: SQLite no admite escrituras simultáneas.
+    """
+    while outbox.process_batch(workers=1):
+        pass
+
+
+class CategoryFilterTests(TestCase):
+    """
+    Verifica que los filtros por categoría incluyan todas las subcategorías.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.root = Category.objects.create(name='Root')
+        child = Category.objects.create(name='Child', parent=self.root)
+        grandchild = Category.objects.create(name='Grandchild', parent=child)
+        other = Category.objects.create(name='Other')
+
+        self.products = [
+            Product.objects.create(
+                name='Product %s' % category.name, description='Description',
+                price='10.00', compare_price='12.00', category=category)
+            for category in (self.root, child, grandchild)
+        ]
+        Product.objects.create(
+            name='Product Other', description='Description', price='10.00',
+            compare_price='12.00', category=other)
+
+    def names(self, products):
+        return sorted(product['name'] for product in products)
+
+    def test_search_covers_every_level(self):
+        response = self.client.post('/api/product/search', {
+            'search': '', 'category_id': self.root.id}, format='json')
+
+        self.assertEqual(
+            self.names(response.data['search_products']),
+            ['Product Child', 'Product Grandchild', 'Product Root'])
+
+    def test_by_search_filters_and_counts_in_two_queries(self):
+        data = {'category_id': self.root.id, 'price_range': '',
+                'sort_by': 'name', 'order': 'asc'}
+        self.client.post('/api/product/by/search', data, format='json')
+
+        # una consulta para la página y otra para todas las facetas
+        with self.assertNumQueries(2):
+            response = self.client.post(
+                '/api/product/by/search', data, format='json')
+
+        self.assertEqual(len(response.data['filtered_products']), 3)
+
+    def test_related_includes_subcategories(self):
+        rebuild_related_products()
+        response = self.client.get(
+            '/api/product/related/%s' % self.products[0].id)
+
+        self.assertEqual(
+            self.names(response.data['related_products']),
+            ['Product Child', 'Product Grandchild'])
+
+    def test_unknown_category_is_not_found(self):
+        response = self.client.post('/api/product/search', {
+            'search': '', 'category_id': 999}, format='json')
+
+        self.assertEqual(response.status_code, 404)
+
+
+class FacetTests(TestCase):
+    """
+    Verifica los filtros y conteos de facetas de la búsqueda por filtros.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.root = Category.objects.create(name='Root')
+        self.shirts = Category.objects.create(name='Shirts', parent=self.root)
+        self.pants = Category.objects.create(name='Pants', parent=self.root)
+        long_pants = Category.objects.create(name='Long', parent=self.pants)
+
+        for category, price, quantity in ((self.shirts, '10.00', 1),
+                                          (self.shirts, '45.00', 0),
+                                          (self.pants, '25.00', 1),
+                                          (long_pants, '90.00', 1)):
+            Product.objects.create(
+                name='Product', description='Description', price=price,
+                compare_price=price, category=category, quantity=quantity)
+
+    def search(self, **data):
+        data = dict({'category_id': self.root.id, 'sort_by': 'price',
+                     'order': 'asc'}, **data)
+        return self.client.post('/api/product/by/search', data, format='json')
+
+    def counts(self, facets, name):
+        return [option['count'] for option in facets[name]]
+
+    def test_counts_ignore_own_dimension(self):
+        response = self.search(category_ids=[self.pants.id], price_max=50)
+        facets = response.data['facets']
+
+        self.assertEqual(
+            [product['price'] for product in response.data['filtered_products']],
+            ['25.00'])
+        self.assertEqual(facets['total'], 1)
+        # Categorías con el filtro de precio, precios con el de categorías
+        self.assertEqual(
+            [option['name'] for option in facets['categories']], ['Shirts', 'Pants'])
+        self.assertEqual(self.counts(facets, 'categories'), [2, 1])
+        self.assertEqual(self.counts(facets, 'prices'), [0, 1, 0, 0, 1])
+
+    def test_in_stock_and_legacy_price_range(self):
+        response = self.search(in_stock=True, price_range='40 - 59')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['facets']['total'], 0)
+        self.assertEqual(
+            self.counts(response.data['facets'], 'prices'), [1, 1, 0, 0, 1])
+
+    def test_invalid_filters(self):
+        self.assertEqual(self.search(price_min='cheap').status_code, 404)
+        self.assertEqual(self.search(category_ids=[999]).status_code, 404)
+
+
+class RelatedProductTests(TransactionTestCase):
+    """
+    Verifica las listas precalculadas de productos relacionados.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.root = Category.objects.create(name='Root')
+        self.child = Category.objects.create(name='Child', parent=self.root)
+        self.products = [
+            Product.objects.create(
+                name='Product %s' % sold, description='Description',
+                price='10.00', compare_price='12.00', sold=sold,
+                category=self.root if sold % 2 else self.child)
+            for sold in range(1, 7)
+        ]
+        run_outbox()
+
+    def related(self, product):
+        response = self.client.get('/api/product/related/%s' % product.id)
+        return [item['sold'] for item in response.data['related_products']]
+
+    def test_reads_top_sellers_in_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.related(self.products[0]), [6, 5, 4])
+
+        self.assertEqual(self.related(self.products[4]), [6, 4, 3])
+        # La categoría hija solo ve su propio subárbol
+        self.assertEqual(self.related(self.products[1]), [6, 4])
+
+    def test_save_updates_lists(self):
+        product = self.products[0]
+        product.sold = 100
+        product.save()
+
+        # La actualización corre en el outbox, fuera de la petición
+        self.assertEqual(self.related(self.products[4]), [6, 4, 3])
+        run_outbox()
+
+        self.assertEqual(self.related(self.products[4]), [100, 6, 4])
+        self.assertEqual(self.related(product), [6, 5, 4])
+
+        product.category = self.child
+        product.save()
+        run_outbox()
+
+        self.assertEqual(self.related(self.products[1]), [100, 6, 4])
+
+    def test_sales_update_lists(self):
+        lines = [Line(product_id=self.products[0].id, name='Product 1',
+                      price=Decimal('10.00'), compare_price=Decimal('12.00'),
+                      count=10)]
+        Product.objects.filter(id=self.products[0].id).update(quantity=10)
+        reserve_stock(lines)
+        create_order_items(Order.objects.create(
+            user=get_user_model().objects.create_user(
+                email='related@example.com', password='Test12345',
+                first_name='Related', last_name='Tester'),
+            transaction_id='tx-related', amount='100.00',
+            full_name='Related Tester', address_line_1='Address',
+            city='City', state_province_region='Region',
+            postal_zip_code='01001', telephone_number='5555',
+            shipping_name='Standard', shipping_time='1 day',
+            shipping_price='0.00'), lines)
+        run_outbox()
+
+        self.assertEqual(self.related(self.products[4]), [11, 6, 4])
+
+    def test_delete_refills_lists(self):
+        self.products[5].delete()
+        run_outbox()
+
+        self.assertEqual(self.related(self.products[0]), [5, 4, 3])
+
+    def test_rebuild_matches_incremental(self):
+        def rows():
+            return list(CategoryTopSeller.objects.order_by(
+                'category', 'rank').values_list('category', 'product', 'score'))
+
+        expected = rows()
+        CategoryTopSeller.objects.all().delete()
+        rebuild_related_products()
+
+        self.assertEqual(rows(), expected)
+
+    def test_lists_are_stored_once_per_category(self):
+        for sold in range(7, 27):
+            Product.objects.create(
+                name='Product %s' % sold, description='Description',
+                price='10.00', compare_price='12.00', sold=0,
+                category=self.root)
+        run_outbox()
+
+        self.assertFalse(RelatedProduct.objects.filter(source='category').exists())
+        self.assertEqual(CategoryTopSeller.objects.count(), 4 + 3)
+
+        # Una venta que cambia el orden reescribe solo la lista de la
+        # categoría, sin importar cuántos productos tenga
+        Product.objects.filter(id=self.products[0].id).update(sold=50)
+
+        with CaptureQueriesContext(connection) as queries:
+            rebuild_related_products([self.root.id])
+
+        writes = [query['sql'] for query in queries
+                  if query['sql'].startswith(('INSERT', 'DELETE'))]
+        self.assertEqual(len(writes), 2)
+        self.assertEqual(self.related(self.products[4]), [50, 6, 4])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(rebuild_related_products([self.root.id]), 0)
+
+        self.assertFalse([query for query in queries
+                          if not query['sql'].startswith('SELECT')])
+
+
+class CopurchaseTests(TestCase):
+    """
+    Verifica las recomendaciones de productos comprados juntos.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='copurchase@example.com', password='Test12345',
+            first_name='Copurchase', last_name='Tester')
+        category = Category.objects.create(name='Category')
+        self.products = {
+            name: Product.objects.create(
+                name=name, description='Description', price='10.00',
+                compare_price='12.00', category=category)
+            for name in ('A', 'B', 'C', 'D')
+        }
+
+        # D se repite en un pedido: debe contar una sola vez
+        for i, names in enumerate(('AB', 'AB', 'AC', 'BDD')):
+            order = Order.objects.create(
+                user=self.user, transaction_id='tx-%s' % i, amount='10.00',
+                full_name='Copurchase Tester', address_line_1='Address',
+                city='City', state_province_region='Region',
+                postal_zip_code='01001', telephone_number='5555',
+                shipping_name='Standard', shipping_time='1 day',
+                shipping_price='0.00')
+            for name in names:
+                OrderItem.objects.create(
+                    product=self.products[name], order=order, name=name,
+                    price='10.00', count=1)
+
+    def bought_together(self, name):
+        response = self.client.get(
+            '/api/product/bought-together/%s' % self.products[name].id)
+        return [item['name'] for item in response.data['bought_together']]
+
+    def test_neighbours_are_ranked_by_score(self):
+        self.assertEqual(rebuild_copurchase(min_count=1), 6)
+
+        self.assertEqual(self.bought_together('A'), ['B', 'C'])
+        self.assertEqual(self.bought_together('B'), ['A', 'D'])
+        self.assertEqual(self.bought_together('C'), ['A'])
+        self.assertAlmostEqual(
+            RelatedProduct.objects.get(
+                product=self.products['D'], source='copurchase').score, 1 / 3 ** 0.5)
+
+    def test_min_count_drops_rare_pairs(self):
+        rebuild_copurchase(min_count=2)
+
+        self.assertEqual(self.bought_together('A'), ['B'])
+        self.assertEqual(self.bought_together('D'), [])
+
+    def test_rebuild_reads_orders_in_chunks(self):
+        rebuild_copurchase(min_count=1)
+        expected = list(RelatedProduct.objects.order_by(
+            'product', 'rank').values_list('product', 'related', 'score'))
+
+        rebuild_copurchase(min_count=1, chunk_size=1)
+
+        self.assertEqual(list(RelatedProduct.objects.order_by(
+            'product', 'rank').values_list('product', 'related', 'score')),
+            expected)
+
+    def test_cart_suggestions_exclude_cart_items(self):
+        rebuild_copurchase(min_count=1)
+        self.client.force_authenticate(user=self.user)
+
+        for name in ('A', 'C'):
+            CartItem.objects.create(
+                cart=self.user.cart, product=self.products[name], count=1)
+
+        response = self.client.get('/api/cart/bought-together')
+
+        self.assertEqual(
+            [item['name'] for item in response.data['bought_together']], ['B'])
+
+    def test_unknown_product(self):
+        response = self.client.get('/api/product/bought-together/0')
+
+        self.assertEqual(response.status_code, 404)
+
+
+class SimilarProductTests(TransactionTestCase):
+    """
+    Verifica las listas de productos con texto parecido.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name='Category')
+        self.products = {
+            name: self.create(name, description)
+            for name, description in (
+                ('Camisa de algodón', 'Ropa de verano'),
+                ('Camisa de lino', 'Ropa fresca de verano'),
+                ('Reloj digital', 'Resistente al agua'),
+                ('Reloj analógico', 'Correa de cuero'),
+                ('Gorra', 'Accesorio'),
+            )
+        }
+        rebuild_similar_products()
+
+    def create(self, name, description):
+        return Product.objects.create(
+            name=name, description=description, price='10.00',
+            compare_price='12.00', category=self.category)
+
+    def similar(self, name):
+        response = self.client.get(
+            '/api/product/similar/%s' % self.products[name].id)
+        return [item['name'] for item in response.data['similar_products']]
+
+    def test_lists_follow_text_similarity(self):
+        self.assertEqual(self.similar('Camisa de algodón'), ['Camisa de lino'])
+        self.assertEqual(self.similar('Reloj digital'), ['Reloj analógico'])
+        self.assertEqual(self.similar('Gorra'), [])
+
+    def test_new_product_enters_lists(self):
+        self.products['Camisa de seda'] = self.create(
+            'Camisa de seda', 'Ropa de fiesta')
+        run_outbox()
+
+        self.assertCountEqual(
+            self.similar('Camisa de seda'),
+            ['Camisa de algodón', 'Camisa de lino'])
+        self.assertIn('Camisa de seda', self.similar('Camisa de algodón'))
+
+    def test_text_change_updates_lists(self):
+        product = self.products['Gorra']
+        product.name = 'Reloj de bolsillo'
+
+        product.save()
+        run_outbox()
+
+        self.assertIn('Reloj de bolsillo', self.similar('Reloj digital'))
+
+        product.name = 'Gorra'
+
+        product.save()
+        run_outbox()
+
+        self.assertEqual(self.similar('Reloj digital'), ['Reloj analógico'])
+
+    def test_delete_removes_from_lists(self):
+        self.products['Camisa de lino'].delete()
+        run_outbox()
+
+        self.assertEqual(self.similar('Camisa de algodón'), [])
+
+    def test_blocks_match_single_multiply(self):
+        index = SimilarityIndex(Product.objects.values_list(
+            'id', 'name', 'description'))
+
+        def pairs(block_size):
+            return [
+                (row, column, rank)
+                for rows, columns, ranks, _ in index.neighbours(
+                    range(len(index)), block_size=block_size)
+                for row, column, rank in zip(rows, columns, ranks)
+            ]
+
+        self.assertEqual(pairs(1), pairs(1000))
+
+    def test_update_appends_row_without_copying_matrix(self):
+        index = SimilarityIndex(Product.objects.values_list(
+            'id', 'name', 'description'))
+        watch = self.products['Reloj digital'].id
+        index.update(watch, 'Reloj de pulsera', 'Resistente al agua')
+        old_position = index.positions[watch]
+        # Los arreglos crecen al doble, así que la segunda fila cabe
+        buffers = (index._data, index._indices, index._indptr)
+
+        position = index.update(watch, 'Camisa de lino', 'Ropa fresca de verano')
+
+        self.assertNotEqual(position, old_position)
+        self.assertEqual(index.matrix[old_position].count_nonzero(), 0)
+        for before, after in zip(
+                buffers, (index._data, index._indices, index._indptr)):
+            self.assertIs(before, after)
+
+        rows, columns, ranks, scores = next(index.neighbours([position]))
+        self.assertEqual(
+            index.ids[columns[0]], self.products['Camisa de lino'].id)
+        self.assertAlmostEqual(scores[0], 1, places=5)
+
+
+class TrendingTests(TestCase):
+    """
+    Verifica las tablas de productos en tendencia.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        user = get_user_model().objects.create_user(
+            email='trending@example.com', password='Test12345',
+            first_name='Trending', last_name='Tester')
+        self.order = Order.objects.create(
+            user=user, transaction_id='tx-trending', amount='10.00',
+            full_name='Trending Tester', address_line_1='Address',
+            city='City', state_province_region='Region',
+            postal_zip_code='01001', telephone_number='5555',
+            shipping_name='Standard', shipping_time='1 day',
+            shipping_price='0.00')
+        self.root = Category.objects.create(name='Root')
+        self.child = Category.objects.create(name='Child', parent=self.root)
+        self.products = {
+            name: Product.objects.create(
+                name=name, description='Description', price='10.00',
+                compare_price='12.00', category=category, sold=sold)
+            for name, category, sold in (
+                ('Old', self.root, 1000), ('New', self.child, 0),
+                ('Other', self.root, 0))
+        }
+
+    def sell(self, name, count, age=0):
+        with self.captureOnCommitCallbacks(execute=True):
+            OrderItem.objects.create(
+                product=self.products[name], order=self.order, name=name,
+                price='10.00', count=count,
+                date_added=timezone.now() - timedelta(seconds=age))
+
+    def trending(self, **params):
+        response = self.client.get('/api/product/trending', params)
+        return [item['name'] for item in response.data['trending_products']]
+
+    def test_sales_update_global_and_category_boards(self):
+        self.sell('Other', 1)
+        self.sell('New', 3)
+
+        self.assertEqual(self.trending(), ['New', 'Other'])
+        # La categoría padre incluye las ventas de sus subcategorías
+        self.assertEqual(self.trending(category_id=self.root.id), ['New', 'Other'])
+        self.assertEqual(self.trending(category_id=self.child.id), ['New'])
+
+    def test_old_sales_decay(self):
+        self.sell('Old', 10, age=4 * HALF_LIFE)
+        self.sell('New', 1)
+        rebuild_trending()
+
+        self.assertEqual(self.trending(), ['New', 'Old'])
+        score = dict(get_trending())[self.products['Old'].id]
+        self.assertAlmostEqual(score, 10 / 16, places=3)
+
+    def test_rebuild_matches_incremental(self):
+        self.sell('Other', 2)
+        self.sell('New', 1)
+        self.sell('Other', 1)
+        expected = get_trending(self.root.id)
+
+        cache.clear()
+        rebuild_trending()
+
+        for (product_id, score), (expected_id, expected_score) in zip(
+                get_trending(self.root.id), expected):
+            self.assertEqual(product_id, expected_id)
+            self.assertAlmostEqual(score, expected_score, places=3)
+
+    def test_reading_is_one_primary_key_query(self):
+        self.sell('New', 1)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.trending(limit=1), ['New'])
+
+    def test_unknown_category(self):
+        response = self.client.get('/api/product/trending', {'category_id': 999})
+
+        self.assertEqual(response.status_code, 404)
+
+
+class SearchTests(TestCase):
+    """
+    Verifica la búsqueda de productos por relevancia.
+    """
+
+    def setUp(self):
+        category = Category.objects.create(name='Category')
+        self.shirt = Product.objects.create(
+            name='Camisa de algodón', description='Ropa de verano',
+            price='10.00', compare_price='12.00', category=category)
+        self.pants = Product.objects.create(
+            name='Pantalón', description='Combina con cualquier camisa',
+            price='10.00', compare_price='12.00', category=category)
+        Product.objects.create(
+            name='Gorra', description='Accesorio', price='10.00',
+            compare_price='12.00', category=category)
+        rebuild_index()
+
+    def search(self, text):
+        return [product.id for product in search_products(
+            Product.objects.all(), text)]
+
+    def test_name_matches_rank_first(self):
+        self.assertEqual(self.search('camisa'), [self.shirt.id, self.pants.id])
+
+    def test_prefix_and_accent_insensitive_matching(self):
+        self.assertEqual(self.search('algod'), [self.shirt.id])
+        self.assertEqual(self.search('PANTALON'), [self.pants.id])
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.search('camisa verano'), [self.shirt.id])
+        self.assertEqual(self.search('camisa gorra'), [])
+
+    def test_index_follows_product_changes(self):
+        self.shirt.name = 'Blusa'
+        self.shirt.save()
+        self.pants.delete()
+
+        self.assertEqual(self.search('camisa'), [])
+        self.assertEqual(self.search('blusa'), [self.shirt.id])
+
+
+class AutocompleteTests(TestCase):
+    """
+    Verifica las sugerencias de autocompletado.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        category = Category.objects.create(name='Category')
+        self.products = {
+            name: Product.objects.create(
+                name=name, description='Description', price='10.00',
+                compare_price='12.00', category=category, sold=sold)
+            for name, sold in (('Camisa azul', 5), ('Camisa roja', 50),
+                               ('Cámara digital', 20), ('Pantalón', 1))
+        }
+        autocomplete.refresh_index()
+
+    def suggest(self, text):
+        response = self.client.get('/api/product/autocomplete', {'q': text})
+        return [suggestion['name'] for suggestion in response.data['suggestions']]
+
+    def test_prefix_suggestions_are_ordered_by_popularity(self):
+        self.assertEqual(
+            self.suggest('cam'), ['Camisa roja', 'Cámara digital', 'Camisa azul'])
+        self.assertEqual(self.suggest('camisa az'), ['Camisa azul'])
+
+    def test_typos_are_tolerated(self):
+        self.assertEqual(self.suggest('pantlon'), ['Pantalón'])
+
+    def test_suggestions_do_not_touch_the_database(self):
+        with self.assertNumQueries(0):
+            self.suggest('cam')
+
+    def test_index_is_updated_incrementally(self):
+        index = autocomplete.AutocompleteIndex()
+        index.add(1, 'Camisa azul', 5)
+        index.add(2, 'Camisa roja', 50)
+        index.add(1, 'Gorra azul', 5)
+        index.remove(2)
+
+        self.assertEqual(index.suggest('cam'), [])
+        self.assertEqual(index.suggest('gor'), [{'id': 1, 'name': 'Gorra azul'}])
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    Verifica la paginación por cursor de los listados de productos.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        category = Category.objects.create(name='Category')
+        # Precios repetidos para comprobar el desempate por ID
+        self.products = [
+            Product.objects.create(
+                name='Camisa %s' % i, description='Description',
+                price='%s.00' % (10 + i % 3), compare_price='12.00',
+                category=category)
+            for i in range(7)
+        ]
+        rebuild_index()
+
+    def walk(self, fetch, key):
+        ids = []
+        cursor = None
+
+        while True:
+            data = fetch(cursor)
+            ids += [product['id'] for product in data[key]]
+            cursor = data['next_cursor']
+            if cursor is None:
+                return ids
+
+    def test_pages_cover_every_product_once_in_order(self):
+        ids = self.walk(lambda cursor: self.client.get(
+            '/api/product/get-products',
+            {'sortBy': 'price', 'order': 'desc', 'limit': 2,
+             **({'cursor': cursor} if cursor else {})}
+        ).data, 'products')
+
+        expected = sorted(
+            self.products, key=lambda p: (p.price, p.id), reverse=True)
+        self.assertEqual(ids, [product.id for product in expected])
+
+    def test_search_endpoints_are_paginated(self):
+        ids = self.walk(lambda cursor: self.client.post(
+            '/api/product/search',
+            {'search': 'camisa', 'category_id': 0, 'limit': 3, 'cursor': cursor},
+            format='json').data, 'search_products')
+        self.assertCountEqual(ids, [product.id for product in self.products])
+
+        ids = self.walk(lambda cursor: self.client.post(
+            '/api/product/by/search',
+            {'category_id': 0, 'price_range': '', 'sort_by': 'name',
+             'order': 'asc', 'limit': 3, 'cursor': cursor},
+            format='json').data, 'filtered_products')
+        self.assertEqual(ids, [product.id for product in self.products])
+
+    def test_next_page_is_a_single_query_without_offset(self):
+        first = self.client.get(
+            '/api/product/get-products', {'sortBy': 'sold', 'limit': 2})
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/product/get-products', {
+                'sortBy': 'sold', 'limit': 2,
+                'cursor': first.data['next_cursor']})
+
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('OFFSET', queries[0]['sql'])
+
+    def test_cursor_from_another_ordering_is_rejected(self):
+        first = self.client.get(
+            '/api/product/get-products', {'sortBy': 'sold', 'limit': 2})
+
+        response = self.client.get('/api/product/get-products', {
+            'sortBy': 'price', 'limit': 2,
+            'cursor': first.data['next_cursor']})
+
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,194 @@
+import time
+from datetime import datetime, timezone
+from django.core.cache import cache
+from category.models import Category
+from orders.models import OrderItem
+from .models import Product
+
+# Tiempo en segundos en que una venta pierde la mitad de su peso
+HALF_LIFE = 3 * 24 * 3600
+# Las ventas más viejas que WINDOW pesan menos de una milésima de una nueva
+WINDOW = 10 * HALF_LIFE
+# Cada tabla lleva la base de sus puntajes al presente cuando pasan
+# REBASE_AFTER segundos, para que los puntajes no crezcan sin límite
+REBASE_AFTER = 30 * HALF_LIFE
+# Productos guardados por tabla: más de los que se leen, para que un producto
+# que cae del final de la lista no pierda de inmediato sus ventas recientes
+CAPACITY = 500
+TRENDING_LIMIT = 6
+
+_GLOBAL_KEY = 'products:trending:global'
+_CATEGORY_KEY = 'products:trending:category:%s'
+
+# Cada tabla se guarda en la cache como {'epoch': t0, 'entries': [...]},
+# con entries ordenada de mayor a menor puntaje como pares (ID de producto,
+# puntaje). Una venta de count unidades en el instante t suma
+# count * 2 ** ((t - t0) / HALF_LIFE): en lugar de reducir todos los
+# puntajes con el paso del tiempo crecen las ventas nuevas, lo que mantiene
+# el orden sin reescribir la tabla completa. El puntaje actual es el
+# guardado por 2 ** ((t0 - ahora) / HALF_LIFE).
+
+
+def board_key(category_id=None):
+    """
+    Llave de la cache de la tabla global o de una categoría.
+    """
+    if category_id:
+        return _CATEGORY_KEY % category_id
+
+    return _GLOBAL_KEY
+
+
+def get_trending(category_id=None, limit=TRENDING_LIMIT):
+    """
+    Obtiene los productos en tendencia de la tienda o de una categoría y sus
+    subcategorías.
+
+    La tabla ya está ordenada, así que leer los primeros limit es una lectura
+    de la cache sin consultas a la base de datos.
+
+    Returns:
+        list: Pares (ID de producto, puntaje actual), de mayor a menor.
+    """
+    board = cache.get(board_key(category_id))
+
+    if board is None:
+        return []
+
+    decay = 2 ** ((board['epoch'] - time.time()) / HALF_LIFE)
+
+    return [
+        (product_id, score * decay)
+        for product_id, score in board['entries'][:limit]
+    ]
+
+
+def get_trending_products(category_id=None, limit=TRENDING_LIMIT):
+    """
+    Obtiene los productos en tendencia con una sola consulta por llave
+    primaria.
+
+    Returns:
+        list: Productos, de mayor a menor puntaje.
+    """
+    product_ids = [
+        product_id for product_id, score in get_trending(category_id, limit)
+    ]
+    products = Product.objects.in_bulk(product_ids)
+
+    return [
+        products[product_id] for product_id in product_ids
+        if product_id in products
+    ]
+
+
+def record_order_items(items):
+    """
+    Suma a las tablas las ventas de items de pedidos recién creados.
+
+    Cada producto suma en la tabla global y en las de su categoría y sus
+    categorías padre. Las tablas se leen y se escriben con un solo
+    get_many y un solo set_many; dos compras simultáneas pueden pisar sus
+    cambios, lo que corrige la reconstrucción periódica.
+    """
+    counts = {}
+
+    for item in items:
+        counts[item.product_id] = counts.get(item.product_id, 0) + item.count
+
+    if not counts:
+        return
+
+    paths = dict(Product.objects.filter(
+        id__in=counts).values_list('id', 'category__path'))
+    increments = {}
+
+    for product_id, count in counts.items():
+        for key in _board_keys(paths.get(product_id)):
+            board = increments.setdefault(key, {})
+            board[product_id] = board.get(product_id, 0) + count
+
+    now = time.time()
+    boards = cache.get_many(increments)
+
+    cache.set_many({
+        key: _add(boards.get(key), board_increments, now)
+        for key, board_increments in increments.items()
+    }, None)
+
+
+def rebuild_trending():
+    """
+    Reconstruye todas las tablas a partir de los items de pedidos de WINDOW.
+
+    Corrige las ventas perdidas por escrituras simultáneas o por tablas
+    sacadas de la cache, y quita las tablas de categorías sin ventas
+    recientes.
+
+    Returns:
+        int: Número de tablas guardadas.
+    """
+    now = time.time()
+    since = datetime.fromtimestamp(now - WINDOW, tz=timezone.utc)
+    scores = {}
+
+    for product_id, count, date_added, path in OrderItem.objects.filter(
+            date_added__gte=since
+    ).values_list(
+        'product_id', 'count', 'date_added', 'product__category__path'
+    ).iterator(chunk_size=2000):
+        weight = count * 2 ** ((date_added.timestamp() - now) / HALF_LIFE)
+
+        for key in _board_keys(path):
+            board = scores.setdefault(key, {})
+            board[product_id] = board.get(product_id, 0) + weight
+
+    cache.set_many({
+        key: {'epoch': now, 'entries': _top(board)}
+        for key, board in scores.items()
+    }, None)
+    stale = [_GLOBAL_KEY] + [
+        board_key(category_id)
+        for category_id in Category.objects.values_list('id', flat=True)
+    ]
+    cache.delete_many([key for key in stale if key not in scores])
+
+    return len(scores)
+
+
+def _board_keys(path):
+    keys = [_GLOBAL_KEY]
+
+    if path:
+        keys.extend(
+            board_key(category_id) for category_id in path.strip('/').split('/'))
+
+    return keys
+
+
+def _add(board, increments, now):
+    if board is None:
+        board = {'epoch': now, 'entries': []}
+    elif now - board['epoch'] > REBASE_AFTER:
+        decay = 2 ** ((board['epoch'] - now) / HALF_LIFE)
+        board = {
+            'epoch': now,
+            'entries': [
+                (product_id, score * decay)
+                for product_id, score in board['entries']
+            ],
+        }
+
+    growth = 2 ** ((now - board['epoch']) / HALF_LIFE)
+    scores = dict(board['entries'])
+
+    for product_id, count in increments.items():
+        scores[product_id] = scores.get(product_id, 0) + count * growth
+
+    return {'epoch': board['epoch'], 'entries': _top(scores)}
+
+
+def _top(scores):
+    return sorted(
+        scores.items(), key=lambda entry: (entry[1], entry[0]), reverse=True
+    )[:CAPACITY]
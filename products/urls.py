@@ -1,12 +1,16 @@
 from django.urls import path
 
-from .views import ProductDetailView, ListProductsView, ListSearchView, ListRelatedView, ListBySearchView
+from .views import ProductDetailView, ListProductsView, ListSearchView, ListRelatedView, ListBySearchView, AutocompleteView, ListBoughtTogetherView, ListSimilarView, ListTrendingView
 
 app_name="product"
 urlpatterns = [
     path('product/<productId>', ProductDetailView.as_view()),
     path('get-products', ListProductsView.as_view()),
+    path('trending', ListTrendingView.as_view()),
     path('search', ListSearchView.as_view()),
     path('related/<productId>', ListRelatedView.as_view()),
+    path('similar/<productId>', ListSimilarView.as_view()),
+    path('bought-together/<productId>', ListBoughtTogetherView.as_view()),
     path('by/search', ListBySearchView.as_view()),
+    path('autocomplete', AutocompleteView.as_view()),
 ]
\ No newline at end of file
@@ -1,21 +1,42 @@
+from decimal import Decimal
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions, status
 from products.models import Product
 from products.serializers import ProductSerializer
-from category.models import Category
-from django.db.models import Q
+from category.services import get_descendant_ids
+from ecommerce.conditional import version_condition
+from ecommerce.pagination import InvalidCursor, get_page_size, keyset_paginate
+from .autocomplete import MAX_SUGGESTIONS, get_index
+from .facets import ProductFilter, UnknownCategory, price_bounds
+from .related import (
+    BOUGHT_TOGETHER_LIMIT, CONTENT, COPURCHASE, SIMILAR_LIMIT, get_related_products
+)
+from .search import search_products
+from .signals import CATALOG_VERSION_KEY, product_version_key
+from .trending import TRENDING_LIMIT, get_trending_products
 
 # Create your views here.
 
 
+def product_detail_version_key(request, productId, format=None):
+    try:
+        return product_version_key(int(productId))
+    except:
+        return None
+
+
 class ProductDetailView(APIView):
     """
     Vista para obtener detalles de un producto específico por su ID.
+
+    Admite peticiones condicionales con la versión del producto, de modo que
+    las ventas y reseñas de otros productos no cambian su ETag.
     """
 
     permission_classes = (permissions.AllowAny, )
 
+    @version_condition(product_detail_version_key)
     def get(self, request, productId, format=None):
         """
         Obtiene los detalles de un producto.
@@ -48,64 +69,119 @@ class ProductDetailView(APIView):
 
 class ListProductsView(APIView):
     """
-    Vista para listar productos con opciones de ordenamiento y límite.
+    Vista para listar productos con opciones de ordenamiento y paginación por cursor.
+
+    Admite peticiones condicionales con la versión del catálogo.
     """
 
     permission_classes = (permissions.AllowAny, )
 
+    @version_condition(CATALOG_VERSION_KEY)
     def get(self, request, format=None):
         """
-        Lista productos con opciones de ordenamiento y límite.
+        Lista una página de productos con opciones de ordenamiento.
 
         Parámetros de Consulta:
-        - sortBy: Campo por el cual ordenar los productos ('date_created', 'price', 'sold', 'name').
+        - sortBy: Campo por el cual ordenar los productos ('date_created', 'price', 'sold', 'name', 'rating_average').
         - order: Orden de los productos ('asc' para ascendente, 'desc' para descendente).
-        - limit: Número máximo de productos a retornar (entero).
+        - limit: Número de productos por página (entero, máximo 100).
+        - cursor: Cursor 'next_cursor' de la página anterior.
 
         Retorna:
-        - 200 OK: Lista de productos en formato JSON según los parámetros especificados.
-        - 404 Not Found: Si no se encuentran productos que coincidan con los criterios.
+        - 200 OK: Página de productos y 'next_cursor' para la siguiente, o None si es la última.
+        - 404 Not Found: Si no se encuentran productos o el límite o el cursor no son válidos.
         """
 
         sortBy = request.query_params.get('sortBy')
 
-        if not (sortBy == 'date_created' or sortBy == 'price' or sortBy == 'sold' or sortBy == 'name'):
+        if not (sortBy == 'date_created' or sortBy == 'price' or sortBy == 'sold' or sortBy == 'name'
+                or sortBy == 'rating_average'):
             sortBy = 'date_created'
 
         order = request.query_params.get('order')
-        limit = request.query_params.get('limit')
-
-        if not limit:
-            limit = 6
 
         try:
-            limit = int(limit)
+            limit = get_page_size(request.query_params.get('limit'), 6)
         except:
             return Response(
                 {'error': 'Limit must be an integer'},
                 status=status.HTTP_404_NOT_FOUND)
 
-        if limit <= 0:
-            limit = 6
-
         if order == 'desc':
             sortBy = '-' + sortBy
-            products = Product.objects.order_by(sortBy).all()[:int(limit)]
-        elif order == 'asc':
-            products = Product.objects.order_by(sortBy).all()[:int(limit)]
-        else:
-            products = Product.objects.order_by(sortBy).all()
 
-        products = ProductSerializer(products, many=True)
+        try:
+            products, next_cursor = keyset_paginate(
+                Product.objects.all(), sortBy,
+                request.query_params.get('cursor'), limit)
+        except InvalidCursor:
+            return Response(
+                {'error': 'Invalid cursor'},
+                status=status.HTTP_404_NOT_FOUND)
 
         if products:
-            return Response({'products': products.data}, status=status.HTTP_200_OK)
+            products = ProductSerializer(products, many=True)
+            return Response(
+                {'products': products.data, 'next_cursor': next_cursor},
+                status=status.HTTP_200_OK)
         else:
             return Response(
                 {'error': 'No products to list'},
                 status=status.HTTP_404_NOT_FOUND)
 
 
+class ListTrendingView(APIView):
+    """
+    Vista para listar los productos en tendencia de la tienda o de una categoría.
+
+    A diferencia de sortBy=sold, que usa las ventas de siempre, las ventas pierden peso con el
+    tiempo. Las tablas se mantienen ordenadas en la cache (ver products.trending).
+    """
+
+    permission_classes = (permissions.AllowAny, )
+
+    def get(self, request, format=None):
+        """
+        Lista los productos en tendencia.
+
+        Parámetros de Consulta:
+        - category_id: ID de la categoría, incluidas sus subcategorías (entero, opcional).
+        - limit: Número máximo de productos (entero, máximo 100).
+
+        Retorna:
+        - 200 OK: Productos en tendencia en formato JSON, de mayor a menor puntaje.
+        - 404 Not Found: Si la categoría o el límite no son válidos.
+        """
+
+        try:
+            category_id = int(request.query_params.get('category_id') or 0)
+        except:
+            return Response(
+                {'error': 'Category ID must be an integer'},
+                status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            limit = get_page_size(
+                request.query_params.get('limit'), TRENDING_LIMIT)
+        except:
+            return Response(
+                {'error': 'Limit must be an integer'},
+                status=status.HTTP_404_NOT_FOUND)
+
+        products = get_trending_products(category_id, limit)
+
+        if not products and category_id and get_descendant_ids(category_id) is None:
+            return Response(
+                {'error': 'Category with this ID does not exist'},
+                status=status.HTTP_404_NOT_FOUND)
+
+        products = ProductSerializer(products, many=True)
+
+        return Response(
+            {'trending_products': products.data},
+            status=status.HTTP_200_OK)
+
+
 class ListSearchView(APIView):
     """
     Vista para realizar búsquedas filtradas de productos por nombre, descripción y/o categoría.
@@ -116,13 +192,18 @@ class ListSearchView(APIView):
         """
         Realiza una búsqueda filtrada de productos.
 
+        Las palabras de la búsqueda se buscan como prefijo en el nombre y la
+        descripción, y los resultados se ordenan por relevancia.
+
         Parámetros de Entrada (en el cuerpo de la solicitud):
         - search: Cadena de búsqueda para buscar en el nombre o descripción del producto.
         - category_id: ID de la categoría por la cual filtrar los productos (entero).
+        - limit: Número de productos por página (entero, máximo 100).
+        - cursor: Cursor 'next_cursor' de la página anterior.
 
         Retorna:
-        - 200 OK: Productos que coinciden con los criterios de búsqueda y filtros aplicados en formato JSON.
-        - 404 Not Found: Si la categoría especificada no existe o si el ID de la categoría no es válido.
+        - 200 OK: Página de productos que coinciden con la búsqueda y 'next_cursor' para la siguiente.
+        - 404 Not Found: Si la categoría especificada no existe o si el ID de la categoría, el límite o el cursor no son válidos.
         """
 
         data = self.request.data
@@ -134,65 +215,57 @@ class ListSearchView(APIView):
                 {'error': 'Category ID must be an integer'},
                 status=status.HTTP_404_NOT_FOUND)
 
+        try:
+            limit = get_page_size(data.get('limit'))
+        except:
+            return Response(
+                {'error': 'Limit must be an integer'},
+                status=status.HTTP_404_NOT_FOUND)
+
         search = data['search']
+        search_results = Product.objects.all()
+
+        if category_id != 0:
+            # la categoria y todas sus subcategorias, a cualquier profundidad
+            category_ids = get_descendant_ids(category_id)
+
+            # revisar si existe categoria
+            if category_ids is None:
+                return Response(
+                    {'error': 'Category not found'},
+                    status=status.HTTP_404_NOT_FOUND)
+
+            search_results = search_results.filter(category_id__in=category_ids)
 
         # Chequear si algo input ocurrio en la busqueda
         if len(search) == 0:
             # mostrar todos los productos si no hay input en la busqueda
-            search_results = Product.objects.order_by('-date_created').all()
+            ordering = '-date_created'
         else:
-            # Si hay criterio de busqueda, filtramos con dicho criterio usando Q
-            search_results = Product.objects.filter(
-                Q(description__icontains=search) | Q(name__icontains=search)
-            )
-
-        if category_id == 0:
-            search_results = ProductSerializer(search_results, many=True)
-            return Response(
-                {'search_products': search_results.data},
-                status=status.HTTP_200_OK)
+            # Si hay criterio de busqueda, usar el indice de busqueda ordenado por relevancia
+            search_results = search_products(search_results, search)
+            ordering = '-rank'
 
-        # revisar si existe categoria
-        if not Category.objects.filter(id=category_id).exists():
+        try:
+            search_results, next_cursor = keyset_paginate(
+                search_results, ordering, data.get('cursor'), limit)
+        except InvalidCursor:
             return Response(
-                {'error': 'Category not found'},
+                {'error': 'Invalid cursor'},
                 status=status.HTTP_404_NOT_FOUND)
 
-        category = Category.objects.get(id=category_id)
-
-        # si la categoria tiene apdre, fitlrar solo por la categoria y no el padre tambien
-        if category.parent:
-            search_results = search_results.order_by(
-                '-date_created'
-            ).filter(category=category)
-
-        else:
-            # si esta categoria padre no tiene hijjos, filtrar solo la categoria
-            if not Category.objects.filter(parent=category).exists():
-                search_results = search_results.order_by(
-                    '-date_created'
-                ).filter(category=category)
-
-            else:
-                categories = Category.objects.filter(parent=category)
-                filtered_categories = [category]
-
-                for cat in categories:
-                    filtered_categories.append(cat)
-
-                filtered_categories = tuple(filtered_categories)
-
-                search_results = search_results.order_by(
-                    '-date_created'
-                ).filter(category__in=filtered_categories)
-
         search_results = ProductSerializer(search_results, many=True)
-        return Response({'search_products': search_results.data}, status=status.HTTP_200_OK)
+        return Response(
+            {'search_products': search_results.data, 'next_cursor': next_cursor},
+            status=status.HTTP_200_OK)
 
 
 class ListRelatedView(APIView):
     """
     Vista para obtener productos relacionados a partir del ID de un producto dado.
+
+    Los relacionados son los más vendidos de la categoría del producto y sus subcategorías,
+    precalculados por categoría en la tabla CategoryTopSeller (ver products.related).
     """
 
     permission_classes = (permissions.AllowAny, )
@@ -216,64 +289,134 @@ class ListRelatedView(APIView):
                 {'error': 'Product ID must be an integer'},
                 status=status.HTTP_404_NOT_FOUND)
 
+        related_products = get_related_products(product_id)
+
+        if related_products:
+            related_products = ProductSerializer(related_products, many=True)
+            return Response(
+                {'related_products': related_products.data},
+                status=status.HTTP_200_OK)
+
         # Existe product id
         if not Product.objects.filter(id=product_id).exists():
             return Response(
                 {'error': 'Product with this product ID does not exist'},
                 status=status.HTTP_404_NOT_FOUND)
 
-        category = Product.objects.get(id=product_id).category
+        return Response(
+            {'error': 'No related products found'},
+            status=status.HTTP_200_OK)
 
-        if Product.objects.filter(category=category).exists():
-            # Si la categoria tiene padrem filtrar solo por la categoria y no el padre tambien
-            if category.parent:
-                related_products = Product.objects.order_by(
-                    '-sold'
-                ).filter(category=category)
-            else:
-                if not Category.objects.filter(parent=category).exists():
-                    related_products = Product.objects.order_by(
-                        '-sold'
-                    ).filter(category=category)
 
-                else:
-                    categories = Category.objects.filter(parent=category)
-                    filtered_categories = [category]
+class ListSimilarView(APIView):
+    """
+    Vista para obtener los productos con nombre y descripción parecidos a los de un producto dado.
 
-                    for cat in categories:
-                        filtered_categories.append(cat)
+    A diferencia de los comprados juntos, no dependen del historial de pedidos, por lo que también
+    sirven para productos nuevos. Se calculan con vectores TF-IDF y se guardan en la tabla
+    RelatedProduct (ver products.similar).
+    """
 
-                    filtered_categories = tuple(filtered_categories)
-                    related_products = Product.objects.order_by(
-                        '-sold'
-                    ).filter(category__in=filtered_categories)
+    permission_classes = (permissions.AllowAny, )
 
-            # Excluir producto que estamos viendo
-            related_products = related_products.exclude(id=product_id)
-            related_products = ProductSerializer(related_products, many=True)
+    def get(self, request, productId, format=None):
+        """
+        Obtiene los productos similares a un producto.
 
-            if len(related_products.data) > 3:
-                return Response(
-                    {'related_products': related_products.data[:3]},
-                    status=status.HTTP_200_OK)
-            elif len(related_products.data) > 0:
-                return Response(
-                    {'related_products': related_products.data},
-                    status=status.HTTP_200_OK)
-            else:
-                return Response(
-                    {'error': 'No related products found'},
-                    status=status.HTTP_200_OK)
+        Parámetros:
+        - productId: ID del producto (entero).
+        - limit: Número máximo de productos (entero, parámetro de consulta).
 
-        else:
+        Retorna:
+        - 200 OK: Productos similares en formato JSON, del más al menos parecido.
+        - 404 Not Found: Si el ID o el límite no son válidos o si el producto no existe.
+        """
+
+        try:
+            product_id = int(productId)
+        except:
             return Response(
-                {'error': 'No related products found'},
-                status=status.HTTP_200_OK)
+                {'error': 'Product ID must be an integer'},
+                status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            limit = get_page_size(
+                request.query_params.get('limit'), SIMILAR_LIMIT)
+        except:
+            return Response(
+                {'error': 'Limit must be an integer'},
+                status=status.HTTP_404_NOT_FOUND)
+
+        products = get_related_products(product_id, CONTENT, limit)
+
+        if not products and not Product.objects.filter(id=product_id).exists():
+            return Response(
+                {'error': 'Product with this product ID does not exist'},
+                status=status.HTTP_404_NOT_FOUND)
+
+        products = ProductSerializer(products, many=True)
+
+        return Response(
+            {'similar_products': products.data},
+            status=status.HTTP_200_OK)
+
+
+class ListBoughtTogetherView(APIView):
+    """
+    Vista para obtener los productos que suelen comprarse junto con un producto dado.
+
+    Los productos salen de la tabla RelatedProduct, calculada a partir del historial de pedidos
+    por el comando rebuild_copurchase (ver products.copurchase).
+    """
+
+    permission_classes = (permissions.AllowAny, )
+
+    def get(self, request, productId, format=None):
+        """
+        Obtiene los productos comprados junto con un producto.
+
+        Parámetros:
+        - productId: ID del producto (entero).
+        - limit: Número máximo de productos (entero, parámetro de consulta).
+
+        Retorna:
+        - 200 OK: Productos comprados juntos en formato JSON, del más al menos relacionado.
+        - 404 Not Found: Si el ID o el límite no son válidos o si el producto no existe.
+        """
+
+        try:
+            product_id = int(productId)
+        except:
+            return Response(
+                {'error': 'Product ID must be an integer'},
+                status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            limit = get_page_size(
+                request.query_params.get('limit'), BOUGHT_TOGETHER_LIMIT)
+        except:
+            return Response(
+                {'error': 'Limit must be an integer'},
+                status=status.HTTP_404_NOT_FOUND)
+
+        products = get_related_products(product_id, COPURCHASE, limit)
+
+        if not products and not Product.objects.filter(id=product_id).exists():
+            return Response(
+                {'error': 'Product with this product ID does not exist'},
+                status=status.HTTP_404_NOT_FOUND)
+
+        products = ProductSerializer(products, many=True)
+
+        return Response(
+            {'bought_together': products.data},
+            status=status.HTTP_200_OK)
 
 
 class ListBySearchView(APIView):
     """
-    Vista para realizar búsquedas filtradas de productos por categoría, rango de precio y orden.
+    Vista para realizar búsquedas filtradas de productos por categoría, rango de precio,
+    disponibilidad y orden, con los conteos de cada faceta.
     """
 
     permission_classes = (permissions.AllowAny, )
@@ -283,14 +426,22 @@ class ListBySearchView(APIView):
         Realiza una búsqueda filtrada de productos según los criterios especificados.
 
         Parámetros de Entrada (en el cuerpo de la solicitud):
-        - category_id: ID de la categoría por la cual filtrar los productos (entero).
-        - price_range: Rango de precios para filtrar los productos ('1 - 19', '20 - 39', '40 - 59', '60 - 79', 'More than 80').
-        - sort_by: Campo por el cual ordenar los productos ('date_created', 'price', 'sold', 'name').
+        - category_id: ID de la categoría por la cual filtrar los productos (entero, 0 para todas).
+        - category_ids: Lista opcional de subcategorías de category_id; basta con estar en una.
+        - price_min: Precio mínimo opcional, incluido (número).
+        - price_max: Precio máximo opcional, excluido (número).
+        - price_range: Rango de precios si no se envían price_min ni price_max ('1 - 19', '20 - 39', '40 - 59', '60 - 79', 'More than 80').
+        - in_stock: Si es verdadero, solo productos con unidades disponibles.
+        - sort_by: Campo por el cual ordenar los productos ('date_created', 'price', 'sold', 'name', 'rating_average').
         - order: Orden de los productos ('asc' para ascendente, 'desc' para descendente).
+        - limit: Número de productos por página (entero, máximo 100).
+        - cursor: Cursor 'next_cursor' de la página anterior.
 
         Retorna:
-        - 200 OK: Productos filtrados que coinciden con los criterios en formato JSON.
-        - 404 Not Found: Si la categoría especificada no existe o si no se encuentran productos que coincidan con los criterios.
+        - 200 OK: Página de productos filtrados, 'next_cursor' para la siguiente, o None si es la última, y 'facets' con
+          el total y los conteos por subcategoría y por rango de precio (ver products.facets.ProductFilter).
+        - 404 Not Found: Si alguna categoría especificada no existe, si algún filtro, el límite o el cursor no son válidos
+          o si no se encuentran productos que coincidan con los criterios.
         """
         
         data = self.request.data
@@ -302,72 +453,113 @@ class ListBySearchView(APIView):
                 {'error': 'Category ID must be an integer'},
                 status=status.HTTP_404_NOT_FOUND)
 
-        price_range = data['price_range']
+        try:
+            category_ids = [int(selected_id) for selected_id in data.get('category_ids') or []]
+        except:
+            return Response(
+                {'error': 'Category IDs must be a list of integers'},
+                status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            price_min = data.get('price_min')
+            price_max = data.get('price_max')
+
+            if price_min is None and price_max is None:
+                price_min, price_max = price_bounds(data.get('price_range'))
+            else:
+                price_min = None if price_min is None else Decimal(str(price_min))
+                price_max = None if price_max is None else Decimal(str(price_max))
+        except:
+            return Response(
+                {'error': 'Price bounds must be numbers'},
+                status=status.HTTP_404_NOT_FOUND)
+
+        in_stock = str(data.get('in_stock', '')).lower() in ('true', '1')
         sort_by = data['sort_by']
 
-        if not (sort_by == 'date_created' or sort_by == 'price' or sort_by == 'sold' or sort_by == 'name'):
+        if not (sort_by == 'date_created' or sort_by == 'price' or sort_by == 'sold' or sort_by == 'name'
+                or sort_by == 'rating_average'):
             sort_by = 'date_created'
 
         order = data['order']
 
-        # Si categoryID es = 0, filtrar todas las categorias
-        if category_id == 0:
-            product_results = Product.objects.all()
-        elif not Category.objects.filter(id=category_id).exists():
+        try:
+            limit = get_page_size(data.get('limit'))
+        except:
+            return Response(
+                {'error': 'Limit must be an integer'},
+                status=status.HTTP_404_NOT_FOUND)
+
+        # la categoria y todas sus subcategorias, a cualquier profundidad
+        try:
+            product_filter = ProductFilter(
+                category_id, category_ids, price_min, price_max, in_stock)
+        except UnknownCategory:
             return Response(
                 {'error': 'This category does not exist'},
                 status=status.HTTP_404_NOT_FOUND)
-        else:
-            category = Category.objects.get(id=category_id)
-            if category.parent:
-                # Si la categoria tiene padrem filtrar solo por la categoria y no el padre tambien
-                product_results = Product.objects.filter(category=category)
-            else:
-                if not Category.objects.filter(parent=category).exists():
-                    product_results = Product.objects.filter(category=category)
-                else:
-                    categories = Category.objects.filter(parent=category)
-                    filtered_categories = [category]
-
-                    for cat in categories:
-                        filtered_categories.append(cat)
-
-                    filtered_categories = tuple(filtered_categories)
-                    product_results = Product.objects.filter(
-                        category__in=filtered_categories)
-
-        # Filtrar por precio
-        if price_range == '1 - 19':
-            product_results = product_results.filter(price__gte=1)
-            product_results = product_results.filter(price__lt=20)
-        elif price_range == '20 - 39':
-            product_results = product_results.filter(price__gte=20)
-            product_results = product_results.filter(price__lt=40)
-        elif price_range == '40 - 59':
-            product_results = product_results.filter(price__gte=40)
-            product_results = product_results.filter(price__lt=60)
-        elif price_range == '60 - 79':
-            product_results = product_results.filter(price__gte=60)
-            product_results = product_results.filter(price__lt=80)
-        elif price_range == 'More than 80':
-            product_results = product_results.filter(price__gte=80)
 
         # Filtrar producto por sort_by
         if order == 'desc':
             sort_by = '-' + sort_by
-            product_results = product_results.order_by(sort_by)
-        elif order == 'asc':
-            product_results = product_results.order_by(sort_by)
-        else:
-            product_results = product_results.order_by(sort_by)
+
+        try:
+            product_results, next_cursor = keyset_paginate(
+                product_filter.queryset(), sort_by, data.get('cursor'), limit)
+        except InvalidCursor:
+            return Response(
+                {'error': 'Invalid cursor'},
+                status=status.HTTP_404_NOT_FOUND)
 
         product_results = ProductSerializer(product_results, many=True)
+        facets = product_filter.facet_counts()
 
         if len(product_results.data) > 0:
             return Response(
-                {'filtered_products': product_results.data},
+                {'filtered_products': product_results.data, 'next_cursor': next_cursor, 'facets': facets},
                 status=status.HTTP_200_OK)
         else:
             return Response(
-                {'error': 'No products found'},
+                {'error': 'No products found', 'facets': facets},
                 status=status.HTTP_404_NOT_FOUND)
+
+
+class AutocompleteView(APIView):
+    """
+    Vista para sugerir productos mientras el usuario escribe.
+    """
+
+    permission_classes = (permissions.AllowAny, )
+
+    def get(self, request, format=None):
+        """
+        Sugiere productos por nombre, ordenados por popularidad.
+
+        Las sugerencias salen de un índice en memoria, sin consultar la base de
+        datos, y toleran errores de escritura.
+
+        Parámetros de Consulta:
+        - q: Texto escrito por el usuario.
+        - limit: Número máximo de sugerencias (entero, máximo 20).
+
+        Retorna:
+        - 200 OK: Lista de sugerencias con 'id' y 'name'.
+        - 404 Not Found: Si el límite no es un entero.
+        """
+
+        text = request.query_params.get('q', '')
+        limit = request.query_params.get('limit', 10)
+
+        try:
+            limit = int(limit)
+        except:
+            return Response(
+                {'error': 'Limit must be an integer'},
+                status=status.HTTP_404_NOT_FOUND)
+
+        if limit <= 0:
+            limit = 10
+
+        suggestions = get_index().suggest(text, min(limit, MAX_SUGGESTIONS))
+
+        return Response({'suggestions': suggestions}, status=status.HTTP_200_OK)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from reviews.services import rebuild_rating_stats
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los agregados de calificación de todos los productos.'
+
+    def handle(self, *args, **options):
+        count = rebuild_rating_stats()
+
+        self.stdout.write('Rebuilt rating stats for %s products' % count)
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-18 20:22
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicates(apps, schema_editor):
+    # Conservar solo la fila más antigua de cada par antes de crear la restricción
+    Review = apps.get_model('reviews', 'Review')
+
+    keep = Review.objects.values('user', 'product').annotate(first=Min('id')).values('first')
+    Review.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_hot_query_indexes'),
+        ('reviews', '0002_alter_review_comment_alter_review_date_created_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', 'date_created', 'id'], name='reviews_rev_product_82b95a_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.UniqueConstraint(fields=('user', 'product'), name='unique_review_user_product'),
+        ),
+    ]
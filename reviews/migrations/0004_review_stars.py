@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-18 20:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_stars(apps, schema_editor):
+    # Misma regla que reviews.models.star_bucket: (n - 1, n], con 0.5 en 1 y
+    # los extremos fuera de rango en 1 y 5
+    Review = apps.get_model('reviews', 'Review')
+
+    Review.objects.filter(rating__lte=1).update(stars=1)
+    for star in range(2, 5):
+        Review.objects.filter(rating__gt=star - 1, rating__lte=star).update(stars=star)
+    Review.objects.filter(rating__gt=4).update(stars=5)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_rating_stats'),
+        ('reviews', '0003_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='stars',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Estrellas'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(populate_stars, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', 'stars', 'date_created', 'id'], name='reviews_rev_product_1ba404_idx'),
+        ),
+    ]
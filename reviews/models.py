@@ -1,4 +1,5 @@
 from datetime import datetime
+from decimal import ROUND_CEILING, ROUND_HALF_UP, Decimal
 from products.models import Product
 from django.db import models
 from django.conf import settings
@@ -8,13 +9,55 @@ from django.utils.translation import gettext_lazy as _
 
 User = settings.AUTH_USER_MODEL
 
+STARS = range(1, 6)
+
+
+def to_rating(rating):
+    """
+    Redondea una calificación a un decimal, igual que la columna Review.rating.
+
+    Returns:
+        Decimal: Calificación redondeada.
+    """
+    return Decimal(str(rating)).quantize(Decimal('0.1'), rounding=ROUND_HALF_UP)
+
+
+def star_bucket(rating):
+    """
+    Obtiene la estrella del histograma a la que pertenece una calificación.
+
+    La estrella n agrupa las calificaciones mayores que n - 1 y hasta n; 0.5
+    cuenta como 1 estrella.
+
+    Returns:
+        int: Estrella entre 1 y 5.
+    """
+    star = int(to_rating(rating).to_integral_value(rounding=ROUND_CEILING))
+    return min(max(star, STARS[0]), STARS[-1])
+
 
 class Review(models.Model):
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'date_created', 'id']),
+            # Filtro por estrellas
+            models.Index(fields=['product', 'stars', 'date_created', 'id']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='unique_review_user_product'),
+        ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name=_('Usuario'))
     product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name=_('Producto'))
     rating = models.DecimalField(max_digits=2, decimal_places=1, verbose_name=_('Calificación'))
+    # Estrella del histograma, ver star_bucket
+    stars = models.PositiveSmallIntegerField(editable=False, verbose_name=_('Estrellas'))
     comment = models.TextField(verbose_name=_('Comentario'))
     date_created = models.DateTimeField(default=datetime.now, verbose_name=_('Fecha de creación'))
 
     def __str__(self):
-        return self.comment
\ No newline at end of file
+        return self.comment
+
+    def save(self, *args, **kwargs):
+        self.stars = star_bucket(self.rating)
+        super().save(*args, **kwargs)
@@ -0,0 +1,290 @@
+from decimal import ROUND_HALF_UP, Decimal
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    Case, Count, DecimalField, ExpressionWrapper, F, FloatField, Q, Sum, Value,
+    When
+)
+from django.db.models.functions import Cast
+from ecommerce.pagination import PAGE_SIZE, keyset_paginate
+from ecommerce.versions import bump_version, get_version
+from products.models import Product
+from products.signals import CATALOG_VERSION_KEY, bump_product_versions
+from .models import STARS, Review, star_bucket, to_rating
+
+REVIEWS_CACHE_TIMEOUT = 60 * 60
+REVIEWS_ORDERING = '-date_created'
+
+
+def update_rating_stats(product_id, old_rating=None, new_rating=None):
+    """
+    Aplica a los agregados de un producto el cambio de una reseña.
+
+    Se hace un único UPDATE con expresiones F(), por lo que escrituras
+    simultáneas sobre el mismo producto no pierden cambios. Debe llamarse
+    dentro de la misma transacción que crea, modifica o elimina la reseña.
+
+    Args:
+        product_id (int): ID del producto reseñado.
+        old_rating: Calificación anterior, o None si la reseña es nueva.
+        new_rating: Calificación nueva, o None si la reseña se eliminó.
+    """
+    count_delta = (new_rating is not None) - (old_rating is not None)
+    sum_delta = Decimal(0)
+    star_deltas = {}
+
+    if old_rating is not None:
+        sum_delta -= to_rating(old_rating)
+        star = star_bucket(old_rating)
+        star_deltas[star] = star_deltas.get(star, 0) - 1
+
+    if new_rating is not None:
+        sum_delta += to_rating(new_rating)
+        star = star_bucket(new_rating)
+        star_deltas[star] = star_deltas.get(star, 0) + 1
+
+    rating_count = F('rating_count') + count_delta
+    rating_sum = F('rating_sum') + Value(sum_delta)
+
+    changes = {
+        'rating_count': rating_count,
+        'rating_sum': rating_sum,
+        # Se divide como flotante para evitar la división entera de SQLite
+        'rating_average': Case(
+            When(rating_count__gt=-count_delta, then=ExpressionWrapper(
+                Cast(rating_sum, FloatField()) / rating_count,
+                output_field=DecimalField(max_digits=3, decimal_places=2))),
+            default=Value(Decimal(0)),
+        ),
+    }
+
+    for star, delta in star_deltas.items():
+        if delta:
+            field = 'rating_%d' % star
+            changes[field] = F(field) + delta
+
+    Product.objects.filter(id=product_id).update(**changes)
+    transaction.on_commit(lambda: bump_version(CATALOG_VERSION_KEY))
+    transaction.on_commit(lambda: bump_product_versions([product_id]))
+
+
+def rebuild_rating_stats(products=None):
+    """
+    Recalcula desde las reseñas los agregados de calificación de productos.
+
+    Sirve para corregir los agregados si se cambiaron reseñas sin pasar por
+    update_rating_stats, por ejemplo desde el admin.
+
+    Args:
+        products: QuerySet de productos a recalcular, o None para todos.
+
+    Returns:
+        int: Número de productos recalculados.
+    """
+    if products is None:
+        products = Product.objects.all()
+
+    stats = {
+        'rating_count': Count('id'),
+        'rating_sum': Sum('rating'),
+    }
+    for star in STARS:
+        stats['rating_%d' % star] = Count('id', filter=Q(stars=star))
+
+    rows = {
+        row.pop('product'): row
+        for row in Review.objects.filter(
+            product__in=products).values('product').annotate(**stats)
+    }
+
+    updated = []
+    for product in products.only('id'):
+        row = rows.get(product.id, {})
+
+        product.rating_count = row.get('rating_count', 0)
+        product.rating_sum = row.get('rating_sum') or 0
+        product.rating_average = (
+            (Decimal(product.rating_sum) / product.rating_count).quantize(
+                Decimal('0.01'), rounding=ROUND_HALF_UP)
+            if product.rating_count else 0)
+
+        for star in STARS:
+            field = 'rating_%d' % star
+            setattr(product, field, row.get(field, 0))
+
+        updated.append(product)
+
+    Product.objects.bulk_update(updated, [
+        'rating_count', 'rating_sum', 'rating_average',
+    ] + ['rating_%d' % star for star in STARS], batch_size=500)
+    bump_version(CATALOG_VERSION_KEY)
+    bump_product_versions([product.id for product in updated])
+
+    return len(updated)
+
+
+def serialize_review(review):
+    """
+    Serializa una reseña cuyo usuario ya fue cargado.
+
+    Returns:
+        dict: 'id', 'rating', 'comment', 'date_created' y 'user'.
+    """
+    item = {}
+
+    item['id'] = review.id
+    item['rating'] = review.rating
+    item['comment'] = review.comment
+    item['date_created'] = review.date_created
+    item['user'] = review.user.first_name
+
+    return item
+
+
+def list_product_reviews(product_id):
+    """
+    Serializa todas las reseñas de un producto con una sola consulta.
+
+    Returns:
+        list: Reseñas de la más reciente a la más antigua.
+    """
+    reviews = Review.objects.filter(product_id=product_id).select_related(
+        'user'
+    ).only(
+        'id', 'rating', 'comment', 'date_created', 'user__first_name'
+    ).order_by(REVIEWS_ORDERING, '-id')
+
+    return [serialize_review(review) for review in reviews]
+
+
+def get_rating_stats(product_id):
+    """
+    Obtiene los agregados de calificación de un producto.
+
+    Returns:
+        dict: 'rating_count', 'rating_average' y 'rating_histogram'.
+    """
+    product = Product.objects.only(
+        'rating_count', 'rating_average',
+        *['rating_%d' % star for star in STARS]
+    ).get(id=product_id)
+
+    return {
+        'rating_count': product.rating_count,
+        'rating_average': product.rating_average,
+        'rating_histogram': product.rating_histogram,
+    }
+
+
+def write_result(product_id, review):
+    """
+    Respuesta compacta de una escritura de reseña.
+
+    En lugar de la lista completa de reseñas devuelve los agregados del
+    producto y la versión de sus reseñas, con la que el cliente decide si
+    vuelve a pedir la página que tiene en pantalla.
+
+    Args:
+        product_id (int): ID del producto reseñado.
+        review (dict): Reseña afectada.
+
+    Returns:
+        dict: 'review', 'rating' y 'reviews_version'.
+    """
+    return {
+        'review': review,
+        'rating': get_rating_stats(product_id),
+        'reviews_version': get_reviews_version(product_id),
+    }
+
+
+def get_review_page(product_id, cursor=None, page_size=PAGE_SIZE):
+    """
+    Obtiene una página de las reseñas de un producto, de la más reciente a la
+    más antigua.
+
+    Las reseñas y el nombre de su autor se cargan con un único JOIN sobre el
+    índice (product, date_created, id). La primera página se guarda en la
+    cache con la versión de las reseñas del producto, que cambia con cada
+    reseña creada, modificada o eliminada.
+
+    Args:
+        product_id (int): ID del producto.
+        cursor (str): Cursor devuelto con la página anterior, o None.
+        page_size (int): Reseñas por página.
+
+    Raises:
+        InvalidCursor: Si el cursor no es válido.
+
+    Returns:
+        dict: 'reviews' con la página, 'next_cursor' para la siguiente, o
+        None si es la última, y 'reviews_version' con la versión actual.
+    """
+    version = get_reviews_version(product_id)
+
+    if cursor:
+        page = build_review_page(product_id, cursor, page_size)
+    else:
+        key = 'reviews:%s:%s:%s' % (product_id, version, page_size)
+        page = cache.get(key)
+
+        if page is None:
+            page = build_review_page(product_id, None, page_size)
+            cache.add(key, page, REVIEWS_CACHE_TIMEOUT)
+
+    return dict(page, reviews_version=version)
+
+
+def build_review_page(product_id, cursor=None, page_size=PAGE_SIZE,
+                      stars=None):
+    """
+    Construye una página de reseñas directamente desde la base de datos.
+
+    Args:
+        stars (int): Estrella por la que filtrar las reseñas, o None para
+            todas. El filtro usa el índice (product, stars, date_created, id).
+
+    Returns:
+        dict: 'reviews' y 'next_cursor', como get_review_page.
+    """
+    reviews = Review.objects.filter(product_id=product_id)
+
+    if stars is not None:
+        reviews = reviews.filter(stars=stars)
+
+    reviews = reviews.select_related(
+        'user'
+    ).only('id', 'rating', 'comment', 'date_created', 'user__first_name')
+
+    reviews, next_cursor = keyset_paginate(
+        reviews, REVIEWS_ORDERING, cursor, page_size)
+
+    return {
+        'reviews': [serialize_review(review) for review in reviews],
+        'next_cursor': next_cursor,
+    }
+
+
+def get_reviews_version(product_id):
+    """
+    Obtiene la versión de las reseñas de un producto.
+    """
+    return get_version(reviews_version_key(product_id))
+
+
+def bump_reviews_version(product_id):
+    """
+    Invalida las páginas de reseñas de un producto en la cache.
+
+    La nueva versión se escribe cuando la transacción se confirma, para que
+    una lectura simultánea no guarde datos viejos con la versión nueva.
+    """
+    key = reviews_version_key(product_id)
+    transaction.on_commit(lambda: bump_version(key))
+
+
+def reviews_version_key(product_id):
+    """
+    Llave de la versión de las reseñas de un producto.
+    """
+    return 'reviews:version:%s' % product_id
@@ -1,3 +1,230 @@
-from django.test import TestCase
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+from category.models import Category
+from products.models import Product
+from .models import Review
+from .services import rebuild_rating_stats, star_bucket
 
 # Create your tests here.
+
+User = get_user_model()
+
+
+class RatingStatsTests(TestCase):
+    """
+    Verifica que los agregados de calificación sigan a las reseñas.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Category')
+        self.product = Product.objects.create(
+            name='Product', description='Description', price='10.00',
+            compare_price='12.00', category=self.category)
+        self.clients = []
+
+        for i in range(2):
+            user = User.objects.create_user(
+                email=f'reviewer{i}@example.com', password='Test12345',
+                first_name=f'Reviewer {i}', last_name='Tester')
+            client = APIClient()
+            client.force_authenticate(user=user)
+            self.clients.append(client)
+
+    def stats(self):
+        product = Product.objects.get(id=self.product.id)
+        return (product.rating_count, product.rating_sum,
+                product.rating_average, product.rating_histogram)
+
+    def test_star_bucket(self):
+        self.assertEqual(
+            [star_bucket(rating) for rating in (0.5, 1, 1.5, 4.5, 5)],
+            [1, 1, 2, 5, 5])
+
+    def test_writes_update_stats(self):
+        self.clients[0].post(
+            '/api/reviews/create-review/%s' % self.product.id,
+            {'rating': 4.5, 'comment': 'Good'}, format='json')
+        self.clients[1].post(
+            '/api/reviews/create-review/%s' % self.product.id,
+            {'rating': 2, 'comment': 'Bad'}, format='json')
+
+        self.assertEqual(self.stats(), (
+            2, Decimal('6.5'), Decimal('3.25'), {1: 0, 2: 1, 3: 0, 4: 0, 5: 1}))
+
+        self.clients[1].put(
+            '/api/reviews/update-review/%s' % self.product.id,
+            {'rating': 3, 'comment': 'Better'}, format='json')
+
+        self.assertEqual(self.stats(), (
+            2, Decimal('7.5'), Decimal('3.75'), {1: 0, 2: 0, 3: 1, 4: 0, 5: 1}))
+
+        self.clients[0].delete(
+            '/api/reviews/delete-review/%s' % self.product.id)
+        self.clients[1].delete(
+            '/api/reviews/delete-review/%s' % self.product.id)
+
+        self.assertEqual(self.stats(), (
+            0, Decimal('0'), Decimal('0'), {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}))
+
+    def test_rebuild_matches_reviews(self):
+        for client, rating in zip(self.clients, (5, 1)):
+            client.post(
+                '/api/reviews/create-review/%s' % self.product.id,
+                {'rating': rating, 'comment': 'Comment'}, format='json')
+        expected = self.stats()
+
+        Product.objects.filter(id=self.product.id).update(
+            rating_count=0, rating_sum=0, rating_average=0, rating_5=0)
+        rebuild_rating_stats()
+
+        self.assertEqual(self.stats(), expected)
+        self.assertEqual(Review.objects.count(), 2)
+
+    def test_serializer_exposes_stats(self):
+        self.clients[0].post(
+            '/api/reviews/create-review/%s' % self.product.id,
+            {'rating': 4, 'comment': 'Good'}, format='json')
+
+        response = APIClient().get('/api/product/product/%s' % self.product.id)
+        product = response.data['product']
+
+        self.assertEqual(product['rating_count'], 1)
+        self.assertEqual(Decimal(product['rating_average']), Decimal('4'))
+        self.assertEqual(product['rating_histogram'][4], 1)
+
+
+class ReviewListTests(TransactionTestCase):
+    """
+    Verifica la paginación y la cache de las reseñas de un producto.
+    """
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Category')
+        self.product = Product.objects.create(
+            name='Product', description='Description', price='10.00',
+            compare_price='12.00', category=category)
+        self.url = '/api/reviews/get-reviews/%s' % self.product.id
+
+        for i in range(5):
+            user = User.objects.create_user(
+                email=f'list{i}@example.com', password='Test12345',
+                first_name=f'Reviewer {i}', last_name='Tester')
+            Review.objects.create(
+                user=user, product=self.product, rating=i + 1,
+                comment=f'Comment {i}')
+
+        self.client = APIClient()
+
+    def test_pages_follow_cursor(self):
+        response = self.client.get(self.url, {'limit': 2})
+        comments = [review['comment'] for review in response.data['reviews']]
+
+        while response.data['next_cursor']:
+            response = self.client.get(self.url, {
+                'limit': 2, 'cursor': response.data['next_cursor']})
+            comments += [
+                review['comment'] for review in response.data['reviews']]
+
+        self.assertEqual(comments, [f'Comment {i}' for i in range(4, -1, -1)])
+        self.assertEqual(response.data['reviews'][0]['user'], 'Reviewer 0')
+
+    def test_first_page_is_cached(self):
+        self.client.get(self.url)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+
+        self.assertEqual(len(response.data['reviews']), 5)
+
+    def test_write_invalidates_cache(self):
+        self.client.get(self.url)
+
+        user = User.objects.create_user(
+            email='writer@example.com', password='Test12345',
+            first_name='Writer', last_name='Tester')
+        self.client.force_authenticate(user=user)
+        self.client.post(
+            '/api/reviews/create-review/%s' % self.product.id,
+            {'rating': 5, 'comment': 'Newest'}, format='json')
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(len(response.data['reviews']), 6)
+        self.assertEqual(response.data['reviews'][0]['comment'], 'Newest')
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'invalid'})
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_compact_writes(self):
+        user = User.objects.create_user(
+            email='compact@example.com', password='Test12345',
+            first_name='Compact', last_name='Tester')
+        self.client.force_authenticate(user=user)
+        version = self.client.get(self.url).data['reviews_version']
+
+        with self.assertNumQueries(7):
+            response = self.client.post(
+                '/api/reviews/create-review/%s?mode=compact' % self.product.id,
+                {'rating': 5, 'comment': 'Compact'}, format='json')
+
+        self.assertNotIn('reviews', response.data)
+        self.assertEqual(response.data['review']['comment'], 'Compact')
+        self.assertEqual(response.data['rating']['rating_count'], 1)
+        self.assertGreater(response.data['reviews_version'], version)
+
+        response = self.client.delete(
+            '/api/reviews/delete-review/%s?mode=compact' % self.product.id)
+
+        self.assertEqual(response.data['rating']['rating_count'], 0)
+        self.assertEqual(
+            response.data['reviews_version'],
+            self.client.get(self.url).data['reviews_version'])
+
+
+class FilterReviewsTests(TestCase):
+    """
+    Verifica el filtro de reseñas por estrellas.
+    """
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Category')
+        self.product = Product.objects.create(
+            name='Product', description='Description', price='10.00',
+            compare_price='12.00', category=category)
+        self.url = '/api/reviews/filter-reviews/%s' % self.product.id
+
+        for i, rating in enumerate((0.5, 1, 3.5, 4, 4.5, 5)):
+            user = User.objects.create_user(
+                email=f'filter{i}@example.com', password='Test12345',
+                first_name=f'Reviewer {i}', last_name='Tester')
+            Review.objects.create(
+                user=user, product=self.product, rating=rating,
+                comment=f'Rating {rating}')
+
+        rebuild_rating_stats()
+
+    def test_filters_by_star(self):
+        for rating, expected in ((1, ['1', '0.5']), (4, ['4', '3.5']),
+                                 (5, ['5', '4.5']), (2, [])):
+            with self.subTest(rating=rating):
+                response = APIClient().get(self.url, {'rating': rating})
+
+                self.assertEqual(
+                    [review['rating'] for review in response.data['reviews']],
+                    [Decimal(value) for value in expected])
+
+    def test_paginates_with_histogram(self):
+        response = APIClient().get(self.url, {'rating': 5, 'limit': 1})
+
+        self.assertEqual(len(response.data['reviews']), 1)
+        self.assertIsNotNone(response.data['next_cursor'])
+        self.assertEqual(
+            response.data['rating_histogram'], {1: 2, 2: 0, 3: 0, 4: 2, 5: 2})
@@ -2,20 +2,38 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions, status
 from products.models import Product
-from .models import Review
+from django.db import IntegrityError, transaction
+from .models import Review, star_bucket
+from ecommerce.conditional import version_condition
+from ecommerce.pagination import InvalidCursor, get_page_size
+from .services import (
+    build_review_page, bump_reviews_version, get_rating_stats,
+    get_review_page, list_product_reviews, reviews_version_key,
+    serialize_review, update_rating_stats, write_result
+)
 
 # Create your views here.
 
 
+def product_reviews_version_key(request, productId, format=None):
+    try:
+        return reviews_version_key(int(productId))
+    except:
+        return None
+
+
 class GetProductReviewsView(APIView):
     """
-    Vista API para obtener todas las reseñas de un producto.
+    Vista API para obtener las reseñas de un producto.
 
-    Permite obtener todas las reseñas de un producto específico ordenadas por fecha de creación.
+    Permite obtener las reseñas de un producto específico ordenadas por fecha de creación,
+    por páginas con paginación por cursor. Admite peticiones condicionales con la versión de
+    las reseñas del producto.
     """
 
     permission_classes = (permissions.AllowAny, )
 
+    @version_condition(product_reviews_version_key)
     def get(self, request, productId, format=None):
         """
         Maneja peticiones GET para obtener reseñas de un producto.
@@ -25,13 +43,18 @@ class GetProductReviewsView(APIView):
         - productId: ID del producto del cual se desean obtener las reseñas.
         - format: Sufijo de formato opcional.
 
+        Parámetros de consulta:
+        - limit: Número de reseñas por página (entero, máximo 100).
+        - cursor: Cursor 'next_cursor' de la página anterior.
+
         Returns:
-        - Respuesta con reseñas del producto solicitado o mensaje de error.
+        - Respuesta con una página de reseñas del producto solicitado o mensaje de error.
 
-        Si el producto existe y tiene reseñas, devuelve una respuesta JSON con la lista de reseñas
-        ordenadas por fecha de creación.
-        Si el producto no existe o no tiene reseñas, devuelve una respuesta JSON con un mensaje de
-        error correspondiente.
+        Si el producto existe, devuelve una respuesta JSON con la página de reseñas ordenadas
+        por fecha de creación, 'next_cursor' para la siguiente, o None si es la última, y
+        'reviews_version' con la versión actual de las reseñas del producto.
+        Si el producto no existe o el límite o el cursor no son válidos, devuelve una respuesta
+        JSON con un mensaje de error correspondiente.
         """
 
         try:
@@ -42,6 +65,14 @@ class GetProductReviewsView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        try:
+            limit = get_page_size(request.query_params.get('limit'))
+        except:
+            return Response(
+                {'error': 'Limit must be an integer'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
         try:
             if not Product.objects.filter(id=product_id).exists():
                 return Response(
@@ -49,30 +80,16 @@ class GetProductReviewsView(APIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            product = Product.objects.get(id=product_id)
-
-            results = []
-
-            if Review.objects.filter(product=product).exists():
-                reviews = Review.objects.order_by(
-                    '-date_created'
-                ).filter(product=product)
-
-                for review in reviews:
-                    item = {}
-
-                    item['id'] = review.id
-                    item['rating'] = review.rating
-                    item['comment'] = review.comment
-                    item['date_created'] = review.date_created
-                    item['user'] = review.user.first_name
-
-                    results.append(item)
+            try:
+                page = get_review_page(
+                    product_id, request.query_params.get('cursor'), limit)
+            except InvalidCursor:
+                return Response(
+                    {'error': 'Invalid cursor'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
 
-            return Response(
-                {'reviews': results},
-                status=status.HTTP_200_OK
-            )
+            return Response(page, status=status.HTTP_200_OK)
 
         except:
             return Response(
@@ -162,10 +179,15 @@ class CreateProductReviewView(APIView):
         - productId: ID del producto para el cual se crea la reseña.
         - format: Sufijo de formato opcional.
 
+        Parámetros de consulta:
+        - mode: 'compact' para no devolver la lista completa de reseñas.
+
         Returns:
         - Respuesta con la nueva reseña creada o mensaje de error.
 
-        Si la reseña se crea con éxito, devuelve una respuesta JSON con los detalles de la nueva reseña.
+        Si la reseña se crea con éxito, devuelve una respuesta JSON con los detalles de la nueva reseña
+        y todas las reseñas del producto o, en modo 'compact', con los agregados de calificación del
+        producto y la versión de sus reseñas.
         Si no se proporciona la información necesaria para crear la reseña o si ya existe una reseña para
         el producto por el usuario, devuelve un mensaje de error correspondiente.
         """
@@ -197,46 +219,33 @@ class CreateProductReviewView(APIView):
 
             product = Product.objects.get(id=productId)
 
-            result = {}
-            results = []
-
-            if Review.objects.filter(user=user, product=product).exists():
+            # la restriccion unica (user, product) evita reseñas duplicadas
+            try:
+                with transaction.atomic():
+                    review = Review.objects.create(
+                        user=user,
+                        product=product,
+                        rating=rating,
+                        comment=comment
+                    )
+                    update_rating_stats(product.id, new_rating=rating)
+                    bump_reviews_version(product.id)
+            except IntegrityError:
                 return Response(
                     {'error': 'Review for this course already created'},
                     status=status.HTTP_409_CONFLICT
                 )
 
-            review = Review.objects.create(
-                user=user,
-                product=product,
-                rating=rating,
-                comment=comment
-            )
+            result = serialize_review(review)
 
-            if Review.objects.filter(user=user, product=product).exists():
-                result['id'] = review.id
-                result['rating'] = review.rating
-                result['comment'] = review.comment
-                result['date_created'] = review.date_created
-                result['user'] = review.user.first_name
-
-                reviews = Review.objects.order_by('-date_created').filter(
-                    product=product
+            if request.query_params.get('mode') == 'compact':
+                return Response(
+                    write_result(product.id, result),
+                    status=status.HTTP_201_CREATED
                 )
 
-                for review in reviews:
-                    item = {}
-
-                    item['id'] = review.id
-                    item['rating'] = review.rating
-                    item['comment'] = review.comment
-                    item['date_created'] = review.date_created
-                    item['user'] = review.user.first_name
-
-                    results.append(item)
-
             return Response(
-                {'review': result, 'reviews': results},
+                {'review': result, 'reviews': list_product_reviews(product.id)},
                 status=status.HTTP_201_CREATED
             )
         except:
@@ -262,10 +271,15 @@ class UpdateProductReviewView(APIView):
         - productId: ID del producto para el cual se actualiza la reseña.
         - format: Sufijo de formato opcional.
 
+        Parámetros de consulta:
+        - mode: 'compact' para no devolver la lista completa de reseñas.
+
         Returns:
         - Respuesta con la reseña actualizada o mensaje de error.
 
-        Si la reseña se actualiza con éxito, devuelve una respuesta JSON con los detalles de la reseña actualizada.
+        Si la reseña se actualiza con éxito, devuelve una respuesta JSON con los detalles de la reseña actualizada
+        y todas las reseñas del producto o, en modo 'compact', con los agregados de calificación del producto y
+        la versión de sus reseñas.
         Si la reseña no existe o no se proporciona la información necesaria para actualizarla, devuelve un mensaje
         de error correspondiente.
         """
@@ -305,46 +319,37 @@ class UpdateProductReviewView(APIView):
 
             product = Product.objects.get(id=product_id)
 
-            result = {}
-            results = []
-
             if not Review.objects.filter(user=user, product=product).exists():
                 return Response(
                     {'error': 'Review for this product does not exist'},
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            if Review.objects.filter(user=user, product=product).exists():
+            with transaction.atomic():
+                old_rating = Review.objects.select_for_update().values_list(
+                    'rating', flat=True
+                ).get(user=user, product=product)
+
                 Review.objects.filter(user=user, product=product).update(
                     rating=rating,
+                    stars=star_bucket(rating),
                     comment=comment
                 )
+                update_rating_stats(product.id, old_rating, rating)
+                bump_reviews_version(product.id)
 
-                review = Review.objects.get(user=user, product=product)
+            review = Review.objects.select_related('user').get(
+                user=user, product=product)
+            result = serialize_review(review)
 
-                result['id'] = review.id
-                result['rating'] = review.rating
-                result['comment'] = review.comment
-                result['date_created'] = review.date_created
-                result['user'] = review.user.first_name
-
-                reviews = Review.objects.order_by('-date_created').filter(
-                    product=product
+            if request.query_params.get('mode') == 'compact':
+                return Response(
+                    write_result(product.id, result),
+                    status=status.HTTP_200_OK
                 )
 
-                for review in reviews:
-                    item = {}
-
-                    item['id'] = review.id
-                    item['rating'] = review.rating
-                    item['comment'] = review.comment
-                    item['date_created'] = review.date_created
-                    item['user'] = review.user.first_name
-
-                    results.append(item)
-
             return Response(
-                {'review': result, 'reviews': results},
+                {'review': result, 'reviews': list_product_reviews(product.id)},
                 status=status.HTTP_200_OK
             )
         except:
@@ -370,11 +375,15 @@ class DeleteProductReviewView(APIView):
         - productId: ID del producto para el cual se elimina la reseña.
         - format: Sufijo de formato opcional.
 
+        Parámetros de consulta:
+        - mode: 'compact' para no devolver la lista completa de reseñas.
+
         Returns:
         - Respuesta con las reseñas actualizadas después de la eliminación o mensaje de error.
 
         Si la reseña se elimina con éxito, devuelve una respuesta JSON con las reseñas actualizadas
-        del producto.
+        del producto o, en modo 'compact', con el ID de la reseña eliminada, los agregados de
+        calificación del producto y la versión de sus reseñas.
         Si la reseña no existe o no se proporciona la información necesaria para eliminarla, devuelve
         un mensaje de error correspondiente.
         """
@@ -398,28 +407,23 @@ class DeleteProductReviewView(APIView):
 
             product = Product.objects.get(id=product_id)
 
-            results = []
-
             if Review.objects.filter(user=user, product=product).exists():
-                Review.objects.filter(user=user, product=product).delete()
-
-                reviews = Review.objects.order_by('-date_created').filter(
-                    product=product
-                )
-
-                for review in reviews:
-                    item = {}
-
-                    item['id'] = review.id
-                    item['rating'] = review.rating
-                    item['comment'] = review.comment
-                    item['date_created'] = review.date_created
-                    item['user'] = review.user.first_name
-
-                    results.append(item)
+                with transaction.atomic():
+                    review_id, old_rating = Review.objects.select_for_update(
+                    ).values_list('id', 'rating').get(user=user, product=product)
+
+                    Review.objects.filter(id=review_id).delete()
+                    update_rating_stats(product.id, old_rating=old_rating)
+                    bump_reviews_version(product.id)
+
+                if request.query_params.get('mode') == 'compact':
+                    return Response(
+                        write_result(product.id, {'id': review_id}),
+                        status=status.HTTP_200_OK
+                    )
 
                 return Response(
-                    {'reviews': results},
+                    {'reviews': list_product_reviews(product.id)},
                     status=status.HTTP_200_OK
                 )
             else:
@@ -438,7 +442,8 @@ class FilterProductReviewsView(APIView):
     """
     Vista API para filtrar reseñas de un producto por valoración.
 
-    Permite filtrar reseñas de un producto específico según un valor de valoración específico.
+    Permite filtrar reseñas de un producto específico por estrellas, por páginas con paginación
+    por cursor.
     """
 
     permission_classes = (permissions.AllowAny, )
@@ -452,13 +457,20 @@ class FilterProductReviewsView(APIView):
         - productId: ID del producto del cual se desean filtrar las reseñas.
         - format: Sufijo de formato opcional.
 
+        Parámetros de consulta:
+        - rating: Valoración a filtrar; se devuelven las reseñas de su estrella, es decir con
+          valoración mayor que la estrella anterior y hasta la estrella (0.5 cuenta como 1).
+        - limit: Número de reseñas por página (entero, máximo 100).
+        - cursor: Cursor 'next_cursor' de la página anterior.
+
         Returns:
         - Respuesta con las reseñas filtradas del producto o mensaje de error.
 
-        Si las reseñas existen y se filtran según la valoración, devuelve una respuesta JSON con la lista
-        de reseñas filtradas.
-        Si el producto no existe o no se proporciona una valoración válida, devuelve un mensaje de error
-        correspondiente.
+        Si el producto existe, devuelve una respuesta JSON con la página de reseñas filtradas,
+        'next_cursor' para la siguiente, o None si es la última, y 'rating_histogram' con el número
+        de reseñas del producto por estrella.
+        Si el producto no existe o no se proporciona una valoración, un límite o un cursor válidos,
+        devuelve un mensaje de error correspondiente.
         """
         
         try:
@@ -469,14 +481,14 @@ class FilterProductReviewsView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        if not Product.objects.filter(id=product_id).exists():
+        try:
+            rating_stats = get_rating_stats(product_id)
+        except Product.DoesNotExist:
             return Response(
                 {'error': 'This product does not exist'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        product = Product.objects.get(id=product_id)
-
         rating = request.query_params.get('rating')
 
         try:
@@ -487,45 +499,31 @@ class FilterProductReviewsView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        try:
+            limit = get_page_size(request.query_params.get('limit'))
+        except:
+            return Response(
+                {'error': 'Limit must be an integer'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
         try:
             if not rating:
                 rating = 5.0
-            elif rating > 5.0:
-                rating = 5.0
-            elif rating < 0.5:
-                rating = 0.5
-
-            results = []
 
-            if Review.objects.filter(product=product).exists():
-                if rating == 0.5:
-                    reviews = Review.objects.order_by('-date_created').filter(
-                        rating=rating, product=product
-                    )
-                else:
-                    reviews = Review.objects.order_by('-date_created').filter(
-                        rating__lte=rating,
-                        product=product
-                    ).filter(
-                        rating__gte=(rating - 0.5),
-                        product=product
-                    )
-
-                for review in reviews:
-                    item = {}
-
-                    item['id'] = review.id
-                    item['rating'] = review.rating
-                    item['comment'] = review.comment
-                    item['date_created'] = review.date_created
-                    item['user'] = review.user.first_name
+            try:
+                page = build_review_page(
+                    product_id, request.query_params.get('cursor'), limit,
+                    stars=star_bucket(rating))
+            except InvalidCursor:
+                return Response(
+                    {'error': 'Invalid cursor'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
 
-                    results.append(item)
+            page['rating_histogram'] = rating_stats['rating_histogram']
 
-            return Response(
-                {'reviews': results},
-                status=status.HTTP_200_OK
-            )
+            return Response(page, status=status.HTTP_200_OK)
         except:
             return Response(
                 {'error': 'Something went wrong when filtering reviews for product'},
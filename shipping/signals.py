@@ -0,0 +1,16 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from ecommerce.versions import bump_version
+from .models import Shipping
+
+SHIPPING_VERSION_KEY = 'shipping:version'
+
+
+@receiver(post_save, sender=Shipping)
+@receiver(post_delete, sender=Shipping)
+def invalidate_shipping(sender, **kwargs):
+    """
+    Avanza la versión de las opciones de envío cuando la transacción se confirma.
+    """
+    transaction.on_commit(lambda: bump_version(SHIPPING_VERSION_KEY))
@@ -1,8 +1,10 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
+from ecommerce.conditional import version_condition
 from .models import Shipping
 from .serializers import ShippingSerializer
+from .signals import SHIPPING_VERSION_KEY
 
 # Create your views here.
 
@@ -12,10 +14,12 @@ class GetShippingView(APIView):
     Vista API para obtener opciones de envío.
 
     Este endpoint permite la obtención de opciones de envío ordenadas por precio.
+    Admite peticiones condicionales con la versión de las opciones de envío.
     """
 
     permission_classes = (permissions.AllowAny, )
 
+    @version_condition(SHIPPING_VERSION_KEY)
     def get(self, request, format=None):
         """
         Maneja peticiones GET para obtener opciones de envío.
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 20:22
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicates(apps, schema_editor):
+    # Conservar solo la fila más antigua de cada par antes de crear la restricción
+    WishListItem = apps.get_model('wishlist', 'WishListItem')
+
+    keep = WishListItem.objects.values('wishlist', 'product').annotate(first=Min('id')).values('first')
+    WishListItem.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_hot_query_indexes'),
+        ('wishlist', '0002_alter_wishlist_total_items_alter_wishlist_user_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='wishlistitem',
+            constraint=models.UniqueConstraint(fields=('wishlist', 'product'), name='unique_wishlist_product'),
+        ),
+    ]
@@ -11,5 +11,10 @@ class WishList(models.Model):
 
 
 class WishListItem(models.Model):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['wishlist', 'product'], name='unique_wishlist_product'),
+        ]
+
     wishlist = models.ForeignKey(WishList, on_delete=models.CASCADE, verbose_name=_('Lista de deseos'))
     product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name=_('Producto'))
\ No newline at end of file
@@ -2,6 +2,8 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from cart.models import Cart, CartItem
+from cart.services import bump_cart_version
+from django.db import IntegrityError, transaction
 from .models import WishList, WishListItem
 from products.models import Product
 from products.serializers import ProductSerializer
@@ -98,17 +100,19 @@ class AddItemView(APIView):
             product = Product.objects.get(id=product_id)
             wishlist = WishList.objects.get(user=user)
 
-            if WishListItem.objects.filter(wishlist=wishlist, product=product).exists():
+            # la restriccion unica (wishlist, product) evita items duplicados
+            try:
+                with transaction.atomic():
+                    WishListItem.objects.create(
+                        product=product,
+                        wishlist=wishlist
+                    )
+            except IntegrityError:
                 return Response(
                     {'error': 'Item already in wishlist'},
                     status=status.HTTP_409_CONFLICT
                 )
 
-            WishListItem.objects.create(
-                product=product,
-                wishlist=wishlist
-            )
-
             if WishListItem.objects.filter(product=product, wishlist=wishlist).exists():
                 total_items = int(wishlist.total_items) + 1
                 WishList.objects.filter(user=user).update(
@@ -129,6 +133,7 @@ class AddItemView(APIView):
                         Cart.objects.filter(user=user).update(
                             total_items=total_items
                         )
+                        bump_cart_version(user)
 
             wishlist_items = WishListItem.objects.filter(wishlist=wishlist)
             result = []